@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for captain itself, these only need the stdlib, run them from
+the repo root with:
+
+    $ python -m benchmarks --output results.json
+    $ python -m benchmarks --compare results.json --threshold 0.1
+
+see benchmarks.suite
+"""
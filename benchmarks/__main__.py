@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import sys
+import json
+import argparse
+
+from .suite import Suite, compare
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark captain's startup, parsing, dispatch, and output",
+    )
+    parser.add_argument(
+        "--sizes",
+        default="10,1000,10000",
+        help="Comma separated command counts of the synthetic trees",
+    )
+    parser.add_argument(
+        "--shapes",
+        default="wide,deep",
+        help="Comma separated shapes of the synthetic trees",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="How many times each benchmark is repeated, the fastest counts",
+    )
+    parser.add_argument(
+        "--output", "-o",
+        metavar="PATH",
+        help="Write the results as json to PATH",
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="PATH",
+        help="Compare against the json results at PATH and exit with 1 if"
+            " anything regressed",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="How much worse a result can be before it is a regression,"
+            " 0.1 is 10%%",
+    )
+    return parser
+
+
+def format_value(value, unit):
+    if unit == "s":
+        return f"{value * 1000:.3f} ms"
+    return f"{value:,.0f} {unit}"
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+
+    suite = Suite(
+        sizes=[int(s) for s in args.sizes.split(",")],
+        shapes=args.shapes.split(","),
+        repeat=args.repeat,
+    )
+    results = suite.run()
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    ret_code = 0
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+
+        for row in compare(baseline, results, args.threshold):
+            status = "REGRESSION" if row["regression"] else "ok"
+            print("{:<24} {:>16} {:>16} {:>+8.1%}  {}".format(
+                row["name"],
+                format_value(row["baseline"], row["unit"]),
+                format_value(row["current"], row["unit"]),
+                row["change"],
+                status,
+            ))
+
+            if row["regression"]:
+                ret_code = 1
+
+    else:
+        for name, result in results["results"].items():
+            print("{:<24} {:>16}".format(
+                name,
+                format_value(result["value"], result["unit"]),
+            ))
+
+    return ret_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
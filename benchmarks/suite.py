@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import timeit
+import asyncio
+import logging
+import platform
+import subprocess
+import tempfile
+import importlib
+import tracemalloc
+import gc
+from contextlib import contextmanager
+
+import captain
+from captain import Command
+from captain.call import CommandRegistry
+from captain.interface import Application
+from captain.io import Output
+from captain.logging import MSG_FORMAT
+
+
+class CommandTree(object):
+    """Writes a package with a synthetic tree of size commands
+
+    The package is the command prefix and the commands are spread across
+    its modules, .per_module commands to a module, like a real project's
+    commands package would be. A "wide" tree's modules each have
+    .per_module sibling commands (eg, `m0 cmd0`), a "deep" tree's modules
+    each have a chain of .depth nested commands (eg, `m0 cmd0 sub1 ... sub9`)
+    """
+    depth = 10
+
+    per_module = 10
+
+    def __init__(self, dirpath, size, shape="wide"):
+        """
+        :param dirpath: str, the package will be written into this
+            directory, which should be in sys.path
+        :param size: int, how many commands the tree will have
+        :param shape: str, "wide" or "deep"
+        """
+        self.dirpath = dirpath
+        self.size = size
+        self.shape = shape
+        self.modpath = f"captain_bench_{shape}_{size}"
+
+    def get_module_count(self):
+        return max(1, self.size // self.per_module)
+
+    def get_lines(self):
+        lines = ["from captain import Command", ""]
+        if self.shape == "deep":
+            for d in range(self.depth):
+                indent = "    " * d
+                name = "Cmd0" if d == 0 else f"Sub{d}"
+                lines.append(f"{indent}class {name}(Command):")
+                lines.append(f"{indent}    def handle(self, foo: int = 0):")
+                lines.append(f"{indent}        return foo")
+
+        else:
+            for i in range(self.per_module):
+                lines.append(f"class Cmd{i}(Command):")
+                lines.append("    def handle(self, foo: int = 0):")
+                lines.append("        return foo")
+
+        return lines
+
+    def get_argv(self):
+        """Returns the argv that will run the last command of the tree"""
+        argv = [f"m{self.get_module_count() - 1}"]
+        if self.shape == "deep":
+            argv.append("cmd0")
+            argv.extend(f"sub{d}" for d in range(1, self.depth))
+
+        else:
+            argv.append(f"cmd{self.per_module - 1}")
+
+        return argv + ["--foo", "1"]
+
+    def write(self):
+        """Write the tree's package
+
+        :returns: str, the package's module path, this is the tree's
+            command prefix
+        """
+        basedir = os.path.join(self.dirpath, self.modpath)
+        os.makedirs(basedir, exist_ok=True)
+        with open(os.path.join(basedir, "__init__.py"), "w") as fp:
+            fp.write("")
+
+        body = "\n".join(self.get_lines()) + "\n"
+        for i in range(self.get_module_count()):
+            with open(os.path.join(basedir, f"m{i}.py"), "w") as fp:
+                fp.write(body)
+
+        return self.modpath
+
+
+SIGNATURES = """
+from captain import Command, arg
+
+class Simple(Command):
+    def handle(self, foo: int = 0):
+        return 0
+
+class Complex(Command):
+    @arg("--mode", choices=["fast", "slow"], default="fast")
+    def handle(
+        self,
+        path: str,
+        *names: str,
+        count: int = 1,
+        ratio: float = 1.0,
+        tags: list[str] = None,
+        verbose: bool = False,
+        **kwargs,
+    ):
+        return 0
+"""
+
+
+class Suite(object):
+    """Runs all the benchmarks and returns their results
+
+    Each result is a dict with the measured value, its unit, and whether
+    lower or higher is better, this is what .compare uses to decide if a
+    value regressed
+
+    :example:
+        results = Suite(sizes=[10, 1000]).run()
+    """
+    def __init__(self, sizes=None, shapes=None, repeat=5, calls=2000, rows=1000):
+        """
+        :param sizes: list[int], how many commands each synthetic tree has
+        :param shapes: list[str], see CommandTree
+        :param repeat: int, how many times each benchmark is repeated, the
+            fastest repeat is the one reported
+        :param calls: int, how many commands are called for the call
+            throughput benchmark
+        :param rows: int, how many lines are written by the output benchmarks
+        """
+        self.sizes = sizes or [10, 1000, 10000]
+        self.shapes = shapes or ["wide", "deep"]
+        self.repeat = repeat
+        self.calls = calls
+        self.rows = rows
+        self.results = {}
+
+    def add(self, name, value, unit="s", better="lower"):
+        self.results[name] = {
+            "value": value,
+            "unit": unit,
+            "better": better,
+        }
+
+    def measure(self, func):
+        """Returns the fastest time, in seconds, it took to run func
+
+        :param func: Callable
+        :returns: float
+        """
+        timer = timeit.Timer(func)
+        number, elapsed = timer.autorange()
+        repeat = self.repeat
+        if elapsed / number > 1.0:
+            # this is one of the big trees, one more run is enough
+            repeat = 1
+
+        return min(timer.repeat(repeat=repeat, number=number)) / number
+
+    def measure_memory(self, func):
+        """Returns how many bytes are still allocated for what func returned
+
+        :param func: Callable
+        :returns: int
+        """
+        gc.collect()
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            value = func()
+            gc.collect()
+            size = tracemalloc.get_traced_memory()[0] - start
+
+        finally:
+            tracemalloc.stop()
+
+        del value
+        return size
+
+    @contextmanager
+    def commands(self):
+        """Isolates the commands loaded while this is active, each tree
+        gets its own Command.command_classes registry"""
+        command_classes = Command.command_classes
+        Command.command_classes = CommandRegistry()
+        try:
+            yield
+
+        finally:
+            Command.command_classes = command_classes
+
+    def get_meta(self):
+        return {
+            "time": time.time(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "captain": captain.__version__,
+            "sizes": self.sizes,
+            "shapes": self.shapes,
+        }
+
+    def run(self):
+        """Run all the benchmarks
+
+        :returns: dict, with "meta" and "results" keys
+        """
+        self.results = {}
+        self.bench_import()
+
+        with tempfile.TemporaryDirectory() as dirpath:
+            sys.path.insert(0, dirpath)
+            try:
+                for shape in self.shapes:
+                    for size in self.sizes:
+                        self.bench_tree(CommandTree(dirpath, size, shape))
+
+                self.bench_signatures(dirpath)
+
+            finally:
+                sys.path.remove(dirpath)
+
+        self.bench_output()
+
+        return {
+            "meta": self.get_meta(),
+            "results": self.results,
+        }
+
+    def bench_import(self):
+        """Cold import of captain, this runs a new interpreter each time
+        with -X importtime, so only the time spent importing captain and its
+        dependencies is counted, not interpreter startup"""
+        env = dict(os.environ)
+        basedir = os.path.dirname(os.path.dirname(captain.__file__))
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [basedir, env.get("PYTHONPATH", "")])
+        )
+
+        times = []
+        for _ in range(self.repeat):
+            r = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", "import captain"],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+
+            # lines look like: "import time: self [us] | cumulative | name"
+            for line in r.stderr.splitlines():
+                parts = line.split("|")
+                if len(parts) == 3 and parts[2].strip() == "captain":
+                    times.append(int(parts[1].strip()) / 1_000_000)
+
+        self.add("import.captain", min(times))
+
+    def bench_tree(self, tree):
+        """Application() construction and parse_args latency and the memory
+        the command tree uses for tree"""
+        name = f"{tree.shape}.{tree.size}"
+        modpath = tree.write()
+        with self.commands():
+            # the first Application imports the tree's modules, the tree is
+            # built the first time .parser is accessed
+            application = Application(command_prefixes=[modpath])
+            application.parser
+            self.add(
+                f"construct.{name}",
+                self.measure(
+                    lambda: Application(command_prefixes=[modpath]).parser
+                ),
+            )
+
+            # the tree's nodes without the parsers
+            self.add(
+                f"memory.{name}",
+                self.measure_memory(application._create_pathfinder),
+                "B",
+            )
+
+            argv = tree.get_argv()
+            # the first parse adds the command's arguments to its parser
+            application.parser.parse_args(argv)
+            self.add(
+                f"parse.{name}",
+                self.measure(lambda: application.parser.parse_args(argv)),
+            )
+
+    def bench_signatures(self, dirpath):
+        """parse_args latency for a simple and a complex handle signature
+        and how many commands can be called a second"""
+        modpath = "captain_bench_signatures"
+        with open(os.path.join(dirpath, f"{modpath}.py"), "w") as fp:
+            fp.write(SIGNATURES)
+
+        with self.commands():
+            importlib.import_module(modpath)
+            application = Application(command_prefixes=[modpath])
+
+            argvs = {
+                "simple": ["simple", "--foo", "1"],
+                "complex": [
+                    "complex", "/tmp/foo", "a", "b",
+                    "--count", "3",
+                    "--ratio", "0.5",
+                    "--tags", "x", "--tags", "y",
+                    "--verbose",
+                    "--mode", "slow",
+                ],
+            }
+            for k, argv in argvs.items():
+                application.parser.parse_args(argv)
+                self.add(
+                    f"parse.{k}",
+                    self.measure(lambda: application.parser.parse_args(argv)),
+                )
+
+            async def call():
+                start = time.perf_counter()
+                for _ in range(self.calls):
+                    await application.call("simple", foo=1)
+                return time.perf_counter() - start
+
+            elapsed = min(asyncio.run(call()) for _ in range(self.repeat))
+            self.add("call.simple", self.calls / elapsed, "ops/s", "higher")
+
+    def bench_output(self):
+        """Output.out and Output.table lines per second, the output goes to
+        os.devnull so this is captain's formatting and logging overhead"""
+        with open(os.devnull, "w") as stream:
+            loggers = []
+            for name in ["stdout", "stderr"]:
+                logger = logging.getLogger(f"benchmarks.{name}")
+                logger.propagate = False
+                logger.setLevel(logging.DEBUG)
+                logger.handlers = []
+
+                handler = logging.StreamHandler(stream=stream)
+                handler.terminator = ""
+                handler.setFormatter(logging.Formatter(MSG_FORMAT))
+                logger.addHandler(handler)
+                loggers.append(logger)
+
+            output = Output(stdout=loggers[0], stderr=loggers[1])
+
+            def out():
+                for i in range(self.rows):
+                    output.out("line {}", i)
+
+            self.add(
+                "output.out",
+                self.rows / self.measure(out),
+                "lines/s",
+                "higher",
+            )
+
+            rows = [(i, f"name {i}", i * 1.5) for i in range(self.rows)]
+            self.add(
+                "output.table",
+                self.rows / self.measure(lambda: output.table(rows)),
+                "lines/s",
+                "higher",
+            )
+
+            for logger in loggers:
+                logger.handlers = []
+
+
+def compare(baseline, current, threshold=0.1):
+    """Compare current results against baseline results
+
+    :param baseline: dict, what Suite.run returned for the baseline
+    :param current: dict, what Suite.run returned for this run
+    :param threshold: float, how much worse (eg, 0.1 is 10%) a value can be
+        before it is a regression
+    :returns: list[dict], one row for every benchmark in both results with
+        the name, baseline, current, change (the relative change where
+        positive is always worse), and regression keys
+    """
+    rows = []
+    bresults = baseline["results"]
+    cresults = current["results"]
+    for name, cresult in cresults.items():
+        if name not in bresults:
+            continue
+
+        bvalue = bresults[name]["value"]
+        cvalue = cresult["value"]
+        if cresult["better"] == "higher":
+            change = (bvalue - cvalue) / bvalue if bvalue else 0.0
+
+        else:
+            change = (cvalue - bvalue) / bvalue if bvalue else 0.0
+
+        rows.append({
+            "name": name,
+            "baseline": bvalue,
+            "current": cvalue,
+            "unit": cresult["unit"],
+            "change": change,
+            "regression": change > threshold,
+        })
+
+    return rows
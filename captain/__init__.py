@@ -4,6 +4,7 @@ from .interface import Application
 from .interface import Command
 from .decorators import arg
 from .reflection import Argument
+from .middleware import Middleware
 from . import exception
 from .exception import Stop, Error
 
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Captain's own commands
+
+:example:
+    $ python -m captain build path/to/project --prefix tool.commands
+"""
+import os
+import shlex
+
+from . import Command, arg, application
+
+
+class Build(Command):
+    """Build a single file zipapp (.pyz) of a captain program
+
+    The zipapp contains the program, captain, and any --include packages,
+    all precompiled, and a snapshot of the program's command modules and
+    rendered help so it starts quickly on hosts that have never ran it
+    """
+    @arg(
+        "path",
+        help="The program's project directory or its script",
+    )
+    @arg(
+        "--prefix", "-p",
+        dest="prefixes",
+        action="append",
+        default=[],
+        help="A command prefix, autodiscovered if path is a directory",
+    )
+    @arg(
+        "--include", "-i",
+        action="append",
+        default=[],
+        help="A pure python package the program needs",
+    )
+    @arg(
+        "--output", "-o",
+        default="",
+        help="The zipapp path, defaults to the path's name with .pyz",
+    )
+    @arg(
+        "--interpreter",
+        default="/usr/bin/env python3",
+        help="The zipapp's shebang",
+    )
+    @arg(
+        "--measure",
+        type=int,
+        default=5,
+        help="How many cold starts to measure, 0 to not measure",
+    )
+    @arg(
+        "--measure-argv",
+        default="--help",
+        help="The arguments the cold starts are measured with",
+    )
+    def handle(
+        self,
+        path,
+        prefixes,
+        include,
+        output,
+        interpreter,
+        measure,
+        measure_argv,
+    ):
+        from .build import Builder
+
+        if not output:
+            name = os.path.splitext(os.path.basename(os.path.abspath(path)))[0]
+            output = f"{name}.pyz"
+
+        builder = Builder(path, prefixes=prefixes, packages=include)
+        builder.build(output, interpreter=interpreter)
+
+        snapshot = builder.snapshot
+        self.output.out(
+            f"Built {output}: {os.path.getsize(output)} bytes,"
+            f" {sum(len(ms) for ms in snapshot['modules'].values())}"
+            f" command modules, {len(snapshot['help'])} help texts"
+        )
+
+        if measure > 0:
+            timings = builder.measure(shlex.split(measure_argv), measure)
+            source = timings["source"]
+            zipped = timings["zipapp"]
+            self.output.table(
+                [
+                    ["source", round(source * 1000, 1)],
+                    ["zipapp", round(zipped * 1000, 1)],
+                    ["speedup", f"{round(source / zipped, 2)}x"],
+                ],
+                headers=["cold start", "ms"],
+            )
+
+
+if __name__ == "__main__":
+    application()
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""Build a single file zipapp of a captain program
+
+The zipapp has everything the program needs to start quickly on a host that
+has never ran it:
+
+    * every module is precompiled so nothing is compiled on the first run
+    * the modules each command prefix is made of are in a snapshot so no
+        directories are walked to find the commands, see SnapshotIndex
+    * the rendered --help and --version text is in the snapshot so those are
+        answered without importing captain or any of the commands
+
+:example:
+    $ python -m captain build path/to/project --prefix tool.commands
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+import importlib
+import importlib.util
+import py_compile
+import runpy
+import zipapp
+import time
+
+from .discover import DiscoveryIndex
+
+
+SNAPSHOT_NAME = "__captain_snapshot__"
+"""The module in the zipapp the snapshot is written to"""
+
+
+MAIN = """# -*- coding: utf-8 -*-
+# written by captain.build
+import os
+import sys
+import shutil
+
+from {snapshot_name} import SNAPSHOT
+
+# help shows defaults that come from the environment so the snapshot's help
+# is only used with the environment it was rendered with, this is
+# captain.help.get_environ without importing captain
+environ = dict(
+    (k, v) for k, v in os.environ.items() if k.startswith("CAPTAIN_")
+)
+for k in SNAPSHOT["environ"]:
+    environ[k] = os.environ.get(k, None)
+
+text = None
+if (
+    shutil.get_terminal_size().columns == SNAPSHOT["columns"]
+    and os.path.basename(sys.argv[0]) == SNAPSHOT["prog"]
+    and environ == SNAPSHOT["environ"]
+):
+    text = SNAPSHOT["help"].get(" ".join(sys.argv[1:]))
+
+if text is None:
+    from captain.build import boot
+    boot(SNAPSHOT)
+
+else:
+    sys.stdout.write(text)
+"""
+
+
+class SnapshotIndex(DiscoveryIndex):
+    """A DiscoveryIndex that answers from the modules a build found, the
+    modules are in a zipapp so there are no directories to walk"""
+    def __init__(self, modules):
+        """
+        :param modules: dict[str, list[str]], the command prefix keys with
+            the module paths found in that prefix
+        """
+        super().__init__("")
+        self.modules = modules
+        self.entries = {}
+
+    def get_entry(self, key):
+        kind, prefix, _ = key.split(":", 2)
+        if kind == "prefix" and prefix in self.modules:
+            return {
+                "names": [n for n in self.modules[prefix] if n != prefix],
+                "dirs": {},
+            }
+
+    def save(self):
+        pass
+
+
+def boot(snapshot, argv=None):
+    """Run the program a zipapp was built from, this is what the zipapp's
+    __main__ calls
+
+    :param snapshot: dict, see Builder.create_snapshot
+    :param argv: list[str], defaults to sys.argv[1:]
+    """
+    from .interface import Application
+
+    for modpath in snapshot["main"]:
+        importlib.import_module(modpath)
+
+    application = Application(
+        command_prefixes=snapshot["prefixes"],
+        discovery_index=SnapshotIndex(snapshot["modules"]),
+        plugin_group="",
+    )
+    application(argv)
+
+
+class Builder(object):
+    """Builds a zipapp of a captain program
+
+    :example:
+        builder = Builder("path/to/project", prefixes=["tool.commands"])
+        builder.build("tool.pyz")
+        print(builder.measure())
+    """
+    packages = ["captain", "datatypes"]
+    """The packages that are added to every zipapp, these are what captain
+    needs to run"""
+
+    columns = 80
+    """The help in the snapshot is rendered for this terminal width, it's
+    the width python uses when stdout isn't a terminal"""
+
+    def __init__(self, path, prefixes=None, packages=None):
+        """
+        :param path: str, the program's project directory (the directory the
+            command prefixes are imported from) or the program's script
+        :param prefixes: list[str], the command prefixes, if path is a
+            directory and there are no prefixes then the directory is
+            autodiscovered like Application does
+        :param packages: list[str], more packages the program needs, these
+            have to be pure python since extension modules can't be imported
+            from a zipapp
+        """
+        self.path = os.path.abspath(path)
+        self.prefixes = list(prefixes or [])
+        self.packages = self.packages + list(packages or [])
+        self.main = []
+        self.dirpath = ""
+        self.snapshot = {}
+
+    def build(self, output, interpreter="/usr/bin/env python3"):
+        """Build the zipapp
+
+        :param output: str, the .pyz path
+        :param interpreter: str, the zipapp's shebang line
+        :returns: str, output
+        """
+        self.dirpath = tempfile.mkdtemp(prefix="captain-build-")
+        self.output = output
+        self.copy_sources()
+        self.create_snapshot()
+        self.write_main()
+        self.compile()
+        zipapp.create_archive(
+            self.dirpath,
+            output,
+            interpreter=interpreter,
+            filter=lambda p: "__pycache__" not in p.parts,
+        )
+        shutil.rmtree(self.dirpath, ignore_errors=True)
+        return output
+
+    def copy_sources(self):
+        """Copy the program and the packages it needs into the build
+        directory"""
+        ignore = shutil.ignore_patterns("__pycache__", ".*", "*.pyc")
+        if os.path.isfile(self.path):
+            modname = os.path.splitext(os.path.basename(self.path))[0]
+            shutil.copy(self.path, os.path.join(self.dirpath, f"{modname}.py"))
+            self.main.append(modname)
+
+        else:
+            for name in os.listdir(self.path):
+                src = os.path.join(self.path, name)
+                if name.startswith(".") or name == "__pycache__":
+                    continue
+
+                if os.path.isdir(src):
+                    shutil.copytree(
+                        src,
+                        os.path.join(self.dirpath, name),
+                        ignore=ignore,
+                    )
+
+                elif name.endswith(".py"):
+                    shutil.copy(src, os.path.join(self.dirpath, name))
+
+        for name in self.packages:
+            spec = importlib.util.find_spec(name)
+            if spec.submodule_search_locations:
+                shutil.copytree(
+                    list(spec.submodule_search_locations)[0],
+                    os.path.join(self.dirpath, name),
+                    ignore=ignore,
+                    dirs_exist_ok=True,
+                )
+
+            else:
+                shutil.copy(spec.origin, self.dirpath)
+
+    def create_snapshot(self):
+        """Write the snapshot module, the snapshot is created in another
+        interpreter that imports the program from the build directory so
+        the commands are found exactly like they will be in the zipapp,
+        see create_snapshot"""
+        env = dict(os.environ)
+        env["PYTHONPATH"] = self.dirpath
+        env["COLUMNS"] = str(self.columns)
+        env.pop("CAPTAIN_PREFIX", None)
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                __name__,
+                json.dumps({
+                    "path": os.path.join(self.dirpath, f"{SNAPSHOT_NAME}.py"),
+                    "prog": os.path.basename(self.output),
+                    "main": self.main,
+                    "prefixes": self.prefixes,
+                    "columns": self.columns,
+                }),
+            ],
+            cwd=self.dirpath,
+            env=env,
+            check=True,
+        )
+
+        self.snapshot = runpy.run_path(
+            os.path.join(self.dirpath, f"{SNAPSHOT_NAME}.py"),
+        )["SNAPSHOT"]
+
+    def write_main(self):
+        with open(os.path.join(self.dirpath, "__main__.py"), "w") as fp:
+            fp.write(MAIN.format(snapshot_name=SNAPSHOT_NAME))
+
+    def compile(self):
+        """Compile every module next to its source, zipimport prefers a
+        module.pyc over a module.py, the sources are kept for tracebacks and
+        docblocks
+
+        Unchecked hash based pycs are used since zipimport would otherwise
+        compare them against the zip's (2 second resolution) timestamps
+        """
+        for dirpath, _, filenames in os.walk(self.dirpath):
+            for filename in filenames:
+                if filename.endswith(".py"):
+                    path = os.path.join(dirpath, filename)
+                    py_compile.compile(
+                        path,
+                        cfile=f"{path}c",
+                        dfile=os.path.relpath(path, self.dirpath),
+                        doraise=True,
+                        invalidation_mode=(
+                            py_compile.PycInvalidationMode.UNCHECKED_HASH
+                        ),
+                    )
+
+    def get_package_paths(self):
+        """Returns the directories .packages are imported from"""
+        paths = []
+        for name in self.packages:
+            spec = importlib.util.find_spec(name)
+            if spec.submodule_search_locations:
+                path = list(spec.submodule_search_locations)[0]
+
+            else:
+                path = spec.origin
+
+            path = os.path.dirname(os.path.abspath(path))
+            if path not in paths:
+                paths.append(path)
+
+        return paths
+
+    def get_source_command(self, dirpath):
+        """Copy the program's sources to dirpath and return the command that
+        runs the program from those sources instead of from the zipapp"""
+        if self.main:
+            path = os.path.join(dirpath, f"{self.main[0]}.py")
+            os.makedirs(dirpath)
+            shutil.copy(self.path, path)
+            return [sys.executable, path]
+
+        shutil.copytree(
+            self.path,
+            dirpath,
+            ignore=shutil.ignore_patterns("__pycache__", "*.pyc"),
+        )
+        return [
+            sys.executable,
+            "-c",
+            "import captain; captain.application(command_prefixes={})".format(
+                repr(self.prefixes),
+            ),
+        ]
+
+    def measure(self, argv=None, count=5):
+        """Measure how long the program takes to start the first time it's
+        ran on a host, from its sources and from the zipapp
+
+        Every source run compiles the program's modules (they aren't written
+        to __pycache__) and every run starts without any of captain's
+        caches, like a host that just got the program
+
+        :param argv: list[str], the arguments to run the program with
+        :param count: int, how many times to run each, the fastest run of
+            each is used
+        :returns: dict[str, float], the "source" and "zipapp" seconds
+        """
+        argv = ["--help"] if argv is None else argv
+        dirpath = tempfile.mkdtemp(prefix="captain-measure-")
+
+        src_dirpath = os.path.join(dirpath, "src")
+        commands = {
+            "source": self.get_source_command(src_dirpath),
+            "zipapp": [sys.executable, os.path.abspath(self.output)],
+        }
+
+        timings = {}
+        for name, command in commands.items():
+            timings[name] = []
+            for i in range(count):
+                env = dict(os.environ)
+                env["XDG_CACHE_HOME"] = os.path.join(dirpath, f"{name}-{i}")
+                env["PYTHONDONTWRITEBYTECODE"] = "1"
+                if name == "source":
+                    env["PYTHONPATH"] = os.pathsep.join(
+                        [src_dirpath, *self.get_package_paths()]
+                    )
+
+                start = time.perf_counter()
+                subprocess.run(
+                    command + argv,
+                    cwd=dirpath,
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    check=True,
+                )
+                timings[name].append(time.perf_counter() - start)
+
+        shutil.rmtree(dirpath, ignore_errors=True)
+        return {name: min(times) for name, times in timings.items()}
+
+
+def create_snapshot(path, prog, main, prefixes, columns):
+    """Create the snapshot module of the program
+
+    This is ran in its own interpreter, see Builder.create_snapshot
+
+    :param path: str, the snapshot module's path
+    :param prog: str, the zipapp's name, help is rendered with this name
+    :param main: list[str], the program's script modules
+    :param prefixes: list[str], the command prefixes
+    :param columns: int, the terminal width help is rendered for
+    """
+    from .interface import Application
+    from .help import HelpCache, get_environ, get_environ_names
+
+    sys.argv[0] = prog
+    for modpath in main:
+        importlib.import_module(modpath)
+
+    if prefixes:
+        # the script isn't __main__ in the zipapp so its commands are only a
+        # part of the application if it is one of the command prefixes too
+        prefixes = prefixes + main
+
+    application = Application(
+        command_prefixes=prefixes,
+        discovery_index=False,
+        plugin_group="",
+        help_cache=False,
+    )
+
+    modules = {}
+    for prefix, ms in application.command_modules.items():
+        modules[prefix] = sorted(ms)
+
+    help_cache = HelpCache("")
+    texts = {}
+    for keys, n in application.pathfinder.nodes():
+        keys = [str(k) for k in keys]
+        flags = ["--help", "-h"]
+        if n.value["version"]:
+            flags.extend(["--version", "-V"])
+
+        for flag in flags:
+            argv = keys + [flag]
+            if (text := help_cache.render(application.parser, argv)) is not None:
+                texts[" ".join(argv)] = text
+
+    snapshot = {
+        "columns": columns,
+        "prog": prog,
+        "main": main,
+        "prefixes": list(modules.keys()),
+        "modules": modules,
+        "help": texts,
+        "environ": get_environ(get_environ_names(application)),
+    }
+    with open(path, "w") as fp:
+        fp.write("# written by captain.build\n")
+        fp.write(f"SNAPSHOT = {snapshot!r}\n")
+
+
+if __name__ == "__main__":
+    create_snapshot(**json.loads(sys.argv[1]))
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 import sys
 import inspect
+import importlib
 import re
-from collections.abc import Iterable, Mapping, Callable
+from collections.abc import Iterable, Mapping, MutableMapping, Callable
 from types import ModuleType
 
 from datatypes import NamingConvention
@@ -14,6 +15,94 @@ from .io import Output, Input
 from . import exception
 
 
+class CommandRegistry(MutableMapping):
+    """Holds every command class that has been loaded into memory, the keys
+    are classpaths (<MODULE_NAME>:<CLASS_QUALNAME>) and the values are the
+    classes
+
+    The classes are also kept by module so an Application can get only the
+    classes defined in its own command modules without going through every
+    command class in the process, see .get_module_classes
+
+    This wraps a dict instead of extending it so every way of changing the
+    registry (eg, .setdefault or .update) goes through .__setitem__ and
+    .__delitem__ and keeps the module index in sync
+    """
+    def __init__(self, *args, **kwargs):
+        self.classes = {}
+        self.modules = {}
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, classpath):
+        return self.classes[classpath]
+
+    def __setitem__(self, classpath, command_class):
+        self.classes[classpath] = command_class
+        modname = classpath.partition(":")[0]
+        self.modules.setdefault(modname, {})[classpath] = command_class
+
+    def __delitem__(self, classpath):
+        del self.classes[classpath]
+        modname = classpath.partition(":")[0]
+        if classes := self.modules.get(modname):
+            classes.pop(classpath, None)
+            if not classes:
+                self.modules.pop(modname)
+
+    def __contains__(self, classpath):
+        return classpath in self.classes
+
+    def __iter__(self):
+        return iter(self.classes)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.classes!r})"
+
+    def clear(self):
+        self.classes.clear()
+        self.modules.clear()
+
+    def copy(self):
+        return type(self)(self)
+
+    def add(self, command_class):
+        """Add command_class, this is called when a Command child class is
+        created, see Command.__init_subclass__"""
+        classpath = f"{command_class.__module__}:{command_class.__qualname__}"
+        self[classpath] = command_class
+
+    def get_module_classes(self, modnames):
+        """Get the command classes defined in modnames
+
+        :param modnames: Iterable[str], module names
+        :returns: Generator[type], the command classes in the order they were
+            loaded in each module
+        """
+        for modname in modnames:
+            if classes := self.modules.get(modname):
+                yield from classes.values()
+
+    def get_namespace_classes(self, namespace):
+        """Get the command classes bound to a name in namespace and the command
+        classes nested in them, this is how a script's imported commands (eg,
+        `from foo.commands import Bar`) are found
+
+        :param namespace: Mapping[str, Any], usually a module's globals
+        :returns: Generator[type], the command classes
+        """
+        for value in namespace.values():
+            if isinstance(value, type):
+                modname = getattr(value, "__module__", "")
+                classpath = f"{modname}:{value.__qualname__}"
+                if self.classes.get(classpath) is value:
+                    for k, command_class in self.modules[modname].items():
+                        if k == classpath or k.startswith(f"{classpath}."):
+                            yield command_class
+
+
 class Command(object):
     """This is the base class of all commands and subcommands, any custom
     command should extend this class and define the .handle() method,
@@ -24,10 +113,10 @@ class Command(object):
 
     input_class = Input
 
-    command_classes = {}
+    command_classes = CommandRegistry()
     """Holds all the command classes that have been loaded into memory, the
     classpath is the key and the class object is the value, see
-    __init_subclass__"""
+    __init_subclass__ and CommandRegistry"""
 
     private = False
     """set this to True if the Command is not designed to be called"""
@@ -35,6 +124,21 @@ class Command(object):
     version = ""
     """Set this as the version for this command"""
 
+    imports = {}
+    """Modules this command needs that are too heavy to import with the
+    module the command is defined in, the key is the instance attribute and
+    the value is a module path (eg, "numpy") or a module path and a name in
+    that module (eg, "pandas:DataFrame"). These are only imported right
+    before this command runs, see .resolve_imports
+
+    :example:
+        class Plot(Command):
+            imports = {"np": "numpy", "plt": "matplotlib.pyplot"}
+
+            def handle(self):
+                self.plt.plot(self.np.arange(10))
+    """
+
     @classproperty
     def module(cls) -> ModuleType:
         """The module the child class is defined in"""
@@ -72,6 +176,15 @@ class Command(object):
 
         return name
 
+    @classmethod
+    def get_imports(cls) -> dict[str, str]:
+        """Returns the .imports of this command and all its parents, a
+        child's imports override a parent's imports with the same name"""
+        imports = {}
+        for klass in reversed(cls.__mro__):
+            imports.update(klass.__dict__.get("imports", {}))
+        return imports
+
     @classmethod
     def reflect(cls) -> ReflectCommand:
         """The interface does a lot of introspection to figure out how to call
@@ -117,7 +230,7 @@ class Command(object):
 
         https://peps.python.org/pep-0487/
         """
-        cls.command_classes[f"{cls.__module__}:{cls.__qualname__}"] = cls
+        cls.command_classes.add(cls)
 
     def __getattr__(self, k):
         """Makes the .input and .output interfaces a little more fluid, output
@@ -133,6 +246,21 @@ class Command(object):
 
         return cb
 
+    def span(self, name, **kwargs):
+        """Time a named block of code, the spans are reported when the command
+        finishes, see Output.span
+
+        :example:
+            async def handle(self):
+                with self.span("load"):
+                    # do stuff
+
+        :param name: str
+        :param **kwargs: passed through to Output.span
+        :returns: Span
+        """
+        return self.output.span(name, **kwargs)
+
     def _get_handler_method(self) -> Callable[..., int]:
         """Internal method. This returns the method that will be called in
         `.run`"""
@@ -196,6 +324,18 @@ class Command(object):
 
         return margs, mkwargs
 
+    def resolve_imports(self):
+        """Import the .imports modules and set them on this instance, this
+        is called right before the handle method"""
+        for name, path in self.get_imports().items():
+            modpath, _, attr = path.partition(":")
+            value = importlib.import_module(modpath)
+            if attr:
+                for part in attr.split("."):
+                    value = getattr(value, part)
+
+            setattr(self, name, value)
+
     async def handle(self) -> int|None:
         self.parser.print_help()
 
@@ -232,6 +372,7 @@ class Command(object):
         :returns: int, the return code
         """
         try:
+            self.resolve_imports()
             method = self._get_handler_method()
             args, kwargs = await self.get_method_params(
                 method,
@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+"""Shell completion that doesn't import the commands
+
+When a shell asks for completions this module is ran as a script (eg
+`python -I -S /path/to/captain/complete.py ...`) so it must only import from
+the stdlib, it answers from a manifest (the command tree, each command's
+flags, and each flag's choices) that the program wrote when the completion
+script was generated, see Application.complete
+
+Every keypress pays for these imports so anything that is only needed to
+write the manifest is imported where it's used, the manifest is written with
+marshal because it's builtin and loads faster than json
+
+If any of the command files changed since the manifest was written then the
+program is ran with `--captain-complete=manifest` to write a fresh manifest
+"""
+import os
+import sys
+import marshal
+
+
+class Manifest(dict):
+    """The command tree that completions are answered from
+
+    Every node in the tree is a dict with the keys:
+
+        * flags: dict[str, dict], each flag has a "value" key that is True
+            if the flag has to be followed by a value and a "choices" key
+            if the value has to be one of those choices
+        * commands: dict[str, dict], the subcommand nodes
+        * aliases: dict[str, str], alias to subcommand name
+    """
+    version = 1
+
+    NO_VALUE_ACTIONS = set([
+        "store_true",
+        "store_false",
+        "store_const",
+        "append_const",
+        "count",
+        "help",
+        "version",
+    ])
+
+    @classmethod
+    def get_path(cls, program, cache_dir=""):
+        """Returns the default manifest path of program
+
+        :param program: list[str], the command that runs the program
+        :param cache_dir: str, defaults to $XDG_CACHE_HOME/captain/complete
+        :returns: str
+        """
+        return get_cache_path(program, "complete", cache_dir)
+
+    @classmethod
+    def create(cls, application):
+        """Create the manifest of application's command tree
+
+        This reflects each command's arguments instead of adding them to the
+        command parsers, the parsers add them lazily, see
+        ArgumentParser._add_command_arguments
+
+        :param application: Application
+        :returns: Manifest
+        """
+        instance = cls(
+            version=cls.version,
+            files=get_files(application),
+            tree={},
+        )
+        for keys, n in application.pathfinder.nodes():
+            # marshal can't write str children (eg, NamingConvention)
+            keys = [str(k) for k in keys]
+            node = instance.get_node(keys)
+            value = n.value
+
+            if n.parent:
+                parent_node = instance.get_node(keys[:-1])
+                for alias in value["aliases"]:
+                    if alias != keys[-1]:
+                        parent_node["aliases"][str(alias)] = keys[-1]
+
+            value["parser"]._add_common_arguments()
+            for action in value["parser"]._actions:
+                for flag in action.option_strings:
+                    node["flags"][str(flag)] = cls.get_flag_spec(
+                        action.nargs,
+                        action.choices,
+                    )
+
+            command_class = value["command_class"]
+            rc = command_class.reflect()
+            for pas in rc.get_arguments(value["method_name"]):
+                for pa in pas:
+                    if pa.is_keyword():
+                        spec = cls.get_flag_spec(
+                            pa[1].get("nargs", None),
+                            pa[1].get("choices", None),
+                            pa[1].get("action", None),
+                        )
+                        for flag in pa[0]:
+                            if flag.startswith("-"):
+                                node["flags"][str(flag)] = spec
+
+        return instance
+
+    @classmethod
+    def get_flag_spec(cls, nargs, choices=None, action=None):
+        spec = {}
+        if action not in cls.NO_VALUE_ACTIONS and nargs not in (0, "?"):
+            spec["value"] = True
+
+        if choices:
+            spec["choices"] = [str(c) for c in choices]
+
+        return spec
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: str
+        :returns: Manifest|None, None if path doesn't exist or isn't valid
+        """
+        data = load(path)
+        if data is None or data.get("version") != cls.version:
+            return None
+
+        return cls(data)
+
+    def get_node(self, keys):
+        node = self["tree"]
+        node.setdefault("flags", {})
+        node.setdefault("commands", {})
+        node.setdefault("aliases", {})
+        for k in keys:
+            node = node["commands"].setdefault(k, {})
+            node.setdefault("flags", {})
+            node.setdefault("commands", {})
+            node.setdefault("aliases", {})
+        return node
+
+    def is_stale(self):
+        """Returns True if any of the files the commands are defined in
+        changed since the manifest was created"""
+        return is_stale(self["files"])
+
+    def write(self, path):
+        """Write the manifest, a completion never reads a partial manifest,
+        see write"""
+        write(path, dict(self))
+
+
+class Completer(object):
+    """Finds the completions of a command line
+
+    :example:
+        completer = Completer(Manifest.load(path))
+        completer.complete(["foo", "--b"]) # ["--bar"]
+    """
+    def __init__(self, manifest):
+        self.manifest = manifest
+
+    def complete(self, words):
+        """
+        :param words: list[str], the words after the program's name, the
+            last word is the one being completed (it's "" if a new word is
+            being started)
+        :returns: list[str], the completions of the last word
+        """
+        words = list(words) or [""]
+        current = words.pop()
+        node = self.manifest["tree"]
+        pending = None
+        previous = ""
+
+        for word in words:
+            if word == "=" and previous.startswith("-"):
+                # bash splits --foo=bar into "--foo", "=", and "bar"
+                pending = node["flags"].get(previous, {})
+
+            elif pending is not None:
+                # this word is the value of the previous flag
+                pending = None
+
+            elif word.startswith("-"):
+                flag = word.split("=", 1)[0]
+                spec = node["flags"].get(flag, {})
+                if spec.get("value") and "=" not in word:
+                    pending = spec
+
+            elif child := self.get_child(node, word):
+                node = child
+
+            previous = word
+
+        if pending is not None:
+            return self.get_matches(pending.get("choices", []), current)
+
+        if current == "=" and previous.startswith("-"):
+            spec = node["flags"].get(previous, {})
+            return spec.get("choices", [])
+
+        if current.startswith("-"):
+            if "=" in current:
+                flag, prefix = current.split("=", 1)
+                spec = node["flags"].get(flag, {})
+                return [
+                    f"{flag}={c}"
+                    for c in self.get_matches(spec.get("choices", []), prefix)
+                ]
+
+            return self.get_matches(node["flags"], current)
+
+        matches = self.get_matches(node["commands"], current)
+        if not matches:
+            matches = self.get_matches(node["aliases"], current)
+        return matches
+
+    def get_child(self, node, word):
+        if word in node["commands"]:
+            return node["commands"][word]
+
+        if name := node["aliases"].get(word):
+            return node["commands"][name]
+
+    def get_matches(self, names, prefix):
+        return sorted(n for n in names if n.startswith(prefix))
+
+
+def get_cache_path(program, kind, cache_dir=""):
+    """Returns the path of a cache file for program
+
+    :param program: list[str], the command that runs the program
+    :param kind: str, the cache's name, this is the cache subdirectory and
+        the file's extension
+    :param cache_dir: str, defaults to $XDG_CACHE_HOME/captain/<KIND>
+    :returns: str
+    """
+    import hashlib
+    import shlex
+
+    if not cache_dir:
+        cache_dir = os.path.join(
+            os.environ.get("XDG_CACHE_HOME", "")
+                or os.path.join(os.path.expanduser("~"), ".cache"),
+            "captain",
+            kind,
+        )
+
+    name = os.path.basename(program[-1])
+    digest = hashlib.sha1(shlex.join(program).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{name}-{digest[:10]}.{kind}")
+
+
+def get_files(application):
+    """Returns the files application's commands are defined in, a cache of
+    anything derived from the command tree is valid until one of these
+    changes, see is_stale
+
+    :param application: Application
+    :returns: dict[str, float], path to modified time
+    """
+    paths = set()
+    modules = [
+        sys.modules.get("__main__"),
+        sys.modules.get(type(application).__module__),
+    ]
+    for _, n in application.pathfinder.nodes():
+        modules.append(sys.modules.get(n.value["command_class"].__module__))
+
+    for module in modules:
+        if path := getattr(module, "__file__", ""):
+            paths.add(os.path.abspath(path))
+
+    files = {}
+    for path in paths:
+        try:
+            files[path] = os.stat(path).st_mtime
+
+        except OSError:
+            pass
+
+    return files
+
+
+def is_stale(files):
+    """Returns True if any of files changed
+
+    :param files: dict[str, float], the return value of get_files
+    :returns: bool
+    """
+    for path, mtime in files.items():
+        try:
+            if os.stat(path).st_mtime != mtime:
+                return True
+
+        except OSError:
+            return True
+
+    return False
+
+
+def load(path):
+    """
+    :param path: str
+    :returns: dict|None, None if path doesn't exist or isn't valid
+    """
+    try:
+        with open(path, "rb") as fp:
+            return marshal.load(fp)
+
+    except (OSError, ValueError, EOFError, TypeError):
+        # a file written by another python version is invalid
+        return None
+
+
+def write(path, data):
+    """Write data to a temp file then move it over path so a reader never
+    reads a partial file
+
+    :param path: str
+    :param data: dict, this can only contain builtin types
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fp:
+        marshal.dump(data, fp)
+    os.replace(tmp_path, path)
+
+
+SCRIPTS = {
+    "bash": """
+_captain_complete_{name}() {{
+    local IFS=$'\\n'
+    COMPREPLY=($({command} -- "${{COMP_WORDS[@]:1:$COMP_CWORD}}"))
+}}
+complete -o default -F _captain_complete_{name} {prog}
+""",
+    "zsh": """
+#compdef {prog}
+_captain_complete_{name}() {{
+    local -a candidates
+    candidates=(${{(f)"$({command} -- "${{(@)words[2,CURRENT]}}")"}})
+    compadd -- $candidates
+}}
+compdef _captain_complete_{name} {prog}
+""",
+    "fish": """
+function __captain_complete_{name}
+    set -l words (commandline -opc) (commandline -ct)
+    {command} -- $words[2..-1]
+end
+complete -c {prog} -f -a '(__captain_complete_{name})'
+""",
+}
+
+
+def get_script(shell, prog, program, path):
+    """Returns the completion script for shell
+
+    :param shell: str, one of the SCRIPTS keys
+    :param prog: str, the name the program is ran as in the shell
+    :param program: list[str], the command that runs the program, this is
+        used to rewrite the manifest when it's stale
+    :param path: str, the manifest path
+    :returns: str
+    """
+    import shlex
+
+    command = shlex.join([
+        sys.executable,
+        "-I",
+        "-S",
+        os.path.abspath(__file__),
+        path,
+        shlex.join(program),
+    ])
+    name = "".join(c if c.isalnum() else "_" for c in prog)
+    return SCRIPTS[shell].format(
+        name=name,
+        prog=shlex.quote(prog),
+        command=command,
+    ).strip()
+
+
+def main(argv):
+    """Print the completions, this is what the completion scripts run
+
+    :param argv: list[str], MANIFEST_PATH PROGRAM -- WORDS...
+    :returns: int
+    """
+    path, program = argv[0], argv[1]
+    words = argv[3:] if argv[2:3] == ["--"] else argv[2:]
+
+    manifest = Manifest.load(path)
+    if manifest is None or manifest.is_stale():
+        import shlex
+        import subprocess
+
+        env = dict(os.environ)
+        env["CAPTAIN_COMPLETE_PATH"] = path
+        try:
+            subprocess.run(
+                shlex.split(program) + ["--captain-complete=manifest"],
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+
+        except OSError:
+            # a stale manifest is better than no completions
+            pass
+
+        manifest = Manifest.load(path)
+
+    if manifest is not None:
+        for completion in Completer(manifest).complete(words):
+            print(completion)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from datatypes import Boolean
 from datatypes.config import Environ
 
 
@@ -18,6 +19,100 @@ class Environ(Environ):
         # AUTODISCOVER is True
         self.setdefault("AUTODISCOVER_NAME", "commands")
 
+        # how many folders deep autodiscover looks for AUTODISCOVER_NAME
+        self.setdefault("AUTODISCOVER_DEPTH", 3, type=int)
+
+        # glob patterns (separated like paths, eg `build:node_modules`) of
+        # files and folders that are never searched for commands
+        self.setdefault("AUTODISCOVER_IGNORE", "")
+
+        # True to find the command modules from an index that is only
+        # rebuilt when a directory that was searched changes, see
+        # captain.discover, this is off by default because it writes to the
+        # user's cache directory
+        self.setdefault("DISCOVERY_INDEX", False, type=Boolean)
+
+        # where the discovery index is written, defaults to a file in
+        # $XDG_CACHE_HOME/captain/discover
+        self.setdefault("DISCOVERY_INDEX_PATH", "")
+
+        # installed packages can add command prefixes with entry points in
+        # this group, plugins are ignored unless this is set, every program
+        # should use its own group (eg, "mytool.commands") so it doesn't load
+        # the plugins of other programs
+        self.setdefault("PLUGIN_GROUP", "")
+
+        # where the resolved plugin entry points are cached, defaults to a
+        # file in $XDG_CACHE_HOME/captain/plugins
+        self.setdefault("PLUGIN_INDEX_PATH", "")
+
+        # how Output.table, Output.row, and Output.record are written, this
+        # can be changed per invocation with the --format flag
+        self.setdefault("OUTPUT_FORMAT", "text")
+
+        # if True then captain's stdout and stderr are written by a writer
+        # thread so slow consumers don't block the command
+        self.setdefault("OUTPUT_QUEUE", False, type=Boolean)
+
+        # how many records can be waiting for the writer thread
+        self.setdefault("OUTPUT_QUEUE_SIZE", 10000, type=int)
+
+        # what happens when the queue is full, "block" or "drop-debug"
+        self.setdefault("OUTPUT_QUEUE_POLICY", "block")
+
+        # the most times a second a progress will be redrawn on a terminal
+        self.setdefault("PROGRESS_RATE", 10.0, type=float)
+
+        # how many seconds between progress summary lines when stdout isn't
+        # a terminal
+        self.setdefault("PROGRESS_SUMMARY_INTERVAL", 10.0, type=float)
+
+        # if True then a summary of every Output.span is printed to stderr
+        # when the command finishes
+        self.setdefault("SPANS_SUMMARY", False, type=Boolean)
+
+        # a path, if set then every Output.span is written to this file as
+        # Chrome trace event json when the command finishes
+        self.setdefault("SPANS_TRACE", "")
+
+        # how many functions --captain-profile prints
+        self.setdefault("PROFILE_TOP", 20, type=int)
+
+        # if True then the resources (time, cpu, memory, gc, output) used by
+        # each run are reported when the command finishes
+        self.setdefault("STATS", False, type=Boolean)
+
+        # a path, if set then the STATS report is written to this file as
+        # json instead of printed to stderr
+        self.setdefault("STATS_PATH", "")
+
+        # if True then the event loop is watched for blocking code while
+        # the command runs, see captain.profile.LoopMonitor
+        self.setdefault("LOOP_MONITOR", False, type=Boolean)
+
+        # how many milliseconds the event loop can be blocked before the
+        # LOOP_MONITOR logs the blocking stack, 0 or less turns the
+        # LOOP_MONITOR off
+        self.setdefault("LOOP_MONITOR_THRESHOLD", 100, type=int)
+
+        # a path, if set then a metric for every command that is ran is
+        # recorded here, a .prom path will be maintained as a Prometheus
+        # textfile, anything else is appended to as JSONL
+        self.setdefault("METRICS_PATH", "")
+
+        # where the shell completion manifest is written, defaults to a file
+        # in $XDG_CACHE_HOME/captain/complete, see captain.complete
+        self.setdefault("COMPLETE_PATH", "")
+
+        # True to answer --help and --version from a cache of their text, the
+        # cache is thrown away when any of the command files, the environment
+        # variables of the arguments, or the CAPTAIN_* configuration change
+        self.setdefault("HELP_CACHE", False, type=Boolean)
+
+        # where the help cache is written, defaults to a file in
+        # $XDG_CACHE_HOME/captain/help, see captain.help
+        self.setdefault("HELP_CACHE_PATH", "")
+
     def get_command_prefixes(self, env_name='PREFIX'):
         """this will look for CAPTAIN_PREFIX, and CAPTAIN_PREFIX_N (where
         N is 1 to infinity) in the environment, if it finds them, it will
@@ -42,6 +137,13 @@ class Environ(Environ):
         """
         return list(self.paths(env_name))
 
+    def get_autodiscover_ignore(self):
+        """Returns the AUTODISCOVER_IGNORE glob patterns
+
+        :returns: list[str]
+        """
+        return [p for p in self.split_value(self.AUTODISCOVER_IGNORE) if p]
+
 
 environ = Environ()
 
@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+"""Find command modules without walking the filesystem on every start
+
+Autodiscovery walks directories looking for the autodiscover module (eg
+`commands`) and every command prefix is walked to find its submodules, the
+index remembers which modules each walk found along with the modified time
+of every directory it walked. Adding, removing, or renaming a file or folder
+changes its directory's modified time, so the index is valid as long as none
+of those directories changed and checking that is a stat per directory
+
+Installed packages can add command prefixes with entry points, those are
+cached the same way, see PluginIndex
+"""
+import os
+import sys
+import inspect
+import fnmatch
+import importlib
+
+from .complete import get_cache_path, load, write
+from . import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class DiscoveryIndex(object):
+    """Finds modules the same way Pathfinder.find_modules does but answers
+    from an index when it can
+
+    :example:
+        index = DiscoveryIndex(path, depth=3, ignore=["node_modules"])
+        modules = index.find_modules(prefixes, paths, "commands")
+    """
+    version = 1
+
+    @classmethod
+    def get_path(cls, program, cache_dir=""):
+        """Returns the default index path of program
+
+        :param program: list[str], the command that runs the program
+        :param cache_dir: str, defaults to $XDG_CACHE_HOME/captain/discover
+        :returns: str
+        """
+        return get_cache_path(program, "discover", cache_dir)
+
+    def __init__(self, path, depth=3, ignore=None):
+        """
+        :param path: str, where the index is read from and written to
+        :param depth: int, how many folders deep autodiscovery looks
+        :param ignore: list[str], glob patterns, any file or folder whose name
+            or path (relative to where the walk started) matches one of these
+            is never walked or imported
+        """
+        self.path = path
+        self.depth = depth
+        self.ignore = [p for p in (ignore or []) if p]
+        self.entries = None
+        self.changed = False
+
+    def find_modules(self, prefixes, paths, fileroot):
+        """Find the command modules
+
+        :param prefixes: list[str], module paths, if there are prefixes then
+            paths is ignored
+        :param paths: list[str], directories to autodiscover fileroot in or
+            python files
+        :param fileroot: str, the autodiscover module name
+        :returns: dict[str, dict[str, ModuleType]], prefix keys with a dict
+            of module path keys and the module found at that path
+        """
+        modules = {}
+        seen = set()
+
+        if prefixes:
+            for prefix in prefixes:
+                self.add_prefix_modules(modules, seen, prefix)
+
+        elif paths:
+            for path in paths:
+                path = os.path.abspath(path)
+                if os.path.isdir(path):
+                    if fileroot:
+                        entry = self.get_path_entry(path, fileroot)
+                        for prefix in entry["names"]:
+                            try:
+                                self.add_prefix_modules(modules, seen, prefix)
+
+                            except ModuleNotFoundError as e:
+                                # what we found wasn't actually a module
+                                logger.warning(e)
+
+                        self.stat_entry(entry)
+
+                else:
+                    # python files aren't walked so there is nothing to index
+                    from .reflection import Pathfinder
+
+                    for name, ms in Pathfinder.get_path_modules([path]).items():
+                        for modname, m in ms.items():
+                            if modname not in seen:
+                                modules.setdefault(name, {})[modname] = m
+                                seen.add(modname)
+
+        self.save()
+        return modules
+
+    def add_prefix_modules(self, modules, seen, prefix):
+        """Import prefix and all its submodules into modules"""
+        module = importlib.import_module(prefix)
+        modnames = [prefix]
+        entry = None
+
+        if module_paths := getattr(module, "__path__", None):
+            dirpath = os.path.abspath(list(module_paths)[0])
+            key = f"prefix:{prefix}:{dirpath}"
+            entry = self.get_entry(key)
+            if entry is None:
+                names, dirpaths = self.walk_package(dirpath, prefix)
+                entry = self.set_entry(key, sorted(names), dirpaths)
+
+            modnames.extend(entry["names"])
+
+        for modname in modnames:
+            if modname not in seen:
+                m = importlib.import_module(modname)
+                modules.setdefault(prefix, {})[modname] = m
+                seen.add(modname)
+
+        if entry:
+            # the walked directories are statted again after importing
+            # because importing can add __pycache__ folders
+            self.stat_entry(entry)
+
+    def get_path_entry(self, path, fileroot):
+        """Returns the index entry whose names are the module paths of every
+        fileroot module found in path
+
+        Like ReflectPath.find_modules this only looks in the sys.path
+        directories that are in path since a module has to be importable
+        """
+        roots = []
+        for p in sys.path:
+            p = os.path.abspath(p or os.getcwd())
+            if p == path or p.startswith(path + os.sep):
+                if p not in roots:
+                    roots.append(p)
+
+        key = f"path:{path}:{fileroot}:{self.depth}:{self.ignore}:{roots}"
+        entry = self.get_entry(key)
+        if entry is None:
+            prefixes = []
+            dirpaths = []
+            for root in roots:
+                names, walked = self.walk_path(root, fileroot)
+                prefixes.extend(names)
+                dirpaths.extend(walked)
+            entry = self.set_entry(key, prefixes, dirpaths)
+
+        return entry
+
+    def walk_path(self, root, fileroot):
+        """Walk root depth folders deep looking for fileroot modules,
+        folders that start with an underscore or period are skipped
+
+        :returns: tuple[list[str], list[str]], the found module paths and
+            the walked directories
+        """
+        names = []
+        dirpaths = []
+        stack = [(root, [], 1)]
+        while stack:
+            dirpath, parts, depth = stack.pop()
+            dirpaths.append(dirpath)
+            for entry in self.scandir(dirpath, root):
+                if entry.name.startswith(("_", ".")):
+                    continue
+
+                if entry.is_dir():
+                    if entry.name == fileroot:
+                        names.append(".".join(parts + [entry.name]))
+
+                    elif depth < self.depth:
+                        stack.append(
+                            (entry.path, parts + [entry.name], depth + 1)
+                        )
+
+                elif inspect.getmodulename(entry.name) == fileroot:
+                    names.append(".".join(parts + [fileroot]))
+
+        return sorted(set(names)), dirpaths
+
+    def walk_package(self, dirpath, prefix):
+        """Walk the package at dirpath for all its submodules, this finds
+        the same modules as ReflectModule.find_module_names
+
+        :returns: tuple[list[str], list[str]], the found module paths and
+            the walked directories
+        """
+        names = []
+        dirpaths = []
+        stack = [(dirpath, prefix)]
+        while stack:
+            path, modprefix = stack.pop()
+            dirpaths.append(path)
+            for entry in self.scandir(path, dirpath):
+                if entry.is_dir():
+                    name = entry.name
+                    if (
+                        "." in name
+                        or not os.path.isfile(
+                            os.path.join(entry.path, "__init__.py")
+                        )
+                    ):
+                        continue
+
+                else:
+                    name = inspect.getmodulename(entry.name)
+                    if not name or "." in name or name == "__init__":
+                        continue
+
+                if name.startswith("_") and name != "__main__":
+                    continue
+
+                names.append(f"{modprefix}.{name}")
+                if entry.is_dir():
+                    stack.append((entry.path, f"{modprefix}.{name}"))
+
+        return names, dirpaths
+
+    def scandir(self, dirpath, root):
+        """Yield the entries of dirpath that aren't ignored"""
+        try:
+            entries = list(os.scandir(dirpath))
+
+        except OSError:
+            return
+
+        for entry in entries:
+            relpath = os.path.relpath(entry.path, root)
+            if not any(
+                fnmatch.fnmatch(entry.name, pattern)
+                or fnmatch.fnmatch(relpath, pattern)
+                for pattern in self.ignore
+            ):
+                yield entry
+
+    def load(self):
+        if self.entries is None:
+            data = load(self.path)
+            if data is None or data.get("version") != self.version:
+                data = {}
+            self.entries = data.get("entries", {})
+
+        return self.entries
+
+    def get_entry(self, key):
+        """Returns the index entry for key if none of its directories changed
+
+        :param key: str
+        :returns: dict|None
+        """
+        entry = self.load().get(key, None)
+        if entry and not self.is_stale(entry):
+            return entry
+
+    def set_entry(self, key, names, dirpaths):
+        entry = {"names": list(names), "dirs": dict.fromkeys(dirpaths, 0)}
+        self.stat_entry(entry)
+        self.load()[key] = entry
+        self.changed = True
+        return entry
+
+    def stat_entry(self, entry):
+        for dirpath in entry["dirs"]:
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+
+            except OSError:
+                mtime = 0
+
+            if entry["dirs"][dirpath] != mtime:
+                entry["dirs"][dirpath] = mtime
+                self.changed = True
+
+    def is_stale(self, entry):
+        """Returns True if any of entry's directories changed"""
+        for dirpath, mtime in entry["dirs"].items():
+            try:
+                if os.stat(dirpath).st_mtime_ns != mtime:
+                    return True
+
+            except OSError:
+                return True
+
+        return False
+
+    def save(self):
+        """Write the index if it changed, entries whose directories changed
+        are dropped so the index doesn't grow forever"""
+        if self.changed:
+            entries = {
+                k: entry
+                for k, entry in self.load().items()
+                if not self.is_stale(entry)
+            }
+            try:
+                write(self.path, {"version": self.version, "entries": entries})
+
+            except OSError as e:
+                # the index is only an optimization
+                logger.warning(e)
+
+            self.changed = False
+
+
+class PluginIndex(object):
+    """Finds the command prefixes installed packages provide with entry
+    points
+
+    Each entry point's name is the subcommand the plugin provides and its
+    value is the command prefix that subcommand is found in, the subcommand
+    is the prefix's module with that name (eg, foo_package.commands.foo) and
+    the prefix's other modules aren't a part of the program, see
+    .get_modules
+
+    The group is the program's, every program that takes plugins should have
+    its own group so it doesn't load other programs' plugins
+
+    :example:
+        # the plugin's pyproject.toml
+        [project.entry-points."mytool.commands"]
+        foo = "foo_package.commands"
+
+    Reading every installed distribution's metadata is slow so the entry
+    points are cached until one of the sys.path directories changes, which
+    happens when a distribution is installed or removed
+    """
+    version = 1
+
+    @classmethod
+    def get_path(cls, program, cache_dir=""):
+        """Returns the default plugin index path of program
+
+        :param program: list[str], the command that runs the program
+        :param cache_dir: str, defaults to $XDG_CACHE_HOME/captain/plugins
+        :returns: str
+        """
+        return get_cache_path(program, "plugins", cache_dir)
+
+    @classmethod
+    def get_name(cls, name):
+        """Normalize a subcommand name so foo_bar and Foo-Bar are the same"""
+        return name.lower().replace("_", "-")
+
+    def __init__(self, path, group):
+        """
+        :param path: str, where the index is read from and written to
+        :param group: str, the entry point group
+        """
+        self.path = path
+        self.group = group
+
+    def get_dirs(self):
+        """Returns the sys.path directories and their modified times
+
+        :returns: dict[str, int]
+        """
+        dirs = {}
+        for p in sys.path:
+            p = os.path.abspath(p or os.getcwd())
+            try:
+                dirs[p] = os.stat(p).st_mtime_ns
+
+            except OSError:
+                pass
+
+        return dirs
+
+    def get_entry_points(self):
+        """Returns the group's entry points
+
+        :returns: list[list[str]], each item is [NAME, PREFIX]
+        """
+        dirs = self.get_dirs()
+        data = load(self.path)
+        if (
+            data
+            and data.get("version") == self.version
+            and data.get("group") == self.group
+            and data.get("dirs") == dirs
+        ):
+            return data["entry_points"]
+
+        from importlib.metadata import entry_points
+
+        eps = sorted(
+            [ep.name, ep.value.split(":", 1)[0].strip()]
+            for ep in entry_points(group=self.group)
+        )
+
+        try:
+            write(self.path, {
+                "version": self.version,
+                "group": self.group,
+                "dirs": dirs,
+                "entry_points": eps,
+            })
+
+        except OSError as e:
+            # the index is only an optimization
+            logger.warning(e)
+
+        return eps
+
+    def get_prefixes(self, argv=None):
+        """Returns the command prefixes of the plugins argv could run
+
+        Only argv's subcommand (its first argument that isn't a flag) is
+        matched against the plugins' names, so a value that is passed to a
+        command can't select a plugin
+
+        :param argv: list[str]|None, None to return every plugin's prefix
+            (eg, for --help)
+        :returns: dict[str, list[str]], the command prefix keys with the
+            (normalized) subcommand names of that prefix's plugins
+        """
+        eps = self.get_entry_points()
+        if argv is not None:
+            subcommand = ""
+            for a in argv:
+                if a == "--":
+                    break
+
+                elif not a.startswith("-"):
+                    subcommand = self.get_name(a)
+                    break
+
+            eps = [ep for ep in eps if self.get_name(ep[0]) == subcommand]
+
+        prefixes = {}
+        for name, prefix in eps:
+            prefixes.setdefault(prefix, []).append(self.get_name(name))
+        return prefixes
+
+    def get_modules(self, prefixes, modules):
+        """Returns only the modules of the plugins' subcommands, a plugin's
+        name is the one subcommand it provides so the other modules of its
+        prefix can't add other subcommands (eg, a Default command in the
+        prefix's __init__.py would replace the program's default command)
+
+        :param prefixes: dict[str, list[str]], see .get_prefixes
+        :param modules: dict[str, dict[str, ModuleType]], the modules found
+            in prefixes, see DiscoveryIndex.find_modules
+        :returns: dict[str, dict[str, ModuleType]]
+        """
+        ret = {}
+        for prefix, ms in modules.items():
+            names = prefixes.get(prefix, [])
+            ret[prefix] = {}
+            for modname, m in ms.items():
+                subcommand = modname[len(prefix) + 1:].split(".", 1)[0]
+                if subcommand and self.get_name(subcommand) in names:
+                    ret[prefix][modname] = m
+
+            if not ret[prefix]:
+                logger.warning(
+                    "Plugin prefix %s has no %s module",
+                    prefix,
+                    " or ".join(names),
+                )
+
+        return ret
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Answer --help and --version without building the command tree
+
+Rendering help means importing every command module, building every parser,
+and wrapping every description, so the rendered text is cached per command
+line and the cache is thrown away when any of the command files change, the
+same way the completion manifest is, see captain.complete
+
+Help also shows defaults that come from the environment, so the cache is
+also thrown away when the program's version, any of the environment
+variables of the arguments (eg "$FOO"), or any of captain's CAPTAIN_*
+configuration changes
+"""
+import io
+import os
+import shutil
+from contextlib import redirect_stdout
+
+from .config import environ
+from .complete import get_cache_path, is_stale, load, write
+
+
+def get_environ_names(application):
+    """Returns the environment variables application's arguments can get
+    their defaults from, see ArgumentParser.add_argument
+
+    :param application: Application
+    :returns: list[str]
+    """
+    names = set()
+    for _, n in application.pathfinder.nodes():
+        for action in n.value["parser"]._actions:
+            names.update(getattr(action, "environ_names", []))
+
+    return sorted(names)
+
+
+def get_environ(names=None):
+    """Returns the environment help is rendered with, a cache of help is
+    valid until this changes
+
+    :param names: Iterable[str], the environment variables of the
+        arguments, see get_environ_names
+    :returns: dict[str, str|None], all the CAPTAIN_* configuration and the
+        value of each of names (None if it isn't set)
+    """
+    ret = {}
+    for k, v in os.environ.items():
+        if k.startswith(environ.namespace):
+            ret[k] = v
+
+    for name in names or []:
+        ret[name] = os.environ.get(name, None)
+
+    return ret
+
+
+class HelpCache(object):
+    """The rendered --help and --version text of a program
+
+    :example:
+        help_cache = HelpCache(path, program_version)
+        key = HelpCache.get_key(["foo", "--help"])
+        text = help_cache.get(key)
+        if text is None:
+            text = help_cache.render(parser, ["foo", "--help"])
+            help_cache.set(
+                key,
+                text,
+                get_files(application),
+                get_environ(get_environ_names(application)),
+            )
+    """
+    version = 2
+
+    FLAGS = set(["--help", "-h", "--version", "-V"])
+    """Only command lines ending with one of these flags are cached"""
+
+    @classmethod
+    def get_path(cls, program, cache_dir=""):
+        """Returns the default help cache path of program
+
+        :param program: list[str], the command that runs the program
+        :param cache_dir: str, defaults to $XDG_CACHE_HOME/captain/help
+        :returns: str
+        """
+        return get_cache_path(program, "help", cache_dir)
+
+    @classmethod
+    def get_key(cls, argv):
+        """Returns the cache key of argv
+
+        argv can only be subcommand names followed by a help or version flag,
+        any other flag could take a value or change the output so those
+        command lines aren't cached. Help is wrapped to the terminal's width
+        so the width is part of the key
+
+        :param argv: list[str]
+        :returns: str, empty if argv can't be cached
+        """
+        words = []
+        for arg in argv:
+            if arg in cls.FLAGS:
+                columns = shutil.get_terminal_size().columns
+                return " ".join([str(columns), *words, arg])
+
+            elif arg.startswith("-"):
+                break
+
+            words.append(arg)
+
+        return ""
+
+    def __init__(self, path, program_version=""):
+        """
+        :param path: str, where the cache is written
+        :param program_version: str, the program's version, the --version
+            text could come from somewhere other than the command files so
+            the cache is only valid for this version
+        """
+        self.path = path
+        self.program_version = program_version
+
+    def load(self):
+        """
+        :returns: dict|None, None if the cache doesn't exist or is stale
+        """
+        data = load(self.path)
+        if (
+            data is None
+            or data.get("version") != self.version
+            or data["program_version"] != self.program_version
+            or is_stale(data["files"])
+            or data["environ"] != get_environ(data["environ"])
+        ):
+            return None
+
+        return data
+
+    def get(self, key):
+        """
+        :param key: str, see .get_key
+        :returns: str|None, None on a cache miss
+        """
+        if data := self.load():
+            return data["entries"].get(key, None)
+
+    def set(self, key, text, files, environ=None):
+        """
+        :param key: str, see .get_key
+        :param text: str, the rendered help
+        :param files: dict[str, float], the files the text was rendered from,
+            see captain.complete.get_files
+        :param environ: dict[str, str|None], the environment the text was
+            rendered with, defaults to get_environ()
+        """
+        if environ is None:
+            environ = get_environ()
+
+        data = self.load()
+        if (
+            data is None
+            or data["files"] != files
+            or data["environ"] != environ
+        ):
+            data = {
+                "version": self.version,
+                "program_version": self.program_version,
+                "files": files,
+                "environ": environ,
+                "entries": {},
+            }
+
+        data["entries"][key] = text
+        write(self.path, data)
+
+    def render(self, parser, argv):
+        """Returns the text parser prints for argv
+
+        :param parser: ArgumentParser
+        :param argv: list[str]
+        :returns: str|None, None if parsing argv didn't print and exit
+        """
+        with redirect_stdout(io.StringIO()) as buffer:
+            try:
+                parser.parse_args(argv)
+
+            except SystemExit as e:
+                if e.code:
+                    raise
+
+                return buffer.getvalue()
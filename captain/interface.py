@@ -1,15 +1,38 @@
 # -*- coding: utf-8 -*-
+import os
 import sys
 import asyncio
+import time
+import functools
+import argparse
 
 from datatypes import Dirpath
 
 from .compat import *
 #from .parse import Router
-from .parse import ArgumentParser, QuietAction
+from .parse import (
+    ArgumentParser,
+    QuietAction,
+    FormatAction,
+    ProfileAction,
+    MemoryProfileAction,
+    BenchmarkAction,
+    CompleteAction,
+)
 from .reflection import Pathfinder
 from .call import Command
+from .middleware import (
+    MiddlewareChain,
+    ResourceStatsMiddleware,
+    MemoryProfileMiddleware,
+    LoopMonitorMiddleware,
+    MetricsMiddleware,
+    ProfileMiddleware,
+    SpansMiddleware,
+)
+from .help import HelpCache, get_environ, get_environ_names
 from .config import environ
+from . import logging
 
 
 class Application(object):
@@ -39,7 +62,49 @@ class Application(object):
 
         :param command_prefixes: list[str]|str, a command prefix is a module
             path where Command definitions can be found
+        :keyword stats: bool, True to report the resources each run used,
+            see captain.profile.ResourceStats
+        :keyword stats_path: str, write the stats report as json to this
+            path instead of stderr
+        :keyword loop_monitor: bool, True to watch the event loop for
+            blocking code while a command runs, see
+            captain.profile.LoopMonitor
+        :keyword metrics_sink: captain.metrics.MetricsSink, records a metric
+            for every command that is ran
+        :keyword metrics_path: str, if there is no metrics_sink then one is
+            created for this path, see MetricsSink.create
+        :keyword middlewares: list[captain.middleware.Middleware], these wrap
+            every run, see .add_middleware
+        :keyword discovery_index: bool|captain.discover.DiscoveryIndex, True
+            to find the command modules from an index instead of walking the
+            filesystem on every start, see captain.discover.DiscoveryIndex
+        :keyword discovery_index_path: str, where the index is written
+        :keyword autodiscover_depth: int, how many folders deep to look for
+            the autodiscover module
+        :keyword autodiscover_ignore: list[str], glob patterns of files and
+            folders that are never searched for commands
+        :keyword plugin_group: str, the entry point group installed packages
+            add command prefixes to, defaults to CAPTAIN_PLUGIN_GROUP,
+            plugins are ignored if this is empty, see
+            captain.discover.PluginIndex
+        :keyword plugin_index_path: str, where the plugin index is written
+        :keyword help_cache: bool, True to answer --help and --version from
+            a cache of their text, defaults to CAPTAIN_HELP_CACHE (False),
+            see captain.help.HelpCache
         """
+        # the first run's startup is measured from here, this is when captain
+        # starts finding commands and building parsers, every other run's
+        # startup is measured from when .run is called
+        self.created = time.perf_counter()
+        self.started = self.created
+        self.stats = kwargs.get("stats", environ.STATS)
+        self.stats_path = kwargs.get("stats_path", environ.STATS_PATH)
+        self.loop_monitor = kwargs.get("loop_monitor", environ.LOOP_MONITOR)
+        self.metrics_sink = self._create_metrics_sink(**kwargs)
+        self.middleware = self._create_middleware_chain(
+            kwargs.get("middlewares", []),
+        )
+
         self.parser_class = kwargs.get("parser_class", self.parser_class)
         self.command_class = kwargs.get("command_class", self.command_class)
         self.pathfinder_class = kwargs.get(
@@ -47,14 +112,39 @@ class Application(object):
             self.pathfinder_class,
         )
 
-        self.command_modules = self._find_modules(
-            prefixes=command_prefixes,
-            paths=paths,
-            **kwargs,
+        # the commands are found and the parsers are built the first time
+        # they're needed so --help and --version can be answered from the
+        # help cache without importing any commands, see .run
+        self.command_prefixes = command_prefixes
+        self.paths = paths
+        self.kwargs = kwargs
+
+        # the argv being ran, plugins that argv doesn't run aren't imported
+        self.argv = None
+        self.plugin_prefixes = {}
+
+        self.help_cache = kwargs.get("help_cache", environ.HELP_CACHE)
+        self.queue_listener = self._create_queue_listener(**kwargs)
+
+    @functools.cached_property
+    def command_modules(self):
+        return self._find_modules(
+            prefixes=self.command_prefixes,
+            paths=self.paths,
+            **self.kwargs,
         )
 
-        self.pathfinder = self._create_pathfinder(**kwargs)
-        self.parser = self._create_parser(**kwargs)
+    @functools.cached_property
+    def pathfinder(self) -> Pathfinder:
+        # every node gets its parser when the tree is built, ._create_parser
+        # needs the tree so it's cached before the parsers are built
+        self.__dict__["pathfinder"] = self._create_pathfinder(**self.kwargs)
+        self._create_parser(**self.kwargs)
+        return self.__dict__["pathfinder"]
+
+    @functools.cached_property
+    def parser(self) -> ArgumentParser:
+        return self.pathfinder.value["parser"]
 
     def _find_modules(self, prefixes, paths, **kwargs):
         if prefixes is None:
@@ -64,15 +154,86 @@ class Application(object):
             if isinstance(prefixes, str):
                 prefixes = environ.split_value(prefixes)
 
-        if not paths and not self.command_class.command_classes:
+        if not paths and not self._get_script_command_classes():
             paths = [Dirpath.cwd()]
 
-        return self.pathfinder_class.find_modules(
-            prefixes,
-            paths,
-            kwargs.get("autodiscover_name", environ.AUTODISCOVER_NAME),
+        find_modules = self.pathfinder_class.find_modules
+        if index := kwargs.get("discovery_index", environ.DISCOVERY_INDEX):
+            from .discover import DiscoveryIndex
+
+            if not isinstance(index, DiscoveryIndex):
+                index = DiscoveryIndex(
+                    (
+                        kwargs.get("discovery_index_path", "")
+                        or environ.DISCOVERY_INDEX_PATH
+                        or DiscoveryIndex.get_path(self.get_program())
+                    ),
+                    depth=kwargs.get(
+                        "autodiscover_depth",
+                        environ.AUTODISCOVER_DEPTH,
+                    ),
+                    ignore=kwargs.get(
+                        "autodiscover_ignore",
+                        environ.get_autodiscover_ignore(),
+                    ),
+                )
+            find_modules = index.find_modules
+
+        fileroot = kwargs.get("autodiscover_name", environ.AUTODISCOVER_NAME)
+        modules = find_modules(prefixes, paths, fileroot)
+
+        self.plugin_prefixes = {}
+        if plugin_index := self._create_plugin_index(**kwargs):
+            self.plugin_prefixes = plugin_index.get_prefixes(
+                self._get_plugin_argv(),
+            )
+            if self.plugin_prefixes:
+                modules.update(plugin_index.get_modules(
+                    self.plugin_prefixes,
+                    find_modules(list(self.plugin_prefixes), None, fileroot),
+                ))
+
+        return modules
+
+    def _create_plugin_index(self, **kwargs):
+        """Internal method. Creates the index of the installed plugins
+
+        :returns: captain.discover.PluginIndex|None, None if there isn't a
+            plugin group
+        """
+        group = kwargs.get("plugin_group", environ.PLUGIN_GROUP)
+        if not group:
+            return None
+
+        from .discover import PluginIndex
+
+        return PluginIndex(
+            (
+                kwargs.get("plugin_index_path", "")
+                or environ.PLUGIN_INDEX_PATH
+                or PluginIndex.get_path(self.get_program())
+            ),
+            group,
         )
 
+    def _get_plugin_argv(self) -> list[str]|None:
+        """Internal method. Returns the argv that selects the plugins to
+        import, None if every plugin has to be imported because the argv
+        shows every subcommand (eg, --help or --captain-complete)"""
+        argv = self.argv
+        if argv is not None:
+            if CompleteAction.in_argv(argv):
+                return None
+
+            for a in argv:
+                if a == "--":
+                    break
+
+                elif a == "-h" or a == "--help":
+                    return None
+
+        return argv
+
     def _create_pathfinder(self, **kwargs) -> Pathfinder:
         """Internal method. Create the tree that will be used to resolve a
         requested path to a found controller
@@ -86,12 +247,52 @@ class Application(object):
             command_class=self.command_class,
         )
 
-        for command_class in self.command_class.command_classes.values():
+        for command_class in self.get_command_classes():
             if not command_class.is_private():
                 pathfinder.add_class(command_class)
 
         return pathfinder
 
+    def get_command_classes(self) -> Iterable[type]:
+        """Get the command classes of this application
+
+        These are the classes defined in the found command modules plus the
+        script's command classes (see ._get_script_command_classes), so
+        command classes other libraries define, or another application's
+        commands, aren't a part of this application unless the script
+        imported them
+
+        :returns: the Command child classes
+        """
+        modnames = []
+        for modules in self.command_modules.values():
+            modnames.extend(modules.keys())
+
+        command_classes = self.command_class.command_classes
+        return list(dict.fromkeys([
+            *command_classes.get_module_classes(modnames),
+            *self._get_script_command_classes(),
+        ]))
+
+    def _get_script_command_classes(self) -> list[type]:
+        """Internal method. Get the command classes of the running script,
+        these are the classes defined in __main__ or in the module this
+        application's class is defined in, and the classes __main__ imported
+        (eg, `from foo.commands import Bar`)
+
+        :returns: the Command child classes
+        """
+        command_classes = self.command_class.command_classes
+        modnames = dict.fromkeys(["__main__", type(self).__module__])
+        script_classes = list(command_classes.get_module_classes(modnames))
+
+        if main_module := sys.modules.get("__main__", None):
+            script_classes.extend(command_classes.get_namespace_classes(
+                vars(main_module),
+            ))
+
+        return script_classes
+
     def _create_parser(self, **kwargs) -> ArgumentParser:
         """This creates and returns the root parser
 
@@ -114,7 +315,7 @@ class Application(object):
 
                     parser = subparsers.add_parser(
                         subcommand,
-                        parents=[common_parser],
+                        common_parser=common_parser,
                         help=value["description"],
                         description=value["description"],
                         conflict_handler="resolve",
@@ -124,17 +325,10 @@ class Application(object):
                 else:
                     parser = self.parser_class(
                         description=value["description"],
-                        parents=[common_parser],
+                        common_parser=common_parser,
                         conflict_handler="resolve",
                     )
 
-                if value["version"]:
-                    parser.add_argument(
-                        "--version", "-V",
-                        action='version',
-                        version="%(prog)s {}".format(value["version"])
-                    )
-
                 parser.set_defaults(
                     _pathfinder_node=n,
                 )
@@ -158,20 +352,25 @@ class Application(object):
         This fixes that problem by creating this common instance and using it
         as a base, the subcommand will inherit the common flags/arguments also,
         so the flags will work the same way on the left or right side of the
-        SUBCOMMAND
+        SUBCOMMAND. The common flags are only created once, every parser
+        references this instance and adds its flags when it is used, see
+        ArgumentParser._add_common_arguments
 
         :keyword version: str, optional, the version of the script
         :keyword quiet: bool, default is True, pass in False if you don't
             want the default quiet functionality to be active
+        :keyword output_format: bool, default is True, pass in False if you
+            don't want the --format flag
+        :keyword profile: bool, default is True, pass in False if you don't
+            want the --captain-profile, --captain-memprofile, and
+            --captain-bench flags
+        :keyword complete: bool, default is True, pass in False if you don't
+            want the --captain-complete flag
         """
         parser = self.parser_class(add_help=False)
         # !!! you can't have a normal group and mutually exclusive group
 
-        version = kwargs.get("version", "")
-        if not version:
-            if m := sys.modules.get("__main__"):
-                version = getattr(m, "__version__", "")
-
+        version = self.get_version(**kwargs)
         if version:
             parser.add_argument(
                 "--version", "-V",
@@ -194,8 +393,143 @@ class Application(object):
                 action=QuietAction,
             )
 
+        if kwargs.get("output_format", True):
+            parser.add_argument(
+                "--format",
+                action=FormatAction,
+            )
+
+        # the --captain-* flags are internal diagnostics so they work on
+        # every command but they aren't in the usage or --help of any command
+        if kwargs.get("profile", True):
+            parser.add_argument(
+                "--captain-profile",
+                action=ProfileAction,
+                help=argparse.SUPPRESS,
+            )
+
+            parser.add_argument(
+                MemoryProfileAction.FLAG,
+                action=MemoryProfileAction,
+                help=argparse.SUPPRESS,
+            )
+
+            parser.add_argument(
+                BenchmarkAction.FLAG,
+                action=BenchmarkAction,
+                help=argparse.SUPPRESS,
+            )
+
+        if kwargs.get("complete", True):
+            parser.add_argument(
+                CompleteAction.FLAG,
+                action=CompleteAction,
+                help=argparse.SUPPRESS,
+            )
+
         return parser
 
+    def _create_queue_listener(
+        self,
+        **kwargs,
+    ) -> logging.QueueListener|None:
+        """Internal method. Creates the listener that will write stdout and
+        stderr in a writer thread when the application is called
+
+        :keyword output_queue: bool, True to write output in a writer thread
+            so a slow stdout/stderr consumer doesn't block the command
+        :keyword output_queue_size: int, how many records can be waiting
+        :keyword output_queue_policy: str, "block" or "drop-debug", see
+            captain.logging.QueueHandler
+        :returns: the listener or None if output_queue is False
+        """
+        if not kwargs.get("output_queue", environ.OUTPUT_QUEUE):
+            return None
+
+        return logging.QueueListener(
+            [logging.stdout, logging.stderr],
+            maxsize=kwargs.get("output_queue_size", environ.OUTPUT_QUEUE_SIZE),
+            policy=kwargs.get(
+                "output_queue_policy",
+                environ.OUTPUT_QUEUE_POLICY,
+            ),
+        )
+
+    def _create_metrics_sink(self, **kwargs):
+        """Internal method. Creates the sink that records a metric for every
+        command that is ran
+
+        :returns: captain.metrics.MetricsSink|None
+        """
+        if sink := kwargs.get("metrics_sink", None):
+            return sink
+
+        if path := kwargs.get("metrics_path", environ.METRICS_PATH):
+            from .metrics import MetricsSink
+
+            return MetricsSink.create(path)
+
+    def _create_parse_diagnostics(self, argv, started):
+        """Internal method. Creates the diagnostics middleware that have to
+        start before argv is parsed
+
+        :param argv: list[str]
+        :param started: float, the perf_counter time the run started
+        :returns: list[captain.middleware.DiagnosticMiddleware]
+        """
+        diagnostics = []
+        if self.stats:
+            diagnostics.append(ResourceStatsMiddleware(self, started))
+
+        if (
+            self.kwargs.get("profile", True)
+            and MemoryProfileAction.in_argv(argv)
+        ):
+            diagnostics.append(MemoryProfileMiddleware())
+
+        return diagnostics
+
+    def _create_handle_diagnostics(self, parsed):
+        """Internal method. Creates the diagnostics middleware the parsed
+        command will be ran with
+
+        :param parsed: argparse.Namespace
+        :returns: list[captain.middleware.DiagnosticMiddleware]
+        """
+        diagnostics = []
+        if self.loop_monitor and environ.LOOP_MONITOR_THRESHOLD > 0:
+            diagnostics.append(LoopMonitorMiddleware())
+
+        if self.metrics_sink:
+            diagnostics.append(MetricsMiddleware(self.metrics_sink))
+
+        if profile_path := getattr(parsed, ProfileAction.DEST, ""):
+            diagnostics.append(ProfileMiddleware(profile_path))
+
+        if environ.SPANS_SUMMARY or environ.SPANS_TRACE:
+            diagnostics.append(SpansMiddleware())
+
+        return diagnostics
+
+    def _create_middleware_chain(self, middlewares) -> MiddlewareChain:
+        """Internal method. Compiles the middlewares into the chain .run
+        uses, this is only done when the middlewares change"""
+        return MiddlewareChain(middlewares, self._handle_command)
+
+    def add_middleware(self, middleware):
+        """Add middleware to the end of the chain, the first middleware
+        added is the outermost
+
+        :param middleware: captain.middleware.Middleware
+        """
+        self.middleware = self._create_middleware_chain(
+            [*self.middleware.middlewares, middleware],
+        )
+
+    async def _handle_command(self, command, args, kwargs) -> int:
+        """Internal method. The innermost handler of the middleware chain"""
+        return await command.run(*args, **kwargs)
+
     def _create_command(self, node: Pathfinder) -> Command:
         """Internal method to this class. Creates the command instance that
         will be ran"""
@@ -236,6 +570,159 @@ class Application(object):
         command = self._create_command(parser._defaults["_pathfinder_node"])
         return await command.run(*args, **kwargs)
 
+    async def _parse_command(self, argv):
+        """Internal method. Parse argv and create the command that will
+        handle it
+
+        :param argv: list[str]
+        :returns: tuple[argparse.Namespace, Command, list, dict], the parsed
+            namespace, the command, and the args and kwargs the command
+            will be ran with
+        """
+        parsed = self.parser.parse_args(argv)
+        command = self._create_command(parsed._pathfinder_node)
+
+        if output_format := getattr(parsed, FormatAction.DEST, ""):
+            command.output.output_format = output_format
+
+        args, kwargs = await command.get_parsed_params(parsed)
+        return parsed, command, args, kwargs
+
+    async def bench(self, argv, n=BenchmarkAction.CONST, warmup=10):
+        """Run argv n times in-process, the same way .run would run it,
+        and time each run
+
+        Each run parses argv, creates the command, and runs it through the
+        middleware, the command's output is written to os.devnull
+
+        :example:
+            benchmark = await application.bench(["foo", "--bar=1"], n=1000)
+            benchmark.write(Output())
+
+        :param argv: list[str]
+        :param n: int, how many runs are timed
+        :param warmup: int, how many runs happen before the timed runs
+        :returns: captain.profile.Benchmark
+        """
+        from .profile import Benchmark
+
+        benchmark = Benchmark()
+        with benchmark.suppress():
+            for i in range(-warmup, n):
+                start = time.perf_counter()
+                parsed, command, args, kwargs = await self._parse_command(
+                    argv,
+                )
+                benchmark.silence(command.output)
+                if self.middleware.after_parse_hooks:
+                    await self.middleware.after_parse(self, parsed, command)
+
+                parse_stop = time.perf_counter()
+                ret_code = await self.middleware.handle(command, args, kwargs)
+                stop = time.perf_counter()
+
+                if self.middleware.after_exit_hooks:
+                    await self.middleware.after_exit(self, command, ret_code)
+
+                if i >= 0:
+                    benchmark.add(parse_stop - start, stop - parse_stop)
+
+        return benchmark
+
+    def get_version(self, **kwargs) -> str:
+        """Returns the version the --version flag prints
+
+        :keyword version: str, defaults to the __version__ of __main__
+        :returns: str, empty if there isn't a version
+        """
+        version = kwargs.get("version", "")
+        if not version:
+            if m := sys.modules.get("__main__"):
+                version = getattr(m, "__version__", "")
+
+        return version
+
+    def get_skipped_imports(self) -> list[str]:
+        """Returns the modules commands declared in .imports that were never
+        imported, these are the heavy imports that commands which didn't
+        run saved, see Command.imports
+
+        :returns: list[str], the module paths
+        """
+        skipped = set()
+        for _, n in self.pathfinder.nodes():
+            command_class = n.value["command_class"]
+            for path in command_class.get_imports().values():
+                modpath = path.partition(":")[0]
+                if modpath not in sys.modules:
+                    skipped.add(modpath)
+
+        return sorted(skipped)
+
+    def get_program(self) -> list[str]:
+        """Returns the command that runs this program, see .complete"""
+        m = sys.modules.get("__main__")
+        spec = getattr(m, "__spec__", None)
+        if spec and spec.name != "__main__":
+            # a zipapp or a directory's __main__ is ran by its path
+            return [sys.executable, "-m", spec.name]
+
+        return [sys.executable, os.path.abspath(sys.argv[0])]
+
+    def complete(self, shell="bash"):
+        """Write the completion manifest and print the completion script
+        for shell, the script's completions are answered from the manifest
+        without importing any commands, see captain.complete
+
+        :example:
+            # add to ~/.bashrc
+            eval "$(script.py --captain-complete=bash)"
+
+        :param shell: str, "bash", "zsh", "fish", or "manifest" to only
+            write the manifest
+        """
+        from .complete import Manifest, get_script
+
+        program = self.get_program()
+        path = environ.COMPLETE_PATH or Manifest.get_path(program)
+        Manifest.create(self).write(path)
+
+        if shell != "manifest":
+            output = self.command_class.output_class()
+            output.out(get_script(shell, self.parser.prog, program, path))
+
+    def help(self, argv, key=""):
+        """Returns the text argv's --help or --version would print
+
+        The text is cached and the cache is used until any of the command
+        files, the program's version, or the environment the text was
+        rendered with change, on a cache hit none of the commands are
+        imported and none of the parsers are built, see captain.help
+
+        :param argv: list[str], ends with a help or version flag
+        :param key: str, the cache key of argv, see HelpCache.get_key
+        :returns: str|None, None if argv wouldn't print help or version
+        """
+        from .complete import get_files
+
+        key = key or HelpCache.get_key(argv)
+        help_cache = HelpCache(
+            environ.HELP_CACHE_PATH or HelpCache.get_path(self.get_program()),
+            self.get_version(**self.kwargs),
+        )
+        text = help_cache.get(key) if key else None
+        if text is None:
+            text = help_cache.render(self.parser, argv)
+            if key and text is not None:
+                help_cache.set(
+                    key,
+                    text,
+                    get_files(self),
+                    get_environ(get_environ_names(self)),
+                )
+
+        return text
+
     async def run(self, argv: list[str]|None = None) -> int:
         """Actually run captain with the given argv
 
@@ -244,12 +731,111 @@ class Application(object):
             script name, if not passed in then sys.argv[1:] will be used
         :returns: int, the return code you want the script to exit with
         """
-        parsed = self.parser.parse_args(argv)
-        command = self._create_command(parsed._pathfinder_node)
-        args, kwargs = await command.get_parsed_params(parsed)
-        return await command.run(*args, **kwargs)
+        started = self.started or time.perf_counter()
+        self.started = None
+
+        if argv is None:
+            argv = sys.argv[1:]
+
+        if self.middleware.before_parse_hooks:
+            argv = await self.middleware.before_parse(self, argv)
+
+        self.argv = argv
+        if "command_modules" in vars(self):
+            # a previous run built the tree, it has to be rebuilt if this
+            # argv runs a plugin that wasn't imported
+            if plugin_index := self._create_plugin_index(**self.kwargs):
+                prefixes = plugin_index.get_prefixes(self._get_plugin_argv())
+                for prefix, names in prefixes.items():
+                    if not set(names).issubset(
+                        self.plugin_prefixes.get(prefix, []),
+                    ):
+                        for k in ["command_modules", "pathfinder", "parser"]:
+                            vars(self).pop(k, None)
+                        break
+
+        if (
+            self.kwargs.get("profile", True)
+            and BenchmarkAction.in_argv(argv)
+        ):
+            try:
+                n, argv = BenchmarkAction.split_argv(argv)
+
+            except ValueError as e:
+                self.parser.error(str(e))
+
+            benchmark = await self.bench(argv, n=n)
+            benchmark.write(self.command_class.output_class())
+            return 0
+
+        if (
+            self.kwargs.get("complete", True)
+            and CompleteAction.in_argv(argv)
+        ):
+            try:
+                shell, argv = CompleteAction.split_argv(argv)
+
+            except ValueError as e:
+                self.parser.error(str(e))
+
+            self.complete(shell)
+            return 0
+
+        if self.help_cache and (key := HelpCache.get_key(argv)):
+            if (text := self.help(argv, key)) is not None:
+                sys.stdout.write(text)
+                return 0
+
+        diagnostics = self._create_parse_diagnostics(argv, started)
+        try:
+            parsed, command, args, kwargs = await self._parse_command(argv)
+
+            middleware = self.middleware
+            if handle_diagnostics := self._create_handle_diagnostics(parsed):
+                diagnostics.extend(handle_diagnostics)
+
+            if diagnostics:
+                # the diagnostics wrap the application's middleware
+                middleware = self._create_middleware_chain(
+                    diagnostics + middleware.middlewares,
+                )
+
+            if middleware.after_parse_hooks:
+                await middleware.after_parse(self, parsed, command)
+
+            ret_code = error = None
+            try:
+                ret_code = await middleware.handle(command, args, kwargs)
+                return ret_code
+
+            except BaseException as e:
+                error = e
+                raise
+
+            finally:
+                if middleware.after_exit_hooks:
+                    await middleware.after_exit(
+                        self,
+                        command,
+                        ret_code,
+                        error,
+                    )
+
+        finally:
+            for diagnostic in diagnostics:
+                diagnostic.close()
 
     def __call__(self, argv: list[str]|None = None):
-        ret_code = asyncio.run(self.run(argv))
+        if self.queue_listener:
+            self.queue_listener.start()
+
+        try:
+            ret_code = asyncio.run(self.run(argv))
+
+        finally:
+            # make sure everything queued is written before exiting
+            if self.queue_listener:
+                self.queue_listener.stop()
+
         sys.exit(ret_code)
 
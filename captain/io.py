@@ -2,11 +2,21 @@
 import textwrap
 import re
 from contextlib import contextmanager
-from collections import Counter
 import time
 import io
 import threading
 import itertools
+import array
+import os
+import sys
+import json
+import csv
+import contextvars
+import functools
+import inspect
+import math
+import abc
+from collections.abc import Iterator
 
 from datatypes import cball
 
@@ -131,6 +141,11 @@ class Output(io.IOBase):
     This is handy for captain scripts to be able to route their output
     through and it will obey the passed in --quiet commmand line argument
     automatically"""
+    json_chunk_size = 8192
+    """How many characters .json buffers before writing to the stream, a
+    bigger size means fewer writes but more of the output is held in
+    memory"""
+
     def __init__(self, stdout=None, stderr=None, **kwargs):
         self.stdout = stdout or logging.stdout
         self.stderr = stderr or logging.stderr
@@ -138,6 +153,22 @@ class Output(io.IOBase):
         self._suffix = kwargs.pop("suffix", "\n")
         self.width = kwargs.pop("width", environ.WIDTH)
 
+        # how .table, .row, and .record are written, either "text" or the
+        # name of one of the Encoder children (eg "jsonl", "csv")
+        self.output_format = kwargs.pop(
+            "output_format",
+            environ.OUTPUT_FORMAT,
+        )
+        self._encoder = None
+
+        # the Spans instance that holds everything timed with .span, this is
+        # created on the first .span call
+        self.spans = None
+
+        # set by captain.profile.ResourceStats.count, everything this
+        # instance writes is added to it
+        self.counter = None
+
     def __call__(self, *args, **kwargs):
         """Syntactic sugar around .out()
 
@@ -211,7 +242,6 @@ class Output(io.IOBase):
 
         return f"{prefix}{value}{postfix}"
 
-    @contextmanager
     def progress(self, length=100, **kwargs):
         """display a progress that can update in place
 
@@ -222,15 +252,23 @@ class Output(io.IOBase):
                     # do something crazy
                     p.update(x)
 
-        length -- int -- the total size of what you will be updating progress on
+            for x in echo.progress(iterable):
+                # do something crazy
+
+        length -- int|Iterable|AsyncIterable -- the total size of what you
+            will be updating progress on, or the iterable you want to
+            iterate and update progress on
+        **kwargs -- see Progress
         """
         progress_class = kwargs.pop("progress_class", Progress)
         kwargs["output"] = self
-        kwargs["length"] = length
-        pbar = progress_class(**kwargs)
-        pbar.update(0)
-        yield pbar
-        pbar.update(length)
+        if isinstance(length, int):
+            kwargs["length"] = length
+
+        else:
+            kwargs["iterable"] = length
+
+        return progress_class(**kwargs)
 
     def progress_bar(self, length=100, **kwargs):
         """display a progress bar
@@ -242,11 +280,32 @@ class Output(io.IOBase):
                     # do something crazy
                     bar.update(x)
 
-        length -- int -- the total size of what you will be iterating on
+        length -- int|Iterable|AsyncIterable -- the total size of what you
+            will be iterating on, or the iterable, see .progress
         """
         kwargs["progress_class"] = ProgressBar
         return self.progress(length, **kwargs)
 
+    def progress_group(self, **kwargs):
+        """Display many progresses and spinners at the same time, they are
+        all drawn by one thread
+
+        :example:
+            with self.output.progress_group() as group:
+                p1 = group.progress(100, label="foo")
+                p2 = group.progress_bar(1000, label="bar")
+                s = group.spinner("che")
+                # ... p1.increment(), p2.update(500), s.finish()
+
+        :param **kwargs: see ProgressGroup
+        :returns: ProgressGroup
+        """
+        progress_group_class = kwargs.pop(
+            "progress_group_class",
+            ProgressGroup,
+        )
+        return progress_group_class(self, **kwargs)
+
     @contextmanager
     def spinner(
         self,
@@ -307,6 +366,68 @@ class Output(io.IOBase):
         p.start(format_msg, *args, **kwargs)
         return p
 
+    def span(self, name, **kwargs):
+        """Time a named block of code, spans can be nested and every span
+        with the same name and parents is aggregated together
+
+        :example:
+            with self.output.span("load"):
+                with self.output.span("parse"):
+                    # do stuff
+
+            @self.output.span("save")
+            def save():
+                # do stuff
+
+            self.output.span_summary()
+
+        :param name: str
+        :keyword spans_class: type, the Spans class, this can only be set
+            before the first span is created
+        :param **kwargs: passed to the Spans instance, see Spans.configure
+        :returns: Span, a context manager that can also decorate a function
+        """
+        spans_class = kwargs.pop("spans_class", None)
+        if self.spans is None:
+            self.spans = (spans_class or Spans)(**kwargs)
+
+        else:
+            if spans_class and not isinstance(self.spans, spans_class):
+                raise ValueError(
+                    f"Spans already created with {type(self.spans).__name__}"
+                )
+
+            self.spans.configure(**kwargs)
+
+        return self.spans.span(name)
+
+    def span_summary(self, **kwargs):
+        """Print a table of all the spans with their count, total, p50 and
+        p99 times in milliseconds
+
+        :param **kwargs: passed to .table
+        """
+        if self.spans:
+            kwargs.setdefault(
+                "headers",
+                ["span", "count", "total ms", "p50 ms", "p99 ms"],
+            )
+            self.table(self.spans.get_stats(), **kwargs)
+
+    def report_spans(self):
+        """Called when the command finishes, prints the span summary to stderr
+        if CAPTAIN_SPANS_SUMMARY is set and writes the Chrome trace file if
+        CAPTAIN_SPANS_TRACE is set"""
+        if self.spans:
+            if environ.SPANS_SUMMARY:
+                self.span_summary(
+                    logmethod=self.stderr.info,
+                    output_format="text",
+                )
+
+            if environ.SPANS_TRACE:
+                self.spans.write_trace(environ.SPANS_TRACE)
+
     def critical(self, format_msg, *args, **kwargs):
         kwargs.setdefault("logmethod", self.stderr.critical)
         return self.write(format_msg, *args, **kwargs)
@@ -381,11 +502,168 @@ class Output(io.IOBase):
 
         s = self.format(format_msg, *args, **kwargs)
         logmethod(s, exc_info=exc_info)
+        if self.counter is not None:
+            self._count(logmethod, s)
 
     def raw(self, s, **kwargs):
-        stream = self.stderr.handlers[0].stream
         logmethod = kwargs.pop("logmethod", self.stderr.info)
         logmethod(s)
+        if self.counter is not None:
+            self._count(logmethod, s)
+
+    def _count(self, logmethod, s):
+        """Internal method. Add s to .counter if logmethod (eg,
+        `self.stdout.info`) would have written it, the count happens here,
+        in the thread that wrote s, because a queued logger writes in
+        another thread, see captain.logging.QueueListener
+        """
+        logger = getattr(logmethod, "__self__", None)
+        level = logging.getLevelName(getattr(logmethod, "__name__", "").upper())
+        if (
+            isinstance(level, int)
+            and hasattr(logger, "makeRecord")
+            and self.get_handler(logger, level)
+        ):
+            self.counter.add(logger, s)
+
+    def get_handler(self, logger=None, level=logging.INFO):
+        """Returns the handler of logger that would write a record
+
+        :param logger: Logger, defaults to .stdout
+        :param level: int, the level the record will be written at
+        :returns: logging.Handler|None, the first handler that would emit a
+            record at level, None if the record would be filtered (eg,
+            because of --quiet)
+        """
+        logger = logger or self.stdout
+        if not logger.isEnabledFor(level):
+            return None
+
+        record = logger.makeRecord(logger.name, level, "", 0, "", None, None)
+        if not logger.filter(record):
+            return None
+
+        for handler in logger.handlers:
+            if level >= handler.level and handler.filter(record):
+                return handler
+
+        return None
+
+    def get_stream(self, logger=None, level=logging.INFO):
+        """Returns the underlying stream of logger
+
+        :param logger: Logger, defaults to .stdout
+        :param level: int, the level the stream will be written at
+        :returns: io.TextIOBase|None, the stream of the first handler that
+            would emit a record at level, None if the record would be
+            filtered (eg, because of --quiet)
+        """
+        return getattr(self.get_handler(logger, level), "stream", None)
+
+    def json(self, obj, stream=True, **kwargs):
+        """Write obj as json
+
+        This uses `json.JSONEncoder.iterencode` so the json string is never
+        built in memory, the chunks are written straight to the stdout
+        stream, skipping prefix/suffix and `.format` processing. If obj is an
+        iterator (eg, a generator) it will be written as a json array and
+        each item is written as soon as it is produced
+
+        :example:
+            def handle(self):
+                self.output.json(self.get_results()) # generator
+
+        :param obj: Any, what you want to write as json
+        :param stream: bool, pass in False to build the string and write it
+            through the logger like .out()
+        :param **kwargs: passed through to json.JSONEncoder (eg, indent)
+        """
+        kwargs.setdefault("default", self._json_default)
+        encoder = json.JSONEncoder(**kwargs)
+        chunks = self._iterencode(encoder, obj)
+
+        fp = self.get_stream() if stream else None
+        if fp is None:
+            self.write("".join(filter(None, chunks)), prefix="", suffix="\n")
+            return
+
+        buf = []
+        size = 0
+        for chunk in chunks:
+            if chunk is None:
+                # we've reached the end of an item of an iterator so
+                # everything that has been produced should be written
+                self._write_json(fp, buf)
+                fp.flush()
+                buf = []
+                size = 0
+
+            else:
+                buf.append(chunk)
+                size += len(chunk)
+                if size >= self.json_chunk_size:
+                    self._write_json(fp, buf)
+                    buf = []
+                    size = 0
+
+        buf.append("\n")
+        self._write_json(fp, buf)
+        fp.flush()
+
+    def _write_json(self, fp, chunks):
+        """Internal method. Used by .json to write chunks straight to fp"""
+        s = "".join(chunks)
+        fp.write(s)
+        if self.counter is not None:
+            self.counter.add(self.stdout, s)
+
+    def _json_default(self, value):
+        """Internal method. Used as the json default for values the encoder
+        doesn't know how to serialize"""
+        if isinstance(value, Iterable) and not isinstance(value, basestring):
+            return list(value)
+
+        return String(value)
+
+    def _iterencode(self, encoder, obj):
+        """Internal method. Yields the json chunks of obj, iterators are
+        encoded as json arrays a item at a time and None is yielded after
+        every item
+
+        :param encoder: json.JSONEncoder
+        :param obj: Any
+        """
+        if not isinstance(obj, Iterator):
+            yield from encoder.iterencode(obj)
+            return
+
+        indent = encoder.indent
+        if indent is not None and not isinstance(indent, str):
+            indent = " " * indent
+
+        newline = "\n" + indent if indent is not None else ""
+
+        yield "["
+        first = True
+        for item in obj:
+            if first:
+                yield newline
+                first = False
+
+            else:
+                yield encoder.item_separator + newline
+
+            for chunk in encoder.iterencode(item):
+                # json strings can't contain a newline so any newline is
+                # indentation that needs to be one level deeper
+                yield chunk.replace("\n", newline) if newline else chunk
+
+            yield None
+
+        if not first and newline:
+            yield "\n"
+
+        yield "]"
 
     def inline(self, format_msg, *args, **kwargs):
         """print one or more characters without a newline at the end
@@ -524,7 +802,15 @@ class Output(io.IOBase):
         else:
             bullet_lines = ["*"] * len(lines)
 
-        self.table(bullet_lines, lines, column_delim="", widths=[len(bullet_lines[-1]) + 2])
+        # lists aren't tabular data so they are always printed as text, even
+        # when --format is a machine readable format
+        self.table(
+            bullet_lines,
+            lines,
+            column_delim="",
+            widths=[len(bullet_lines[-1]) + 2],
+            output_format="text",
+        )
 
     def row(self, row, **kwargs):
         """This is more of a specialty version of table that just prints one row
@@ -537,6 +823,44 @@ class Output(io.IOBase):
         """
         return self.table([row], **kwargs)
 
+    def record(self, record, **kwargs):
+        """Print one record, this is similar to .row but the record's keys
+        are kept
+
+        In text format the record is printed as a two column key/value table,
+        in the machine readable formats each record is one line (eg, a json
+        object for jsonl or a row for csv, the first record's keys become the
+        csv header)
+
+        :param record: Mapping, the record you want to print
+        :param **kwargs: dict, all the options in table()
+        """
+        if self.output_format == "text":
+            return self.table(list(record.items()), **kwargs)
+
+        else:
+            return self.get_encoder().write_records([record])
+
+    def get_encoder(self):
+        """Returns the Encoder instance for the current .output_format
+
+        :returns: Encoder
+        """
+        encoder = self._encoder
+        if not encoder or encoder.name != self.output_format:
+            try:
+                encoder_class = Encoder.encoder_classes[self.output_format]
+
+            except KeyError as e:
+                raise ValueError(
+                    f"Unknown output format: {self.output_format}"
+                ) from e
+
+            encoder = encoder_class(self)
+            self._encoder = encoder
+
+        return encoder
+
     def columns(self, *columns, **kwargs):
         self.table(*columns, **kwargs)
 
@@ -571,7 +895,8 @@ class Output(io.IOBase):
             multiple lists representing each column in the table, or a dict with list
             values, where the keys are the headers and the values are the columns corresponding to that
             header. If it is a dict of string values then the keys will be considered the first column
-            and the values will be considered the second column
+            and the values will be considered the second column. Columns can
+            also be buffers (eg, array.array or numpy arrays), see ColumnTable
         :param **kwargs: dict
             prefix -- string -- what you want before each row (eg, a tab)
             headers -- list -- the headers you want, must match column count
@@ -581,26 +906,47 @@ class Output(io.IOBase):
             width -- int -- similar to widths except it will set this minimum value for all columns
             column_delim -- string -- what goes between each column, defaults to " | "
             header_delim -- string, what goes between headers and content rows
+            output_format -- string, overrides .output_format
+            logmethod -- callable, what writes the text table, defaults to
+                .stdout.info
         """
-        ret = []
-
         headers = kwargs.get("headers", [])
         prefix = kwargs.get('prefix', '')
         column_delim = kwargs.get("column_delim", " | ")
         header_delim = kwargs.get("header_delim", "-")
-        if len(columns) == 1:
+        table_class = kwargs.get("table_class", Table)
+        is_columnar = False
+        if columns and all(map(ColumnTable.is_column, columns)):
+            # input is a bunch of columnar buffers (eg, array.array), these
+            # are rendered a column at a time instead of a row at a time
+            table_class = kwargs.get("column_table_class", ColumnTable)
+            is_columnar = True
+
+        elif len(columns) == 1:
             # input is a list of rows or dict of columns
             if isinstance(columns[0], Mapping):
                 # columns are a dict, so keys will be headers and values will be
                 # the columns if all the values are lists, otherwise keys will
                 # be column 1, and values will be column 2
                 all_lists = True
+                all_buffers = True
                 for v in columns[0].values():
                     if not isinstance(v, list):
                         all_lists = False
-                        break
 
-                if all_lists:
+                    if not ColumnTable.is_column(v):
+                        all_buffers = False
+
+                if columns[0] and all_buffers:
+                    headers = list(columns[0].keys())
+                    columns = list(columns[0].values())
+                    table_class = kwargs.get(
+                        "column_table_class",
+                        ColumnTable,
+                    )
+                    is_columnar = True
+
+                elif all_lists:
                     headers = list(columns[0].keys())
                     columns = list(zip_longest(*columns[0].values(), fillvalue=""))
                 else:
@@ -630,76 +976,31 @@ class Output(io.IOBase):
             # without the list the zip iterator gets spent
             columns = list(zip_longest(*columns, fillvalue=""))
 
-        if headers:
-            columns.insert(0, headers)
-
-        # columns should now consist of a list of lists where each list is a row in
-        # the table, so len(columns) would give the number of rows and
-        # len(columns[0]) would give the number of columns
-
-        def rowstr(row, prefix, row_counts, column_delim, row_alignment=None):
-            row_alignment = row_alignment or []
-            row_format = prefix + column_delim
-            cols = list(map(String, row))
-            for i in range(len(row_counts)):
-                if len(cols) > i:
-                    cols.append("")
-
-                c = cols[i]
-                # build the format string for each row, we use the row_counts found
-                # above to decide how much padding each column should get
-                # https://stackoverflow.com/a/9536084/5006
-                if row_alignment and len(row_alignment) > i and row_alignment[i] == "right":
-                #if not c or re.match(r"^\d+(?:\.\,\d+)?$", c):
-                    # right align digits
-                    row_format += "{:>" + str(row_counts[i]) + "}" + column_delim
-                else:
-                    # left align
-                    row_format += "{:<" + str(row_counts[i]) + "}" + column_delim
-
-            return row_format.strip().format(*map(lambda x: "None" if x is None else String(x), cols))
-
-        # we have to go through all the rows and calculate the max width of each
-        # column of each row
-        width = int(kwargs.get("width", 0))
-        widths = kwargs.get("widths", [])
-        row_counts = Counter()
-        for i in range(len(widths)):
-            row_counts[i] = int(widths[i])
-
-        for row in columns:
-            for i, c in enumerate(row):
-                c = "None" if c is None else String(c)
-                row_counts[i] = max(row_counts[i], len(c), width)
-
-        # we pop the headers from the columns because we had to put it into the
-        # columns so we could correctly calculate widths
-        if headers:
-            ret.append(rowstr(columns.pop(0), prefix, row_counts, column_delim))
-
-            # we need to figure out exactly how long the table is
-            delim_count = (sum(row_counts.values()) + (len(column_delim) * (len(row_counts) + 1)))
-            delim_count -= (len(column_delim) - len(column_delim.lstrip())) # left side of table
-            delim_count -= (len(column_delim) - len(column_delim.rstrip())) # right side of table
-            ret.append(prefix + (header_delim * delim_count))
-
-        # we want to go through all the columns and decide if they are right or
-        # left aligned
-        row_alignment = ["right"] * len(columns)
-        for row in columns:
-            for i, col_row in enumerate(row):
-                if not col_row or re.match(r"^\d+(?:\.\,\d+)?$", String(col_row)):
-                    # we do nothing because it's already set to right
-                    pass
+        if kwargs.get("output_format", self.output_format) != "text":
+            # machine readable formats don't care about widths or alignment
+            # so the rows go straight to the encoder
+            if is_columnar:
+                columns = zip_longest(
+                    *(column.tolist() for column in columns),
+                    fillvalue="",
+                )
 
-                else:
-                    # we found a non-digit, so this table should be left aligned
-                    row_alignment[i] = "left"
+            return self.get_encoder().write_rows(columns, headers=headers)
 
-        for row in columns:
-            ret.append(rowstr(row, prefix, row_counts, column_delim, row_alignment))
+        table = table_class(
+            columns,
+            headers=headers,
+            prefix=prefix,
+            column_delim=column_delim,
+            header_delim=header_delim,
+            widths=kwargs.get("widths", []),
+            width=int(kwargs.get("width", 0)),
+        )
 
-        self.out("\n".join(ret))
+        self.out(
+            "\n".join(table),
+            logmethod=kwargs.get("logmethod", self.stdout.info),
+        )
 
     def table_from_rows(self, *rows, **kwargs):
         """makes a table from the passed in rows
@@ -741,6 +1042,547 @@ class Output(io.IOBase):
     table_cols = table_from_columns
 
 
+class Encoder(abc.ABC):
+    """Internal class used by `Output` to write rows and records in a machine
+    readable format instead of the padded text of `Table`
+
+    Each child sets a unique `.name`, that name is what is passed to the
+    `--format` flag (see `captain.parse.FormatAction`), and defines
+    `.encode_row`. The encoded lines are
+    buffered and written through the `Output` instance in chunks so
+    `--quiet` still works but each row isn't a separate logging call
+    """
+    encoder_classes = {}
+    """Holds all the Encoder children, the key is the child's .name, see
+    __init_subclass__"""
+
+    name = ""
+
+    chunk_size = 1000
+    """How many rows are buffered before they are written"""
+
+    def __init__(self, output):
+        """
+        :param output: Output, the instance the encoded lines will be written
+            through
+        """
+        self.output = output
+        self.fieldnames = None
+
+    def __init_subclass__(cls):
+        if cls.name:
+            cls.encoder_classes[cls.name] = cls
+
+    @abc.abstractmethod
+    def encode_row(self, row, headers=None) -> str:
+        """Encode one row
+
+        :param row: Sequence, the values of the row
+        :param headers: Sequence, the names of each value in row
+        :returns: the encoded line, without a newline
+        """
+
+    def encode_record(self, record) -> str:
+        """Encode one record, by default this is the record's values encoded
+        as a row with the record's keys as the headers
+
+        :param record: Mapping
+        :returns: the encoded line, without a newline
+        """
+        return self.encode_row(list(record.values()), list(record.keys()))
+
+    def write(self, lines):
+        """Write the encoded lines through .output in chunks
+
+        :param lines: Iterable[str], each line without a newline
+        """
+        lines = iter(lines)
+        while chunk := list(itertools.islice(lines, self.chunk_size)):
+            self.output.write(
+                "\n".join(chunk),
+                prefix="",
+                suffix="\n",
+            )
+
+    def write_rows(self, rows, headers=None):
+        """Write all the rows
+
+        :param rows: Iterable[Sequence]
+        :param headers: Sequence, the names of each column
+        """
+        self.write(self.encode_row(row, headers) for row in rows)
+
+    def write_records(self, records):
+        """Write all the records
+
+        :param records: Iterable[Mapping]
+        """
+        self.write(map(self.encode_record, records))
+
+
+class JSONLEncoder(Encoder):
+    """Writes each row and record as a json value on its own line
+
+    https://jsonlines.org/
+    """
+    name = "jsonl"
+
+    def dumps(self, value) -> str:
+        return json.dumps(value, default=String)
+
+    def encode_row(self, row, headers=None) -> str:
+        if headers:
+            return self.dumps(dict(zip(headers, row)))
+
+        else:
+            return self.dumps(list(row))
+
+    def encode_record(self, record) -> str:
+        return self.dumps(record)
+
+
+class CSVEncoder(Encoder):
+    """Writes each row and record as a csv row
+
+    The headers of a table are written before the table's rows, the keys of
+    the first record are written before the first record
+    """
+    name = "csv"
+
+    delimiter = ","
+
+    def __init__(self, output):
+        super().__init__(output)
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(
+            self.buffer,
+            delimiter=self.delimiter,
+            lineterminator="",
+        )
+
+    def encode_row(self, row, headers=None) -> str:
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.writer.writerow(row)
+        return self.buffer.getvalue()
+
+    def encode_record(self, record) -> str:
+        if self.fieldnames is None:
+            self.fieldnames = list(record.keys())
+            return "\n".join([
+                self.encode_row(self.fieldnames),
+                self.encode_record(record),
+            ])
+
+        if extra := record.keys() - set(self.fieldnames):
+            raise ValueError(
+                "Record has keys that are not in the header: {}".format(
+                    ", ".join(map(String, extra))
+                )
+            )
+
+        return self.encode_row(record.get(k, "") for k in self.fieldnames)
+
+    def write_rows(self, rows, headers=None):
+        if headers:
+            rows = itertools.chain([headers], rows)
+
+        super().write_rows(rows)
+
+
+class TSVEncoder(CSVEncoder):
+    """Writes each row and record as a tab separated row"""
+    name = "tsv"
+
+    delimiter = "\t"
+
+
+class Table(object):
+    """Internal class used by `Output.table`. This renders rows of cells into
+    aligned lines
+
+    Every cell is converted to a string exactly once and the row format
+    string is compiled once per table, so rendering a row is a single
+    `str.format` call no matter how many columns the table has
+
+    :example:
+        table = Table([(1, "foo"), (2, "bar")], headers=["id", "name"])
+        print("\\n".join(table))
+    """
+    numeric_regex = re.compile(r"^\d+(?:\.\,\d+)?$")
+    """Cells matching this will be right aligned if every cell in the column
+    matches"""
+
+    def __init__(
+        self,
+        rows,
+        headers=None,
+        prefix="",
+        column_delim=" | ",
+        header_delim="-",
+        widths=None,
+        width=0,
+    ):
+        """
+        :param rows: list[Sequence], the data rows of the table
+        :param headers: Sequence, the header row of the table
+        :param prefix: str, what goes before each row
+        :param column_delim: str, what goes between each column
+        :param header_delim: str, what goes between headers and content rows
+        :param widths: list[int], the minimum width of each column, this
+            doesn't have to match the column count
+        :param width: int, the minimum width of all the columns
+        """
+        self.prefix = prefix
+        self.column_delim = column_delim
+        self.header_delim = header_delim
+
+        self.headers = self.get_cells(headers) if headers else []
+        self.rows = [self.get_cells(row) for row in rows]
+
+        counts = list(map(int, widths or []))
+        cell_count = max(map(len, self.rows), default=0)
+        cell_count = max(cell_count, len(self.headers))
+        column_count = max(cell_count, len(counts))
+
+        # make all the rows the same length so the columns can be computed
+        # with zip and each row can be passed straight to the template
+        for row in self.rows:
+            if len(row) < column_count:
+                row.extend([""] * (column_count - len(row)))
+
+        if self.headers and len(self.headers) < column_count:
+            self.headers.extend([""] * (column_count - len(self.headers)))
+
+        counts.extend([0] * (column_count - len(counts)))
+        if self.headers:
+            cols = zip(self.headers, *self.rows)
+
+        else:
+            cols = zip(*self.rows)
+
+        for i, col in enumerate(cols):
+            counts[i] = max(counts[i], max(map(len, col)))
+            if i < cell_count:
+                counts[i] = max(counts[i], width)
+
+        self.counts = counts
+
+        self.header_template = self.get_template(
+            [False] * column_count
+        )
+        self.row_template = self.get_template(
+            self.get_alignments(rows, column_count)
+        )
+
+    def get_cell(self, value) -> str:
+        """Convert value to the string that will be displayed in the table"""
+        if value is None:
+            return "None"
+
+        elif type(value) is int:
+            # String(int) is str(int) but String has to check the environment
+            # for every value, so this saves a lot of time on numeric tables
+            return str(value)
+
+        else:
+            return String(value)
+
+    def get_cells(self, row) -> list[str]:
+        get_cell = self.get_cell
+        return [
+            v if type(v) is str else get_cell(v)
+            for v in row
+        ]
+
+    def is_numeric(self, value, cell) -> bool:
+        """Returns True if the cell could be right aligned
+
+        :param value: Any, the raw value
+        :param cell: str, value converted with `.get_cell`
+        """
+        return (
+            not value
+            or cell.isdecimal()
+            or self.numeric_regex.match(cell) is not None
+        )
+
+    def get_alignments(self, rows, column_count) -> list[bool]:
+        """Decide if each column should be right aligned (True) or left
+        aligned (False)
+
+        A column is right aligned if all its values are numeric, this
+        considers only as many columns as there are rows, which is how
+        alignment has always worked
+
+        :param rows: list[Sequence], the raw rows of the table
+        :param column_count: int
+        :returns: one boolean for each column
+        """
+        alignments = [False] * column_count
+        is_numeric = self.is_numeric
+        cols = zip(
+            zip_longest(*rows, fillvalue=""),
+            zip(*self.rows),
+        )
+        for i, (values, cells) in enumerate(cols):
+            if i >= len(rows):
+                break
+
+            alignments[i] = all(map(is_numeric, values, cells))
+
+        return alignments
+
+    def get_template(self, alignments) -> str:
+        """Build the format string for a row
+
+        https://stackoverflow.com/a/9536084/5006
+
+        :param alignments: list[bool], True if the column is right aligned
+        :returns: a format string that takes one positional per column
+        """
+        prefix = self.prefix.replace("{", "{{").replace("}", "}}")
+        delim = self.column_delim.replace("{", "{{").replace("}", "}}")
+
+        template = prefix + delim
+        for count, right in zip(self.counts, alignments):
+            template += "{:" + (">" if right else "<") + str(count) + "}"
+            template += delim
+
+        return template.strip()
+
+    def get_header_delim(self) -> str:
+        """Returns the line that goes between the headers and the rows"""
+        delim = self.column_delim
+        delim_count = sum(self.counts) + (len(delim) * (len(self.counts) + 1))
+        # left side of table
+        delim_count -= (len(delim) - len(delim.lstrip()))
+        # right side of table
+        delim_count -= (len(delim) - len(delim.rstrip()))
+        return self.prefix + (self.header_delim * delim_count)
+
+    def __iter__(self):
+        """Yields each line of the table"""
+        if self.headers:
+            yield self.header_template.format(*self.headers)
+            yield self.get_header_delim()
+
+        row_format = self.row_template.format
+        for row in self.rows:
+            yield row_format(*row)
+
+
+class ColumnTable(Table):
+    """Internal class used by `Output.table` when every column is a buffer
+    (eg, `array.array`, `memoryview`, or a 1-d numpy array)
+
+    Widths and alignment are computed a column at a time instead of a cell
+    at a time. Integer columns only need their min and max values and are
+    formatted straight from the buffer, float and string numpy columns use
+    numpy's vectorized string lengths. No rows are built, the lines are
+    zipped together from the formatted columns
+
+    The output is identical to passing the same values to `Table`
+
+    :example:
+        ids = array.array("q", [1, 2, 3])
+        scores = array.array("d", [0.5, 0.25, 1.0])
+        print("\n".join(ColumnTable([ids, scores], headers=["id", "score"])))
+    """
+    int_typecodes = set("bBhHiIlLqQnN")
+    """array.array/memoryview typecodes that hold integers"""
+
+    float_typecodes = set("efd")
+    """array.array/memoryview typecodes that hold floats"""
+
+    @classmethod
+    def get_numpy(cls):
+        """Returns the numpy module if it has already been imported
+
+        numpy is expensive to import, if the columns are numpy arrays then
+        numpy will already be loaded so this never imports it
+        """
+        return sys.modules.get("numpy")
+
+    @classmethod
+    def is_column(cls, value) -> bool:
+        """Returns True if value is a buffer that can be passed to this
+        class as a column"""
+        if isinstance(value, array.array):
+            return True
+
+        elif isinstance(value, memoryview):
+            return value.ndim == 1
+
+        elif numpy := cls.get_numpy():
+            return isinstance(value, numpy.ndarray) and value.ndim == 1
+
+        return False
+
+    def __init__(
+        self,
+        columns,
+        headers=None,
+        prefix="",
+        column_delim=" | ",
+        header_delim="-",
+        widths=None,
+        width=0,
+    ):
+        """
+        :param columns: list[array.array|memoryview|numpy.ndarray], each
+            buffer is a column of the table
+        :param **kwargs: see Table.__init__
+        """
+        self.prefix = prefix
+        self.column_delim = column_delim
+        self.header_delim = header_delim
+
+        self.headers = self.get_cells(headers) if headers else []
+        self.row_count = max(map(len, columns), default=0)
+
+        counts = list(map(int, widths or []))
+        cell_count = len(columns) if self.row_count else 0
+        cell_count = max(cell_count, len(self.headers))
+        column_count = max(cell_count, len(counts))
+        counts.extend([0] * (column_count - len(counts)))
+
+        if self.headers and len(self.headers) < column_count:
+            self.headers.extend([""] * (column_count - len(self.headers)))
+
+        self.columns = []
+        alignments = []
+        for i in range(column_count):
+            column = columns[i] if i < len(columns) else []
+            cells, count, is_numeric = self.get_column_info(column)
+
+            if self.headers:
+                count = max(count, len(self.headers[i]))
+
+            counts[i] = max(counts[i], count)
+            if i < cell_count:
+                counts[i] = max(counts[i], width)
+
+            # see Table.get_alignments
+            alignments.append(is_numeric and i < self.row_count)
+            self.columns.append((column, cells))
+
+        self.counts = counts
+        self.alignments = alignments
+        self.header_template = self.get_template([False] * column_count)
+
+    def get_kind(self, column) -> str:
+        """Returns "i" if column holds integers, "f" for floats, "U" for
+        numpy unicode strings, and "" for everything else"""
+        numpy = self.get_numpy()
+        if numpy and isinstance(column, numpy.ndarray):
+            kind = column.dtype.kind
+            if kind == "u":
+                kind = "i"
+
+            return kind if kind in "ifU" else ""
+
+        typecode = getattr(column, "typecode", "")
+        if not typecode:
+            typecode = getattr(column, "format", "").lstrip("@=<>!")
+
+        if typecode in self.int_typecodes:
+            return "i"
+
+        elif typecode in self.float_typecodes:
+            return "f"
+
+        return ""
+
+    def get_column_info(self, column) -> tuple[list[str]|None, int, bool]:
+        """Compute the cells, width and alignment of column
+
+        :param column: the buffer
+        :returns: the string cells (None if the column can be formatted
+            straight from the buffer), the width of the widest cell, and
+            True if all the cells are numeric
+        """
+        kind = self.get_kind(column)
+        numpy = self.get_numpy()
+        is_ndarray = numpy is not None and isinstance(column, numpy.ndarray)
+
+        if not len(column):
+            return [], 0, True
+
+        if kind == "i":
+            if is_ndarray:
+                lo, hi = int(column.min()), int(column.max())
+
+            else:
+                lo, hi = min(column), max(column)
+
+            # negative numbers aren't numeric (see Table.numeric_regex) but
+            # zero is always numeric since it is falsy
+            count = max(len(str(lo)), len(str(hi)))
+            return None, count, lo >= 0
+
+        elif kind == "f" or kind == "U":
+            if is_ndarray:
+                strs = column.astype(str)
+                count = int(numpy.char.str_len(strs).max())
+                cells = strs.tolist()
+                if kind == "f":
+                    # floats always have a period so they are only numeric
+                    # if they are all zero
+                    return cells, count, not column.any()
+
+                values = cells
+
+            else:
+                cells = list(map(str, column))
+                count = max(map(len, cells))
+                return cells, count, not any(column)
+
+        else:
+            values = column.tolist() if is_ndarray else column
+            cells = self.get_cells(values)
+            count = max(map(len, cells))
+
+        return cells, count, all(map(self.is_numeric, values, cells))
+
+    def __iter__(self):
+        """Yields each line of the table"""
+        if self.headers:
+            yield self.header_template.format(*self.headers)
+            yield self.get_header_delim()
+
+        if not self.row_count:
+            return
+
+        its = []
+        info = zip(self.columns, self.counts, self.alignments)
+        for (column, cells), count, right in info:
+            if cells is None:
+                # tolist converts numpy scalars to python ints which are much
+                # faster to format
+                fmt = ("{:>" if right else "{:<") + str(count) + "}"
+                it = map(fmt.format, column.tolist())
+
+            else:
+                just = str.rjust if right else str.ljust
+                it = map(just, cells, itertools.repeat(count))
+
+            if missing := (self.row_count - len(column)):
+                it = itertools.chain(
+                    it,
+                    itertools.repeat(" " * count, missing),
+                )
+
+            its.append(it)
+
+        # this is the same as Table.row_template.format(*row)
+        delim = self.column_delim
+        start = (self.prefix + delim).lstrip()
+        stop = delim.rstrip()
+        for line in map(delim.join, zip(*its)):
+            yield start + line + stop
+
+
 class Profile(object):
     def __init__(self, output, quiet=False):
         self.output = output
@@ -749,15 +1591,15 @@ class Profile(object):
         self.stop_time = None
 
     def start(self, format_msg="", *args, **kwargs):
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         self.msg = format_msg.format(*args, **kwargs)
 
     def stop(self):
-        self.stop_time = time.time()
+        self.stop_time = time.perf_counter()
 
     def elapsed(self):
-        start = self.start_time if self.start_time else time.time()
-        stop = self.stop_time if self.stop_time else time.time()
+        start = self.start_time if self.start_time else time.perf_counter()
+        stop = self.stop_time if self.stop_time else time.perf_counter()
         elapsed = self.get_elapsed(start, stop, 1000.00, 1)
 
         suffix = "ms"
@@ -786,21 +1628,271 @@ class Profile(object):
         return round(abs(stop - start) * float(multiplier), rnd)
 
 
+class Span(object):
+    """A timed block of code, see Output.span and Spans.span"""
+    def __init__(self, spans, name):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        parent = self.spans.path.get()
+        self.path = (*parent, self.name)
+        self.token = self.spans.path.set(self.path)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        stop = time.perf_counter_ns()
+        self.spans.path.reset(self.token)
+        self.spans.add(self.path, self.start, stop)
+
+    def __call__(self, func):
+        """Decorate func so every call is timed as a new span"""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def decorated(*args, **kwargs):
+                with self.spans.span(self.name):
+                    return await func(*args, **kwargs)
+
+        else:
+            @functools.wraps(func)
+            def decorated(*args, **kwargs):
+                with self.spans.span(self.name):
+                    return func(*args, **kwargs)
+
+        return decorated
+
+
+class Spans(object):
+    """Holds the durations of all the spans, see Output.span
+
+    Spans are keyed by their path, the names of all the spans they are
+    nested in plus their own name, so the same name under different parents
+    is aggregated separately. The current path is held in a context variable
+    so spans nest correctly across threads and asyncio tasks
+    """
+    def __init__(self, trace=None):
+        """
+        :param trace: bool, True to keep every span so .get_trace works,
+            defaults to True if CAPTAIN_SPANS_TRACE is set
+        """
+        self.durations = {}
+        self.trace = bool(environ.SPANS_TRACE)
+        self.events = []
+        self.path = contextvars.ContextVar("path", default=())
+        self.configure(trace=trace)
+
+    def configure(self, trace=None):
+        """Change the settings of an existing instance, a None value leaves
+        that setting alone
+
+        :param trace: bool, True to start keeping every span, spans finished
+            before trace was turned on won't be in .get_trace
+        """
+        if trace is not None:
+            self.trace = trace
+
+    def __bool__(self):
+        return bool(self.durations)
+
+    def span(self, name):
+        return Span(self, name)
+
+    def add(self, path, start, stop):
+        """Record a finished span
+
+        :param path: tuple[str], the names of the parent spans and this span
+        :param start: int, perf_counter_ns when the span started
+        :param stop: int, perf_counter_ns when the span stopped
+        """
+        if path in self.durations:
+            self.durations[path].append(stop - start)
+
+        else:
+            self.durations[path] = [stop - start]
+
+        if self.trace:
+            self.events.append((path, start, stop, threading.get_ident()))
+
+    def get_percentile(self, durations, percent):
+        """Nearest rank percentile
+
+        :param durations: list[int], sorted
+        :param percent: int, 0-100
+        :returns: int
+        """
+        index = math.ceil(percent / 100 * len(durations)) - 1
+        return durations[max(index, 0)]
+
+    def get_stats(self):
+        """Returns a row for each span with the span's name (indented by
+        depth), count, total, p50 and p99 in milliseconds, parents come
+        before their children
+
+        :returns: list[tuple]
+        """
+        rows = []
+        for path in sorted(self.durations):
+            durations = sorted(self.durations[path])
+            rows.append((
+                "  " * (len(path) - 1) + path[-1],
+                len(durations),
+                round(sum(durations) / 1e6, 3),
+                round(self.get_percentile(durations, 50) / 1e6, 3),
+                round(self.get_percentile(durations, 99) / 1e6, 3),
+            ))
+
+        return rows
+
+    def get_trace(self):
+        """Returns the spans in Chrome's trace event format, this can be
+        loaded into chrome://tracing or https://ui.perfetto.dev
+
+        https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+
+        :returns: dict
+        """
+        events = []
+        pid = os.getpid()
+        for path, start, stop, tid in self.events:
+            events.append({
+                "name": path[-1],
+                "cat": "/".join(path[:-1]),
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (stop - start) / 1000,
+                "pid": pid,
+                "tid": tid,
+            })
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path):
+        """Write .get_trace() as json to path"""
+        with open(path, "w") as fp:
+            json.dump(self.get_trace(), fp)
+
+
+def get_render_interval(rate):
+    """Returns the seconds between redraws for rate
+
+    :param rate: float, how many times a second something can be redrawn, 0
+        or less means there is no limit
+    :returns: float, 0.0 if rate is 0 or less
+    """
+    return (1.0 / rate) if rate > 0 else 0.0
+
+
 class Progress(object):
-    def __init__(self, output, length, **kwargs):
+    """Displays the progress of something that has a known (or unknown)
+    number of steps, see Output.progress
+
+    Updates are rate limited, the progress is only redrawn at most `rate`
+    times a second, so calling `.update` in a tight loop is cheap. If stdout
+    isn't a terminal then no backspaces are written, instead a summary line
+    is written every `summary_interval` seconds
+
+    :example:
+        # as a context manager
+        with Progress(output, 1000) as p:
+            for x in range(1000):
+                p.update(x)
+
+        # wrapping an iterable (or async iterable using `async for`)
+        for x in Progress(output, iterable=range(1000)):
+            pass
+    """
+    def __init__(self, output, length=None, iterable=None, **kwargs):
+        """
+        :param output: Output
+        :param length: int, the total size of what you will be updating
+            progress on, if None then the length of iterable will be used if
+            it has one
+        :param iterable: Iterable|AsyncIterable, if passed in then iterating
+            this instance will iterate iterable and update the progress
+        :keyword rate: float, how many times a second the progress can be
+            redrawn, 0 or less redraws on every update
+        :keyword summary_interval: float, how many seconds between summary
+            lines when stdout isn't a terminal
+        :keyword tty: bool, True if stdout is a terminal, this is checked if
+            not passed in
+        :keyword label: str, displayed before the progress
+        :keyword group: ProgressGroup, if set then the group draws this
+            progress and .update only sets the current value
+        """
+        if length is None and iterable is not None:
+            try:
+                length = len(iterable)
+
+            except TypeError:
+                pass
+
         self.length = length
+        self.iterable = iterable
         self.output = output
+        self.current = 0
+        self.label = kwargs.get("label", "")
+        self.group = kwargs.get("group", None)
+
+        if "tty" in kwargs:
+            self.tty = kwargs["tty"]
+
+        else:
+            stream = output.get_stream()
+            self.tty = bool(stream and stream.isatty())
+
+        if self.tty:
+            self.interval = get_render_interval(
+                kwargs.get("rate", environ.PROGRESS_RATE),
+            )
+
+        else:
+            self.interval = kwargs.get(
+                "summary_interval",
+                environ.PROGRESS_SUMMARY_INTERVAL,
+            )
+
+        self.start_time = time.monotonic()
+        self.render_time = None
+        self.rendered = None
+
+    def __enter__(self):
+        self.start_time = time.monotonic()
+        self.update(0)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish()
+
+    def __iter__(self):
+        with self:
+            current = 0
+            for v in self.iterable:
+                yield v
+                current += 1
+                self.update(current)
+
+    async def __aiter__(self):
+        with self:
+            current = 0
+            async for v in self.iterable:
+                yield v
+                current += 1
+                self.update(current)
 
     def get_percentage(self, current):
-        fill = float(current) / float(self.length)
+        fill = (float(current) / float(self.length)) if self.length else 1.0
         percentage = "[{:3.2f}%]".format(fill * 100.0)
         return percentage
 
     def get_progress(self, current):
+        if self.length is None:
+            return String(current)
+
         # http://stackoverflow.com/a/5676884/5006
         # http://stackoverflow.com/a/22776/5006
         bar = "{current: >{justify}}/{length} {percentage: >10}".format(
-        #bar = "{: >10} {: >10}".format(
             current=current,
             justify=len(str(self.length)) + 1,
             length=self.length,
@@ -808,21 +1900,100 @@ class Progress(object):
         )
         return bar
 
+    def get_stats(self, current):
+        """Returns the throughput and the estimated time remaining
+
+        :param current: int
+        :returns: str, always the same width
+        """
+        elapsed = time.monotonic() - self.start_time
+        rate = (current / elapsed) if elapsed > 0 else 0.0
+
+        eta = "?"
+        if self.length is not None and rate > 0:
+            remaining = max(self.length - current, 0) / rate
+            eta = "{}:{:02}:{:02}".format(
+                int(remaining // 3600),
+                int(remaining % 3600 // 60),
+                int(remaining % 60),
+            )
+
+        unit = ""
+        for unit in ["", "k", "M", "G"]:
+            if rate < 1000.0:
+                break
+
+            rate /= 1000.0
+
+        return "{: >10} ETA {: >8}".format(f"{rate:.1f}{unit}/s", eta)
+
     def update(self, current):
-        bar = self.get_progress(current)
-        #self.output.err(bar + chr(8) * (len(bar) + 1), suffix="")
-        self.output.out(bar + chr(8) * (len(bar) + 1), suffix="")
+        """Set the progress to current, this will only redraw the progress
+        if it hasn't been redrawn in the last interval
+
+        :param current: int
+        """
+        self.current = current
+        if self.group is not None:
+            return
+
+        now = time.monotonic()
+        if self.render_time is None or now - self.render_time >= self.interval:
+            self.render_time = now
+            self.render(current)
+
+    def increment(self, n=1):
+        """Add n to the current progress
+
+        :param n: int
+        """
+        self.update(self.current + n)
+
+    def finish(self):
+        """Draw the final progress, this is called when the context manager
+        or iteration finishes"""
+        current = self.current if self.length is None else self.length
+        if self.group is not None:
+            self.current = current
+
+        elif current != self.rendered:
+            self.render_time = time.monotonic()
+            self.render(current)
+
+    def get_line(self, current):
+        """Returns the full progress line for current"""
+        line = self.get_progress(current) + " " + self.get_stats(current)
+        if self.label:
+            line = self.label + " " + line
+
+        return line
+
+    def render(self, current):
+        self.rendered = current
+        bar = self.get_line(current)
+        if self.tty:
+            self.output.out(bar + chr(8) * (len(bar) + 1), suffix="")
+
+        else:
+            self.output.out(bar)
 
 
 class ProgressBar(Progress):
-    def __init__(self, output, length, char="\u2588"):
-        super(ProgressBar, self).__init__(output, length)
-        self.bar_width = self.output.width - 11
+    def __init__(self, output, length=None, char="\u2588", **kwargs):
+        super().__init__(output, length, **kwargs)
+        # the 1 is the space between the bar and the stats
+        self.bar_width = max(
+            self.output.width - 11 - len(self.get_stats(0)) - 1,
+            10,
+        )
         self.char = char
 
     def get_progress(self, current):
+        if self.length is None:
+            return super().get_progress(current)
+
         # http://stackoverflow.com/a/21008062/5006
-        fill = float(current) / float(self.length)
+        fill = (float(current) / float(self.length)) if self.length else 1.0
         bar_length = int(self.bar_width * fill)
         bar = "[{}{}]{: >10}".format(
             self.char * bar_length,
@@ -831,3 +2002,199 @@ class ProgressBar(Progress):
         )
         return bar
 
+
+class Spinner(object):
+    """A spinner that is drawn by a ProgressGroup, see ProgressGroup.spinner
+    """
+    chars = ["-", "\\", "|", "/"]
+
+    done_char = "*"
+
+    def __init__(self, label=""):
+        self.label = label
+        self.done = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.finish()
+
+    def finish(self):
+        self.done = True
+
+    def get_line(self, frame):
+        """Returns the spinner line
+
+        :param frame: int, the ProgressGroup's frame count
+        """
+        ch = self.done_char if self.done else self.chars[
+            frame % len(self.chars)
+        ]
+        return f"{ch} {self.label}" if self.label else ch
+
+
+class ProgressGroup(object):
+    """Draws many progresses and spinners from one thread, see
+    Output.progress_group
+
+    Each progress and spinner added to the group owns one line of the
+    terminal and the group redraws all the lines at most `rate` times a
+    second, so updating a progress is just setting a value. If stdout isn't
+    a terminal then all the lines are written every `summary_interval`
+    seconds
+
+    :example:
+        with output.progress_group() as group:
+            async def task(i):
+                p = group.progress(100, label=f"task {i}")
+                for x in range(100):
+                    p.increment()
+
+            await asyncio.gather(*(task(i) for i in range(32)))
+    """
+    min_interval = 0.01
+    """The render thread sleeps at least this long between frames so a rate
+    of 0 or less doesn't keep a core busy redrawing"""
+
+    def __init__(self, output, **kwargs):
+        """
+        :param output: Output
+        :keyword rate: float, how many times a second the lines are redrawn,
+            the lines are never redrawn more often than .min_interval
+        :keyword summary_interval: float, seconds between summaries when
+            stdout isn't a terminal
+        :keyword tty: bool, True if stdout is a terminal, this is checked if
+            not passed in
+        """
+        self.output = output
+        self.items = []
+        self.frame = 0
+        self.line_count = 0
+
+        if "tty" in kwargs:
+            self.tty = kwargs["tty"]
+
+        else:
+            stream = output.get_stream()
+            self.tty = bool(stream and stream.isatty())
+
+        if self.tty:
+            self.interval = get_render_interval(
+                kwargs.get("rate", environ.PROGRESS_RATE),
+            )
+
+        else:
+            self.interval = kwargs.get(
+                "summary_interval",
+                environ.PROGRESS_SUMMARY_INTERVAL,
+            )
+
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.stop()
+
+    def add(self, item):
+        """Add a progress or spinner to the group, it will be drawn on the
+        next frame
+
+        :param item: Progress|Spinner, anything with a .get_line method
+        :returns: item
+        """
+        with self.lock:
+            self.items.append(item)
+
+        return item
+
+    def progress(self, length=100, **kwargs):
+        """Add a Progress to the group, see Output.progress
+
+        :returns: Progress
+        """
+        progress_class = kwargs.pop("progress_class", Progress)
+        kwargs["output"] = self.output
+        kwargs["group"] = self
+        kwargs["tty"] = self.tty
+        if isinstance(length, int):
+            kwargs["length"] = length
+
+        else:
+            kwargs["iterable"] = length
+
+        return self.add(progress_class(**kwargs))
+
+    def progress_bar(self, length=100, **kwargs):
+        """Add a ProgressBar to the group, see Output.progress_bar
+
+        :returns: ProgressBar
+        """
+        kwargs["progress_class"] = ProgressBar
+        return self.progress(length, **kwargs)
+
+    def spinner(self, label=""):
+        """Add a Spinner to the group
+
+        :returns: Spinner
+        """
+        return self.add(Spinner(label))
+
+    def get_lines(self):
+        """Returns the current line of every item in the group"""
+        with self.lock:
+            items = list(self.items)
+
+        lines = []
+        for item in items:
+            if isinstance(item, Progress):
+                lines.append(item.get_line(item.current))
+
+            else:
+                lines.append(item.get_line(self.frame))
+
+        return lines
+
+    def render(self):
+        """Draw all the lines"""
+        lines = self.get_lines()
+        self.frame += 1
+        if not lines:
+            return
+
+        if self.tty:
+            # move the cursor to the start of the lines that were drawn
+            # last frame, then clear and redraw each line
+            # https://en.wikipedia.org/wiki/ANSI_escape_code#CSI_sequences
+            s = f"\x1b[{self.line_count}F" if self.line_count else ""
+            s += "".join(f"\x1b[2K{line}\n" for line in lines)
+            self.line_count = len(lines)
+            self.output.write(s, prefix="", suffix="")
+
+        else:
+            self.output.write("\n".join(lines), prefix="")
+
+    def start(self):
+        """Start the render thread"""
+        def target():
+            interval = max(self.interval, self.min_interval)
+            while not self.event.wait(timeout=interval):
+                self.render()
+
+        self.event.clear()
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the render thread and draw the final frame"""
+        self.event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+        self.render()
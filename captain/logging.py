@@ -1,4 +1,6 @@
 import sys
+import queue
+from logging import handlers
 
 from datatypes.logging import *
 
@@ -59,3 +61,95 @@ class QuietFilter(str):
 
         return super().__new__(cls, levels)
 
+
+
+class QueueHandler(handlers.QueueHandler):
+    """Puts records onto a bounded queue instead of writing them, this is
+    what keeps a slow consumer of stdout/stderr (eg, a pipe to `less` or
+    ssh) from blocking the thread that is writing output, see QueueListener
+    """
+    POLICIES = ("block", "drop-debug")
+
+    def __init__(self, queue, policy="block"):
+        """
+        :param queue: queue.Queue, the queue the records are placed into
+        :param policy: str, what happens when the queue is full, "block"
+            will wait until there is room, "drop-debug" will wait for
+            everything but DEBUG records, which are dropped
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+
+        super().__init__(queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if self.policy == "drop-debug" and record.levelno <= DEBUG:
+            try:
+                self.queue.put_nowait(record)
+
+            except queue.Full:
+                self.dropped += 1
+
+        else:
+            self.queue.put(record)
+
+
+class QueueListener(handlers.QueueListener):
+    """Moves the handlers of loggers behind a bounded queue that is drained
+    by one writer thread
+
+    :example:
+        listener = QueueListener([stdout, stderr])
+        listener.start()
+        # ... output is written by the writer thread
+        listener.stop() # everything queued has been written
+    """
+    def __init__(self, loggers, maxsize=0, policy="block"):
+        """
+        :param loggers: list[Logger], the loggers whose handlers will be
+            moved to the writer thread
+        :param maxsize: int, how many records can be waiting to be written,
+            0 means there is no limit
+        :param policy: str, see QueueHandler
+        """
+        self.loggers = loggers
+        self.logger_handlers = {}
+        self.queue_handler = QueueHandler(queue.Queue(maxsize), policy=policy)
+        super().__init__(self.queue_handler.queue, respect_handler_level=True)
+
+    def start(self):
+        """Replace each logger's handlers with the queue handler and start
+        the writer thread"""
+        for logger in self.loggers:
+            self.logger_handlers[logger.name] = list(logger.handlers)
+            for handler in self.logger_handlers[logger.name]:
+                logger.removeHandler(handler)
+
+            logger.addHandler(self.queue_handler)
+
+        super().start()
+
+    def stop(self):
+        """Wait for the writer thread to write everything in the queue and
+        then put the original handlers back"""
+        super().stop()
+
+        for logger in self.loggers:
+            logger.removeHandler(self.queue_handler)
+            for handler in self.logger_handlers.pop(logger.name, []):
+                logger.addHandler(handler)
+                handler.flush()
+
+    def enqueue_sentinel(self):
+        """Overridden to wait for room since the queue could be full"""
+        self.queue.put(self._sentinel)
+
+    def handle(self, record):
+        """Overridden so each record is only written by the handlers of the
+        logger that created it"""
+        record = self.prepare(record)
+        for handler in self.logger_handlers.get(record.name, []):
+            if record.levelno >= handler.level:
+                handler.handle(record)
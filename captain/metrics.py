@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import json
+import tempfile
+import bisect
+import abc
+
+try:
+    import resource
+except ImportError:
+    # resource is only available on unix
+    resource = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .compat import *
+from . import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsSink(abc.ABC):
+    """Records a metric for every command that is ran, see
+    Application.metrics_sink
+
+    A metric is a dict with the command's path (eg, ["foo", "bar"] for
+    `script.py foo bar`), how long the command took, its exit code, and how
+    much cpu time and memory the process used. Children only need to
+    implement .write
+
+    :example:
+        sink = MetricsSink.create("/var/lib/node_exporter/script.prom")
+        ret_code = await sink.run(["foo"], command.run(*args, **kwargs))
+    """
+    @classmethod
+    def create(cls, path):
+        """Create the sink that matches path's extension, .prom files are
+        Prometheus textfiles, everything else is JSONL
+
+        :param path: str
+        :returns: MetricsSink
+        """
+        if path.endswith(".prom"):
+            return PrometheusSink(path)
+
+        return JSONLSink(path)
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_rusage(self):
+        if resource:
+            return resource.getrusage(resource.RUSAGE_SELF)
+
+    async def run(self, keys, coro):
+        """Await coro and record its metric
+
+        :param keys: list[str], the command's path
+        :param coro: Awaitable, returns the exit code
+        :returns: whatever coro returns
+        """
+        start = time.perf_counter()
+        rusage = self.get_rusage()
+        exit_code = 1
+        try:
+            exit_code = await coro
+            return exit_code
+
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+
+            elif isinstance(e.code, int):
+                exit_code = e.code
+
+            raise
+
+        finally:
+            metric = {
+                "time": time.time(),
+                "command": list(keys),
+                "duration_s": round(time.perf_counter() - start, 6),
+                "exit_code": exit_code or 0,
+            }
+
+            if rusage:
+                after = self.get_rusage()
+                metric["cpu_user_s"] = round(
+                    after.ru_utime - rusage.ru_utime,
+                    6,
+                )
+                metric["cpu_sys_s"] = round(
+                    after.ru_stime - rusage.ru_stime,
+                    6,
+                )
+
+                # linux reports kilobytes, macOS reports bytes
+                maxrss = after.ru_maxrss
+                if sys.platform != "darwin":
+                    maxrss = maxrss * 1024
+                metric["max_rss_bytes"] = maxrss
+
+            self.record(metric)
+
+    def record(self, metric):
+        """Write the metric, a metric failing to write is logged but never
+        fails the command
+
+        :param metric: dict
+        """
+        try:
+            self.write(metric)
+
+        except OSError as e:
+            logger.warning(f"Could not write metric to {self.path}: {e}")
+
+    @abc.abstractmethod
+    def write(self, metric):
+        """Write one metric to .path
+
+        :param metric: dict, see .run
+        """
+
+
+class JSONLSink(MetricsSink):
+    """Appends each metric as a json line
+
+    Each line is written with one os.write call to a file opened with
+    O_APPEND, so concurrent commands appending to the same file won't
+    interleave their lines
+    """
+    def write(self, metric):
+        line = json.dumps(metric) + "\n"
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+
+        finally:
+            os.close(fd)
+
+
+class PrometheusSink(MetricsSink):
+    """Maintains a Prometheus textfile (for node exporter's textfile
+    collector) with a duration histogram, an exit code counter, a cpu
+    counter, and a max rss gauge for each command
+
+    The running totals are kept in a json file next to the textfile (node
+    exporter only reads *.prom files), both files are updated under a lock
+    and replaced atomically so the collector never reads a partial file
+
+    https://github.com/prometheus/node_exporter#textfile-collector
+    https://prometheus.io/docs/instrumenting/exposition_formats/
+    """
+    buckets = [
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+        60.0,
+        300.0,
+    ]
+    """The upper bounds, in seconds, of the duration histogram buckets"""
+
+    prefix = "captain_command"
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.state_path = path + ".json"
+        self.lock_path = path + ".lock"
+
+    def write(self, metric):
+        with open(self.lock_path, "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            state = self.read_state()
+            self.update_state(state, metric)
+            self.write_atomic(self.state_path, json.dumps(state))
+            self.write_atomic(self.path, self.get_text(state))
+
+    def read_state(self):
+        try:
+            with open(self.state_path) as fp:
+                return json.load(fp)
+
+        except (OSError, ValueError):
+            return {}
+
+    def update_state(self, state, metric):
+        """Add metric to the running totals in state
+
+        :param state: dict, the command name is the key
+        :param metric: dict
+        """
+        name = " ".join(metric["command"])
+        s = state.setdefault(name, {
+            "buckets": [0] * (len(self.buckets) + 1),
+            "sum": 0.0,
+            "count": 0,
+            "exit_codes": {},
+            "cpu_user": 0.0,
+            "cpu_sys": 0.0,
+            "max_rss": 0,
+        })
+
+        duration = metric["duration_s"]
+        s["buckets"][bisect.bisect_left(self.buckets, duration)] += 1
+        s["sum"] += duration
+        s["count"] += 1
+
+        exit_code = str(metric["exit_code"])
+        s["exit_codes"][exit_code] = s["exit_codes"].get(exit_code, 0) + 1
+
+        s["cpu_user"] += metric.get("cpu_user_s", 0.0)
+        s["cpu_sys"] += metric.get("cpu_sys_s", 0.0)
+        s["max_rss"] = metric.get("max_rss_bytes", 0)
+
+    def get_label(self, value):
+        value = value.replace("\\", "\\\\").replace("\n", "\\n")
+        return value.replace("\"", "\\\"")
+
+    def get_text(self, state):
+        """Returns the Prometheus text exposition of state"""
+        p = self.prefix
+        duration = [
+            f"# HELP {p}_duration_seconds How long each command ran",
+            f"# TYPE {p}_duration_seconds histogram",
+        ]
+        exits = [
+            f"# HELP {p}_exits_total How many times each command exited"
+            " with each code",
+            f"# TYPE {p}_exits_total counter",
+        ]
+        cpu = [
+            f"# HELP {p}_cpu_seconds_total Cpu time used by each command",
+            f"# TYPE {p}_cpu_seconds_total counter",
+        ]
+        rss = [
+            f"# HELP {p}_max_rss_bytes Max resident memory of the last run"
+            " of each command",
+            f"# TYPE {p}_max_rss_bytes gauge",
+        ]
+
+        for name, s in sorted(state.items()):
+            label = f"command=\"{self.get_label(name)}\""
+
+            count = 0
+            les = [repr(b) for b in self.buckets] + ["+Inf"]
+            for le, bucket_count in zip(les, s["buckets"]):
+                count += bucket_count
+                duration.append(
+                    f"{p}_duration_seconds_bucket{{{label},le=\"{le}\"}}"
+                    f" {count}"
+                )
+            duration.append(f"{p}_duration_seconds_sum{{{label}}} {s['sum']}")
+            duration.append(
+                f"{p}_duration_seconds_count{{{label}}} {s['count']}"
+            )
+
+            for code, code_count in sorted(s["exit_codes"].items()):
+                exits.append(
+                    f"{p}_exits_total{{{label},code=\"{code}\"}} {code_count}"
+                )
+
+            cpu.append(
+                f"{p}_cpu_seconds_total{{{label},mode=\"user\"}}"
+                f" {s['cpu_user']}"
+            )
+            cpu.append(
+                f"{p}_cpu_seconds_total{{{label},mode=\"system\"}}"
+                f" {s['cpu_sys']}"
+            )
+            rss.append(f"{p}_max_rss_bytes{{{label}}} {s['max_rss']}")
+
+        return "\n".join(duration + exits + cpu + rss) + "\n"
+
+    def write_atomic(self, path, text):
+        """Write text to a temp file in path's directory and then move it
+        over path so readers only ever see a complete file"""
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)),
+            prefix=".",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "w") as fp:
+                fp.write(text)
+
+            # mkstemp files are only readable by us but the collector might
+            # be running as another user
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
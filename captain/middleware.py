@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+import functools
+import inspect
+
+from .compat import *
+from .parse import MemoryProfileAction
+
+
+class Middleware(object):
+    """Wraps every run of an Application, override the hooks you need and
+    pass an instance to Application(middlewares=[...])
+
+    The hooks run in this order:
+
+        1. .before_parse, can change the argv before it is parsed
+        2. .after_parse, has the parsed namespace and the created command
+        3. .handle, wraps the command's run, like ASGI middleware it calls
+            call_next to run the rest of the chain
+        4. .after_exit, has the return code (or the raised error)
+
+    Only the hooks a child overrides are added to the Application's chain,
+    so a middleware that only overrides .handle doesn't add any cost to
+    parsing. All the hooks can be sync or async, a sync .handle can return
+    what call_next returns without awaiting it
+
+    :example:
+        class Retry(Middleware):
+            async def handle(self, command, args, kwargs, call_next):
+                for _ in range(3):
+                    ret_code = await call_next(command, args, kwargs)
+                    if ret_code == 0:
+                        break
+                return ret_code
+
+        application = Application(middlewares=[Retry()])
+    """
+    def before_parse(self, application, argv):
+        """
+        :param application: Application
+        :param argv: list[str]
+        :returns: list[str], the argv that will be parsed
+        """
+        return argv
+
+    def after_parse(self, application, parsed, command):
+        """
+        :param application: Application
+        :param parsed: argparse.Namespace
+        :param command: Command, the command that will handle the request
+        """
+        pass
+
+    async def handle(self, command, args, kwargs, call_next):
+        """
+        :param command: Command
+        :param args: list, the command's positional arguments
+        :param kwargs: dict, the command's keyword arguments
+        :param call_next: Callable[[Command, list, dict], Awaitable[int]],
+            runs the rest of the chain and finally the command
+        :returns: int|Awaitable[int], the return code
+        """
+        return await call_next(command, args, kwargs)
+
+    def after_exit(self, application, command, ret_code, error=None):
+        """
+        :param application: Application
+        :param command: Command
+        :param ret_code: int|None, None if the command raised an error
+        :param error: BaseException|None, what the command raised
+        """
+        pass
+
+
+class MiddlewareChain(object):
+    """Internal class. Compiles a list of Middleware instances into the
+    hooks Application.run calls, this is done once so running the chain
+    only loops through the middleware that actually override each hook"""
+    def __init__(self, middlewares, handler):
+        """
+        :param middlewares: list[Middleware]
+        :param handler: Callable[[Command, list, dict], Awaitable[int]], the
+            innermost handler that actually runs the command
+        """
+        self.middlewares = list(middlewares)
+
+        self.before_parse_hooks = self.get_hooks("before_parse")
+        self.after_parse_hooks = self.get_hooks("after_parse")
+        self.after_exit_hooks = self.get_hooks("after_exit")
+
+        self.handle = handler
+        for hook in reversed(self.get_hooks("handle")):
+            if inspect.iscoroutinefunction(hook):
+                self.handle = functools.partial(hook, call_next=self.handle)
+
+            else:
+                # .call awaits whatever a sync hook returns
+                self.handle = functools.partial(
+                    self.call,
+                    hook,
+                    call_next=self.handle,
+                )
+
+    def get_hooks(self, name):
+        """Returns the bound name methods of all the middleware that
+        override name
+
+        :param name: str
+        :returns: tuple[Callable]
+        """
+        default = getattr(Middleware, name)
+        hooks = []
+        for m in self.middlewares:
+            if getattr(type(m), name, default) is not default:
+                hooks.append(getattr(m, name))
+
+        return tuple(hooks)
+
+    async def call(self, hook, *args, **kwargs):
+        ret = hook(*args, **kwargs)
+        while inspect.isawaitable(ret):
+            ret = await ret
+        return ret
+
+    async def before_parse(self, application, argv):
+        for hook in self.before_parse_hooks:
+            argv = await self.call(hook, application, argv)
+        return argv
+
+    async def after_parse(self, application, parsed, command):
+        for hook in self.after_parse_hooks:
+            await self.call(hook, application, parsed, command)
+
+    async def after_exit(self, application, command, ret_code, error=None):
+        # these run in reverse order so the first middleware is the
+        # outermost, just like .handle
+        for hook in reversed(self.after_exit_hooks):
+            await self.call(hook, application, command, ret_code, error)
+
+
+class DiagnosticMiddleware(Middleware):
+    """Base class of the middleware Application.run adds for its own
+    diagnostics (eg, --captain-profile or CAPTAIN_STATS), these are only
+    added to the runs that use them and an instance only lives for one run,
+    see Application._create_parse_diagnostics
+
+    .close is called when the run is finished, even if the argv couldn't be
+    parsed
+    """
+    def close(self):
+        pass
+
+
+class ResourceStatsMiddleware(DiagnosticMiddleware):
+    """Reports the resources a run used, see captain.profile.ResourceStats
+    and CAPTAIN_STATS"""
+    def __init__(self, application, start):
+        """
+        :param application: Application
+        :param start: float, the perf_counter time the run started
+        """
+        from .profile import ResourceStats
+
+        # startup includes finding the commands and building the parsers
+        application.parser
+        self.stats = ResourceStats(start)
+        self.stats.start()
+
+    async def handle(self, command, args, kwargs, call_next):
+        # this is the outermost middleware so parsing is done
+        self.stats.count(command.output)
+        self.stats.mark("parse")
+        try:
+            return await call_next(command, args, kwargs)
+
+        finally:
+            self.stats.mark("handle")
+
+    def after_exit(self, application, command, ret_code, error=None):
+        self.stats.stop()
+        self.stats.skipped_imports = application.get_skipped_imports()
+        self.stats.write(command.output, application.stats_path)
+
+    def close(self):
+        self.stats.stop()
+
+
+class MemoryProfileMiddleware(DiagnosticMiddleware):
+    """Traces the memory allocations of parsing and handling, see
+    captain.profile.MemoryProfiler and --captain-memprofile"""
+    def __init__(self):
+        from .profile import MemoryProfiler
+
+        # memory has to be traced before parsing so this can't wait for the
+        # parser to find the flag
+        self.profiler = MemoryProfiler()
+        self.profiler.start()
+        self.pattern = ""
+
+    def after_parse(self, application, parsed, command):
+        self.pattern = getattr(parsed, MemoryProfileAction.DEST, "")
+        if self.pattern == "command":
+            self.pattern = inspect.getfile(type(command))
+
+    async def handle(self, command, args, kwargs, call_next):
+        self.profiler.mark("parse")
+        try:
+            return await call_next(command, args, kwargs)
+
+        finally:
+            self.profiler.mark("handle")
+            self.profiler.stop()
+            self.profiler.write(command.output, self.pattern)
+
+    def close(self):
+        self.profiler.stop()
+
+
+class LoopMonitorMiddleware(DiagnosticMiddleware):
+    """Watches the event loop for blocking code while the command runs, see
+    captain.profile.LoopMonitor and CAPTAIN_LOOP_MONITOR"""
+    async def handle(self, command, args, kwargs, call_next):
+        from .profile import LoopMonitor
+
+        loop_monitor = LoopMonitor(command.output)
+        loop_monitor.start()
+        try:
+            return await call_next(command, args, kwargs)
+
+        finally:
+            await loop_monitor.stop()
+            loop_monitor.write()
+
+
+class MetricsMiddleware(DiagnosticMiddleware):
+    """Records a metric for the command, see captain.metrics.MetricsSink"""
+    def __init__(self, metrics_sink):
+        """
+        :param metrics_sink: captain.metrics.MetricsSink
+        """
+        self.metrics_sink = metrics_sink
+        self.keys = []
+
+    def after_parse(self, application, parsed, command):
+        self.keys = parsed._pathfinder_node.pathkeys
+
+    async def handle(self, command, args, kwargs, call_next):
+        return await self.metrics_sink.run(
+            self.keys,
+            call_next(command, args, kwargs),
+        )
+
+
+class ProfileMiddleware(DiagnosticMiddleware):
+    """Runs the command under cProfile, see captain.profile.Profiler and
+    --captain-profile"""
+    def __init__(self, path):
+        """
+        :param path: str, where the pstats file is written
+        """
+        self.path = path
+
+    async def handle(self, command, args, kwargs, call_next):
+        # cProfile is only imported when it's actually needed
+        from .profile import Profiler
+
+        profiler = Profiler(command.output, self.path)
+        return await profiler.run(call_next(command, args, kwargs))
+
+
+class SpansMiddleware(DiagnosticMiddleware):
+    """Reports the command's spans, see captain.io.Output.report_spans and
+    CAPTAIN_SPANS_SUMMARY"""
+    def after_exit(self, application, command, ret_code, error=None):
+        command.output.report_spans()
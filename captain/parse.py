@@ -16,6 +16,7 @@ from datatypes import (
 from .compat import *
 from .call import Command
 from .config import environ
+from .io import Encoder
 from .logging import QuietFilter
 
 
@@ -157,6 +158,297 @@ class QuietAction(argparse.Action):
         return arg_strings
 
 
+class FormatAction(argparse.Action):
+    """Unless overridden, every captain command gets a --format flag that
+    selects how Output.table, Output.row, and Output.record are written, the
+    choices are "text" and the names of all the `captain.io.Encoder`
+    children
+
+    The value is placed into the namespace under DEST and then it is set
+    into the command's Output instance, see Application.run
+    """
+    DEST = "<FORMAT_INJECT>"
+
+    HELP = "".join([
+        "How tables, rows, and records are written, ",
+        "text is padded for humans, ",
+        "the others stream a machine readable line per row",
+    ])
+
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs.setdefault("choices", ["text", *Encoder.encoder_classes.keys()])
+        kwargs.setdefault("help", self.HELP)
+
+        # we don't want a default since a subcommand's default would
+        # overwrite a value that was passed in before the subcommand
+        kwargs["default"] = argparse.SUPPRESS
+        super().__init__(option_strings, self.DEST, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=""):
+        setattr(namespace, self.dest, values)
+
+
+class ProfileAction(argparse.Action):
+    """Unless overridden, every captain command gets a --captain-profile flag
+    that runs the command under cProfile, see captain.profile.Profiler
+
+    The flag takes an optional path where the pstats file is written, the
+    value is placed into the namespace under DEST, see Application.run
+    """
+    DEST = "<PROFILE_INJECT>"
+
+    HELP = "".join([
+        "Profile the command, the stats are written to the path ",
+        "(along with a collapsed stack file for flamegraphs) and the ",
+        "slowest functions are printed to stderr",
+    ])
+
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs.setdefault("nargs", "?")
+        kwargs.setdefault("const", "captain.pstats")
+        kwargs.setdefault("metavar", "PATH")
+        kwargs.setdefault("help", self.HELP)
+
+        # see FormatAction
+        kwargs["default"] = argparse.SUPPRESS
+        super().__init__(option_strings, self.DEST, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=""):
+        setattr(namespace, self.dest, values)
+
+
+class ArgvFlagMixin(object):
+    """Lets Application.run find a flag in the argv before the argv is
+    parsed, see .in_argv"""
+    FLAG = ""
+
+    @classmethod
+    def in_argv(cls, argv):
+        """Returns True if .FLAG (either by itself or as FLAG=VALUE) is in
+        argv, everything after -- is a positional so it isn't checked
+
+        :param argv: list[str]
+        :returns: bool
+        """
+        prefix = f"{cls.FLAG}="
+        for a in argv:
+            if a == "--":
+                break
+
+            if a == cls.FLAG or a.startswith(prefix):
+                return True
+
+        return False
+
+
+class MemoryProfileAction(ArgvFlagMixin, argparse.Action):
+    """Unless overridden, every captain command gets a --captain-memprofile
+    flag that traces the command's memory allocations, see
+    captain.profile.MemoryProfiler
+
+    The flag takes an optional filename pattern that limits the report to
+    matching files, "command" limits it to the command's module. Tracing has
+    to start before the flags are parsed so Application.run checks the argv
+    for this flag before parsing
+    """
+    DEST = "<MEMPROFILE_INJECT>"
+
+    FLAG = "--captain-memprofile"
+
+    HELP = "".join([
+        "Trace memory allocations while parsing and handling the command ",
+        "and print the top allocation sites and peak memory of each to ",
+        "stderr, optionally only for files matching the pattern ",
+        "(\"command\" is the command's module)",
+    ])
+
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs.setdefault("nargs", "?")
+        kwargs.setdefault("const", "")
+        kwargs.setdefault("metavar", "PATTERN")
+        kwargs.setdefault("help", self.HELP)
+
+        # see FormatAction
+        kwargs["default"] = argparse.SUPPRESS
+        super().__init__(option_strings, self.DEST, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=""):
+        setattr(namespace, self.dest, values)
+
+
+class PreparseAction(ArgvFlagMixin, argparse.Action):
+    """Base class for flags that Application.run handles before the argv
+    is parsed, the flag and its value are removed from the argv, see
+    .split_argv
+
+    The flag takes an optional value, a value has to be passed in with an
+    equal sign (eg, --flag=VALUE) unless .is_value says the next argument is
+    the flag's value. Like the parser, everything after -- is a positional
+    """
+    DEST = ""
+
+    FLAG = ""
+
+    HELP = ""
+
+    METAVAR = None
+
+    CONST = None
+
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs.setdefault("nargs", "?")
+        kwargs.setdefault("const", self.CONST)
+        kwargs.setdefault("metavar", self.METAVAR)
+        kwargs.setdefault("help", self.HELP)
+
+        # see FormatAction
+        kwargs["default"] = argparse.SUPPRESS
+        super().__init__(option_strings, self.DEST, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=""):
+        setattr(namespace, self.dest, values)
+
+    @classmethod
+    def is_value(cls, arg):
+        """Returns True if arg, the argument after the flag, is the flag's
+        value"""
+        return False
+
+    @classmethod
+    def convert_value(cls, value):
+        """Returns the flag's value
+
+        :param value: str
+        :returns: Any
+        :raises: ValueError, if value isn't valid, the message is an
+            argparse style error message
+        """
+        return value
+
+    @classmethod
+    def split_argv(cls, argv):
+        """Remove the flag from argv
+
+        :param argv: list[str]
+        :returns: tuple[Any, list[str]], the flag's value (None if the flag
+            wasn't found, .CONST if it didn't have a value) and the argv
+            without the flag
+        :raises: ValueError, see .convert_value
+        """
+        value = None
+        ret = []
+        i = 0
+        while i < len(argv):
+            a = argv[i]
+            if a == "--":
+                ret.extend(argv[i:])
+                break
+
+            elif a == cls.FLAG:
+                value = cls.CONST
+                if i + 1 < len(argv) and cls.is_value(argv[i + 1]):
+                    i += 1
+                    value = cls.convert_value(argv[i])
+
+            elif a.startswith(f"{cls.FLAG}="):
+                value = cls.convert_value(a.split("=", 1)[1])
+
+            else:
+                ret.append(a)
+
+            i += 1
+
+        return value, ret
+
+
+class BenchmarkAction(PreparseAction):
+    """Unless overridden, every captain command gets a --captain-bench flag
+    that runs the command over and over in-process and prints its latency,
+    see Application.bench
+
+    The flag takes an optional count (eg, --captain-bench=1000), the rest of
+    the argv is what gets ran
+    """
+    DEST = "<BENCH_INJECT>"
+
+    FLAG = "--captain-bench"
+
+    HELP = "".join([
+        "Run the command N times with its output suppressed and print ",
+        "the parse, handle, and total latency percentiles to stderr",
+    ])
+
+    METAVAR = "N"
+
+    CONST = 100
+
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs.setdefault("type", int)
+        super().__init__(option_strings, dest, **kwargs)
+
+    @classmethod
+    def is_value(cls, arg):
+        return arg.isdigit()
+
+    @classmethod
+    def convert_value(cls, value):
+        try:
+            n = int(value)
+
+        except ValueError:
+            n = 0
+
+        if n <= 0:
+            raise ValueError(
+                f"argument {cls.FLAG}: invalid positive int value: '{value}'"
+            )
+
+        return n
+
+
+class CompleteAction(PreparseAction):
+    """Unless overridden, every captain command gets a --captain-complete
+    flag that prints the shell completion script of the program, see
+    Application.complete and captain.complete
+
+    The script's completions come from a manifest that is written when the
+    script is printed, "manifest" only writes the manifest
+    """
+    DEST = "<COMPLETE_INJECT>"
+
+    FLAG = "--captain-complete"
+
+    HELP = "".join([
+        "Print the completion script for the shell (eg, ",
+        "`eval \"$(script.py --captain-complete=bash)\"`)",
+    ])
+
+    METAVAR = "SHELL"
+
+    CONST = "bash"
+
+    SHELLS = ["bash", "zsh", "fish", "manifest"]
+
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs.setdefault("choices", self.SHELLS)
+        super().__init__(option_strings, dest, **kwargs)
+
+    @classmethod
+    def is_value(cls, arg):
+        return arg in cls.SHELLS
+
+    @classmethod
+    def convert_value(cls, value):
+        if value not in cls.SHELLS:
+            choices = ", ".join(f"'{s}'" for s in cls.SHELLS)
+            raise ValueError(
+                f"argument {cls.FLAG}: invalid choice: '{value}'"
+                f" (choose from {choices})"
+            )
+
+        return value
+
+
 class HelpFormatter(argparse.ArgumentDefaultsHelpFormatter):
     """The problem I had was ArgumentDefaultsHelpFormatter would give me the
     default values but it would strip newlines from the text, while
@@ -268,9 +560,15 @@ class ArgumentParser(argparse.ArgumentParser):
 
     https://github.com/python/cpython/blob/3.11/Lib/argparse.py
     """
-    def __init__(self, **kwargs):
+    def __init__(self, common_parser=None, **kwargs):
+        """
+        :param common_parser: ArgumentParser, the parser that has the flags
+            every parser has, see ._add_common_arguments
+        :param **kwargs: passed through to argparse.ArgumentParser
+        """
         # https://docs.python.org/3/library/argparse.html#conflict-handler
         self.command_class_added = False
+        self.common_parser = common_parser
 
         kwargs.setdefault("formatter_class", HelpFormatter)
         super().__init__(**kwargs)
@@ -362,8 +660,17 @@ class ArgumentParser(argparse.ArgumentParser):
         arg_strings = self._parse_action_args(arg_strings)
         return arg_strings
 
+    def format_usage(self):
+        self._add_common_arguments()
+        return super().format_usage()
+
+    def format_help(self):
+        self._add_common_arguments()
+        return super().format_help()
+
     def parse_known_args(self, args=None, namespace=None):
         node = self._defaults["_pathfinder_node"]
+        self._add_common_arguments()
         self._add_command_arguments(node)
 
         parsed, parsed_unknown = super().parse_known_args(args, namespace)
@@ -407,6 +714,37 @@ class ArgumentParser(argparse.ArgumentParser):
 
         return parsed, parsed_unknown
 
+    def _add_common_arguments(self):
+        """Add the common parser's flags and this parser's --version flag,
+        this is automatically called when .parse_known_args is called or
+        help is formatted
+
+        Passing the common parser in `parents` would add every common flag
+        to every (sub)parser when it is created, so the cost of every parser
+        would grow with the number of common flags. Instead the common flags
+        are registered once on the common parser and every parser only keeps
+        a reference to it, the common actions (the same instances for every
+        parser) are only added to the parsers that are actually used
+        """
+        common_parser = self.common_parser
+        if common_parser is None:
+            return
+
+        self.common_parser = None
+        self._add_container_actions(common_parser)
+        for k, v in common_parser._defaults.items():
+            self._defaults.setdefault(k, v)
+
+        # a command's version replaces the common --version so it has to be
+        # added after the common flags
+        node = self._defaults.get("_pathfinder_node", None)
+        if node is not None and (version := node.value["version"]):
+            self.add_argument(
+                "--version", "-V",
+                action='version',
+                version="%(prog)s {}".format(version)
+            )
+
     def _add_command_arguments(self, node: MethodpathFinder):
         """All the defined Command arguments will be added through this
         method, this is automatically called when .parse_known_args is called
@@ -532,5 +870,11 @@ class ArgumentParser(argparse.ArgumentParser):
                 # needs to be required
                 kwargs.pop("required", None)
 
-        return super().add_argument(*flags, **kwargs)
+        action = super().add_argument(*flags, **kwargs)
+        if environ_names:
+            # help shows the default so it depends on these, see
+            # captain.help.get_environ_names
+            action.environ_names = environ_names
+
+        return action
 
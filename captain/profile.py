@@ -0,0 +1,641 @@
+# -*- coding: utf-8 -*-
+import os
+import io
+import sys
+import gc
+import time
+import json
+import asyncio
+import threading
+import traceback
+import bisect
+import math
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+
+try:
+    import resource
+except ImportError:
+    # resource is only available on unix
+    resource = None
+
+from .compat import *
+from .config import environ
+from . import logging
+
+
+class Profiler(object):
+    """Runs a command under cProfile, see the --captain-profile flag
+
+    When the command finishes the stats are dumped to .path (load them with
+    `python -m pstats <PATH>` or snakeviz), a collapsed stack file is written
+    next to it that flamegraph.pl or speedscope can read, and the top
+    functions are printed to stderr
+
+    :example:
+        profiler = Profiler(output, "out.pstats")
+        ret_code = await profiler.run(command.run(*args, **kwargs))
+    """
+    def __init__(self, output, path, top=None):
+        """
+        :param output: Output, used to print the top functions to stderr
+        :param path: str, where the pstats file will be written
+        :param top: int, how many functions to print, defaults to
+            CAPTAIN_PROFILE_TOP
+        """
+        self.output = output
+        self.path = path
+        self.top = environ.PROFILE_TOP if top is None else top
+        self.profile = cProfile.Profile()
+
+    async def run(self, coro):
+        """Profile everything that runs on this thread while coro is awaited
+
+        :param coro: Awaitable
+        :returns: whatever coro returns
+        """
+        self.profile.enable()
+        try:
+            return await coro
+
+        finally:
+            self.profile.disable()
+            self.write()
+
+    def get_collapsed_path(self):
+        """Returns the path of the collapsed stack file"""
+        return os.path.splitext(self.path)[0] + ".collapsed"
+
+    def get_collapsed_stacks(self, stats, max_depth=64):
+        """cProfile only records caller -> callee edges, not full stacks, so
+        this walks the call graph from the root functions and splits each
+        function's own time between the paths that reach it in proportion to
+        the time each caller spent in it
+
+        :param stats: pstats.Stats
+        :param max_depth: int, paths deeper than this are cut off
+        :returns: Generator[str], "root;caller;function microseconds" lines
+        """
+        callees = {}
+        for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+            for caller, edge in callers.items():
+                callees.setdefault(caller, []).append((func, edge[3]))
+
+        def get_name(func):
+            filename, lineno, name = func
+            if filename == "~":
+                # built-in functions
+                return name
+
+            return f"{os.path.basename(filename)}:{lineno}:{name}"
+
+        def walk(func, names, seen, ratio):
+            names = names + [get_name(func)]
+            cc, nc, tt, ct, callers = stats.stats[func]
+
+            weight = int(tt * ratio * 1e6)
+            if weight > 0:
+                yield "{} {}".format(";".join(names), weight)
+
+            if len(names) < max_depth:
+                for callee, edge_ct in callees.get(func, []):
+                    callee_ct = stats.stats[callee][3]
+                    if callee not in seen and callee_ct > 0:
+                        yield from walk(
+                            callee,
+                            names,
+                            seen | {callee},
+                            ratio * edge_ct / callee_ct,
+                        )
+
+        for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+            if not callers:
+                yield from walk(func, [], {func}, 1.0)
+
+    def write(self):
+        """Write the pstats and collapsed stack files and print the top
+        functions"""
+        self.profile.dump_stats(self.path)
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+
+        with open(self.get_collapsed_path(), "w") as fp:
+            for line in self.get_collapsed_stacks(stats):
+                fp.write(line)
+                fp.write("\n")
+
+        stats.sort_stats("cumulative").print_stats(self.top)
+        self.output.write(
+            "Profile written to {} and {}\n{}",
+            self.path,
+            self.get_collapsed_path(),
+            stream.getvalue().strip(),
+            logmethod=self.output.stderr.info,
+        )
+
+
+class MemoryProfiler(object):
+    """Traces memory allocations while a command runs, see the
+    --captain-memprofile flag
+
+    A tracemalloc snapshot is taken at the start and at the end of every
+    phase (eg, parsing the flags, handling the command), then the top
+    allocation sites of each phase and the peak traced memory during each
+    phase are printed to stderr
+
+    :example:
+        profiler = MemoryProfiler()
+        profiler.start()
+        # parse
+        profiler.mark("parse")
+        # handle
+        profiler.mark("handle")
+        profiler.stop()
+        profiler.write(output)
+    """
+    def __init__(self, top=None):
+        """
+        :param top: int, how many allocation sites to print for each phase,
+            defaults to CAPTAIN_PROFILE_TOP
+        """
+        self.top = environ.PROFILE_TOP if top is None else top
+        self.phases = []
+        self.snapshot = None
+
+        self.tracing = False
+        """True if .start started tracing, tracing that was already started
+        (eg, PYTHONTRACEMALLOC) is left running when this stops"""
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        else:
+            tracemalloc.start()
+            self.tracing = True
+
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        """Returns a snapshot without tracemalloc's own allocations"""
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+
+    def mark(self, phase):
+        """End the current phase
+
+        :param phase: str, the name of the phase that just finished
+        """
+        if self.snapshot is not None:
+            peak = tracemalloc.get_traced_memory()[1]
+            snapshot = self.take_snapshot()
+            self.phases.append((phase, self.snapshot, snapshot, peak))
+            self.snapshot = snapshot
+            tracemalloc.reset_peak()
+
+    def stop(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+        self.snapshot = None
+
+    def get_size(self, size):
+        return "{:+.1f} KiB".format(size / 1024)
+
+    def write(self, output, filename_pattern=""):
+        """Print every phase's peak and top allocation sites to stderr
+
+        :param output: Output
+        :param filename_pattern: str, if set then only allocations in files
+            matching this pattern (eg, "*/commands/*") are included
+        """
+        filters = []
+        if filename_pattern:
+            filters.append(tracemalloc.Filter(True, filename_pattern))
+
+        for phase, before, after, peak in self.phases:
+            if filters:
+                before = before.filter_traces(filters)
+                after = after.filter_traces(filters)
+
+            rows = []
+            for stat in after.compare_to(before, "lineno")[:self.top]:
+                frame = stat.traceback[0]
+                rows.append((
+                    f"{frame.filename}:{frame.lineno}",
+                    self.get_size(stat.size_diff),
+                    f"{stat.count_diff:+}",
+                ))
+
+            output.write(
+                "Memory {}: peak {:.1f} KiB",
+                phase,
+                peak / 1024,
+                logmethod=output.stderr.info,
+            )
+            if rows:
+                output.table(
+                    rows,
+                    headers=["location", "size", "count"],
+                    logmethod=output.stderr.info,
+                    output_format="text",
+                )
+
+
+class ResourceStats(object):
+    """Collects the resources one run of a command used: wall time of each
+    phase, cpu time, max rss, gc collections of each generation, the bytes
+    and lines written to stdout and stderr, and the declared command imports
+    that were skipped
+
+    The output is counted by the Output instances passed to .count, it
+    isn't counted at the streams because a queued logger writes them in
+    another thread (see captain.logging.QueueListener)
+
+    :example:
+        stats = ResourceStats(run_start_time)
+        stats.start()
+        # parse
+        stats.count(command.output)
+        stats.mark("parse")
+        # handle
+        stats.mark("handle")
+        stats.stop()
+        stats.write(output)
+    """
+    def __init__(self, start=None, loggers=None):
+        """
+        :param start: float, the perf_counter time the "startup" phase
+            started, defaults to now
+        :param loggers: dict[str, Logger], what is written to these loggers
+            is counted, defaults to captain's stdout and stderr
+        """
+        self.start_time = time.perf_counter() if start is None else start
+        self.loggers = loggers or {
+            "stdout": logging.stdout,
+            "stderr": logging.stderr,
+        }
+        self.phases = {}
+
+        # name: [bytes, lines]
+        self.written = {name: [0, 0] for name in self.loggers}
+        self.outputs = []
+
+        # the declared command imports that weren't needed, see
+        # Application.get_skipped_imports
+        self.skipped_imports = []
+
+    def start(self):
+        """Ends the startup phase"""
+        self.mark("startup")
+        self.gc_stats = gc.get_stats()
+        self.rusage = self.get_rusage()
+
+    def count(self, output):
+        """Count everything output writes until .stop is called
+
+        :param output: captain.io.Output
+        """
+        output.counter = self
+        self.outputs.append(output)
+
+    def add(self, logger, s):
+        """Called by Output when it writes s to logger
+
+        :param logger: Logger
+        :param s: str
+        """
+        for name, l in self.loggers.items():
+            if l is logger:
+                written = self.written[name]
+                written[0] += len(s.encode("utf-8", errors="replace"))
+                written[1] += s.count("\n")
+                break
+
+    def mark(self, phase):
+        """End the current phase
+
+        :param phase: str, the name of the phase that just finished
+        """
+        now = time.perf_counter()
+        self.phases[phase] = now - self.start_time
+        self.start_time = now
+
+    def stop(self):
+        """Stop counting output, the counts are kept"""
+        for output in self.outputs:
+            if output.counter is self:
+                output.counter = None
+
+        self.outputs = []
+
+    def get_rusage(self):
+        if resource:
+            return resource.getrusage(resource.RUSAGE_SELF)
+
+    def get_stats(self):
+        """Returns all the stats in a flat dict
+
+        :returns: dict[str, int|float|str]
+        """
+        stats = {}
+        for phase, elapsed in self.phases.items():
+            stats[f"wall_{phase}_ms"] = round(elapsed * 1000, 3)
+        stats["wall_total_ms"] = round(sum(self.phases.values()) * 1000, 3)
+
+        if rusage := self.get_rusage():
+            stats["cpu_user_s"] = round(
+                rusage.ru_utime - self.rusage.ru_utime,
+                3,
+            )
+            stats["cpu_sys_s"] = round(
+                rusage.ru_stime - self.rusage.ru_stime,
+                3,
+            )
+
+            # linux reports kilobytes, macOS reports bytes
+            maxrss = rusage.ru_maxrss
+            if sys.platform == "darwin":
+                maxrss = maxrss // 1024
+            stats["max_rss_kib"] = maxrss
+
+        for i, (before, after) in enumerate(zip(self.gc_stats, gc.get_stats())):
+            stats[f"gc_gen{i}"] = after["collections"] - before["collections"]
+
+        for name, (byte_count, line_count) in self.written.items():
+            stats[f"{name}_bytes"] = byte_count
+            stats[f"{name}_lines"] = line_count
+
+        stats["imports_skipped"] = len(self.skipped_imports)
+        if self.skipped_imports:
+            stats["imports_skipped_modules"] = ",".join(self.skipped_imports)
+
+        return stats
+
+    def write(self, output, path=""):
+        """Print the stats to stderr or write them as json to path
+
+        :param output: Output
+        :param path: str, if set the stats are written to this file
+        """
+        stats = self.get_stats()
+        if path:
+            with open(path, "w") as fp:
+                json.dump(stats, fp)
+
+        else:
+            output.table(
+                list(stats.items()),
+                logmethod=output.stderr.info,
+                output_format="text",
+            )
+
+
+class LoopMonitor(object):
+    """Watches for code that blocks the event loop while a command runs
+
+    A task on the loop sleeps for .interval over and over, how much later
+    than expected it wakes up is the loop's lag and is counted into a
+    histogram. A watcher thread checks that the task keeps waking up, if it
+    doesn't for longer than .threshold then the loop is blocked and the
+    stack of the loop's thread is logged to stderr so the blocking code can
+    be found
+
+    :example:
+        monitor = LoopMonitor(output)
+        monitor.start()
+        # run async code
+        await monitor.stop()
+        monitor.write()
+    """
+    buckets = [1, 5, 10, 50, 100, 500, 1000]
+    """The upper bounds, in milliseconds, of the histogram buckets"""
+
+    def __init__(self, output, threshold=None):
+        """
+        :param output: Output
+        :param threshold: int, milliseconds the loop can be blocked before
+            the stack is logged, defaults to CAPTAIN_LOOP_MONITOR_THRESHOLD,
+            has to be more than 0
+        """
+        self.output = output
+        if threshold is None:
+            threshold = environ.LOOP_MONITOR_THRESHOLD
+
+        if threshold <= 0:
+            # the probe and the watcher sleep for a fraction of the threshold
+            # so they would never sleep
+            raise ValueError(
+                f"LoopMonitor threshold has to be more than 0ms: {threshold}",
+            )
+
+        self.threshold = threshold / 1000
+        self.interval = self.threshold / 4
+
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.max_lag = 0.0
+        self.event = threading.Event()
+
+    def start(self):
+        """Start monitoring the running loop, this has to be called from
+        the loop's thread"""
+        self.thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.task = asyncio.get_running_loop().create_task(self.probe())
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+
+        except asyncio.CancelledError:
+            pass
+
+        self.event.set()
+        self.thread.join()
+
+    async def probe(self):
+        """Runs on the loop, measures how late each wakeup is"""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.heartbeat = time.monotonic()
+            self.add(self.heartbeat - start - self.interval)
+
+    def watch(self):
+        """Runs in the watcher thread, logs the loop thread's stack when the
+        probe hasn't woken up in more than .threshold seconds"""
+        reported = None
+        while not self.event.wait(self.interval):
+            heartbeat = self.heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked > self.threshold and heartbeat != reported:
+                # only log each block once
+                reported = heartbeat
+                if frame := sys._current_frames().get(self.thread_id):
+                    self.output.write(
+                        "Event loop blocked for over {:.0f}ms:\n{}",
+                        blocked * 1000,
+                        "".join(traceback.format_stack(frame)).rstrip(),
+                        logmethod=self.output.stderr.warning,
+                    )
+
+    def add(self, lag):
+        """Count lag (seconds) into the histogram"""
+        lag = max(lag, 0.0)
+        self.max_lag = max(self.max_lag, lag)
+        self.counts[bisect.bisect_left(self.buckets, lag * 1000)] += 1
+
+    def get_histogram(self):
+        """Returns the histogram rows
+
+        :returns: list[tuple[str, int]], (bucket, count) for each bucket
+        """
+        labels = [f"<= {b}ms" for b in self.buckets]
+        labels.append(f"> {self.buckets[-1]}ms")
+        return list(zip(labels, self.counts))
+
+    def write(self):
+        """Print the lag histogram to stderr"""
+        self.output.write(
+            "Event loop lag, max {:.1f}ms",
+            self.max_lag * 1000,
+            logmethod=self.output.stderr.info,
+        )
+        self.output.table(
+            self.get_histogram(),
+            headers=["lag", "count"],
+            logmethod=self.output.stderr.info,
+            output_format="text",
+        )
+
+
+class Benchmark(object):
+    """Collects the timings of running a command over and over, see
+    Application.bench and the --captain-bench flag
+
+    Each run is split into the parse phase (parsing the argv, creating the
+    command, and converting the parsed values into the command's arguments)
+    and the handle phase (running the command through the middleware)
+
+    :example:
+        benchmark = Benchmark()
+        with benchmark.suppress():
+            for _ in range(100):
+                # parse and handle
+                benchmark.add(parse_seconds, handle_seconds)
+        benchmark.write(output)
+    """
+    percentiles = [50, 95, 99]
+
+    def __init__(self):
+        self.timings = {
+            "parse": [],
+            "handle": [],
+            "total": [],
+        }
+        self.loggers = {}
+
+    @contextmanager
+    def suppress(self):
+        """While this is active anything written to stdout or stderr,
+        including with print, goes to os.devnull, see .silence"""
+        with open(os.devnull, "w") as stream:
+            for name in ["stdout", "stderr"]:
+                logger = logging.getLogger(f"{__name__}.{name}")
+                logger.propagate = False
+                logger.setLevel(logging.DEBUG)
+                # the output is still formatted like it would be for real
+                handler = logging.StreamHandler(stream=stream)
+                handler.terminator = ""
+                handler.setFormatter(logging.Formatter(logging.MSG_FORMAT))
+                logger.handlers = [handler]
+                self.loggers[name] = logger
+
+            try:
+                with redirect_stdout(stream), redirect_stderr(stream):
+                    yield self
+
+            finally:
+                for logger in self.loggers.values():
+                    logger.handlers = []
+                self.loggers = {}
+
+    def silence(self, output):
+        """Send everything output writes to the .suppress stream
+
+        :param output: Output, a command's output
+        """
+        output.stdout = self.loggers["stdout"]
+        output.stderr = self.loggers["stderr"]
+
+    def add(self, parse, handle):
+        """Add one run's timings
+
+        :param parse: float, seconds
+        :param handle: float, seconds
+        """
+        self.timings["parse"].append(parse)
+        self.timings["handle"].append(handle)
+        self.timings["total"].append(parse + handle)
+
+    def get_percentile(self, timings, percent):
+        """Nearest rank percentile, see io.Spans.get_percentile"""
+        index = math.ceil(percent / 100 * len(timings)) - 1
+        return timings[max(index, 0)]
+
+    def get_stats(self):
+        """Returns a row for each phase with the phase's name, min, mean,
+        and percentile latencies in milliseconds, and runs per second
+
+        :returns: list[tuple]
+        """
+        rows = []
+        for phase, timings in self.timings.items():
+            if not timings:
+                continue
+
+            timings = sorted(timings)
+            mean = sum(timings) / len(timings)
+            row = [phase, round(timings[0] * 1000, 3), round(mean * 1000, 3)]
+            for percent in self.percentiles:
+                row.append(
+                    round(self.get_percentile(timings, percent) * 1000, 3)
+                )
+            row.append(round(1 / mean, 1) if mean else 0.0)
+            rows.append(tuple(row))
+
+        return rows
+
+    def get_headers(self):
+        return [
+            "phase",
+            "min ms",
+            "mean ms",
+            *(f"p{p} ms" for p in self.percentiles),
+            "ops/s",
+        ]
+
+    def write(self, output):
+        """Print the latency table to stderr
+
+        :param output: Output
+        """
+        output.write(
+            "Benchmark, {} runs",
+            len(self.timings["total"]),
+            logmethod=output.stderr.info,
+        )
+        output.table(
+            self.get_stats(),
+            headers=self.get_headers(),
+            logmethod=output.stderr.info,
+            output_format="text",
+        )
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
+import sys
 import re
 import inspect
 import types
 import argparse
-from collections.abc import Iterable, Generator, Mapping
+from collections.abc import Iterable, Generator, Mapping, MutableMapping
 
 from datatypes import (
     NamingConvention,
@@ -20,6 +21,29 @@ from datatypes.reflection import (
 from .compat import *
 
 
+def intern(value):
+    """Intern value if it is a string, or the strings in value if it is a
+    list or set, the same names (eg, module names, flags) are repeated
+    throughout a command tree so this keeps one copy of each
+
+    .. note:: str children (eg, NamingConvention) become str since only a str
+        can be interned
+
+    :param value: Any
+    :returns: Any, value with its strings interned
+    """
+    if isinstance(value, str):
+        return sys.intern(str(value))
+
+    elif type(value) is list:
+        return [sys.intern(str(v)) if isinstance(v, str) else v for v in value]
+
+    elif type(value) is set:
+        return {sys.intern(str(v)) if isinstance(v, str) else v for v in value}
+
+    return value
+
+
 class ReflectCommand(ReflectClass):
     """Provides some handy helper introspection methods for dealing with the
     Command class"""
@@ -250,30 +274,47 @@ class ReflectParam(ReflectParam):
         return flags
 
 
-class Argument(tuple):
+class Argument(object):
     """This class gets all the *args and **kwargs together to be passed to an
     argparse.ArgumentParser.add_argument() call, this combines the signature
     values with the @arg() arguments to get a comprehensive set of values that
     will be passed to add_argument
 
-    This class is a tuple where self[0] is *args, and self[1] is **kwargs for
-    add_argument(), so the call would be: add_argument(*self[0], **self[1])
+    This class acts like a tuple where self[0] is *args, and self[1] is
+    **kwargs for add_argument(), so the call would be:
+    add_argument(*self[0], **self[1])
+
+    It isn't an actual tuple because a tuple child can't have slots and there
+    is one of these for every argument of every command
 
     https://docs.python.org/3/library/argparse.html#the-add-argument-method
     """
-    @property
-    def positionals(self):
-        return self[0]
+    __slots__ = ("positionals", "keywords", "name")
 
-    @property
-    def keywords(self):
-        return self[1]
+    def __init__(self, *names, **kwargs):
+        self.positionals = list(names)
+        self.keywords = kwargs
+        self._resolve()
+
+    def __getitem__(self, index):
+        return (self.positionals, self.keywords)[index]
+
+    def __iter__(self):
+        yield self.positionals
+        yield self.keywords
+
+    def __len__(self):
+        return 2
 
-    def __new__(cls, *names, **kwargs):
-        instance = super().__new__(cls, [list(names), kwargs])
-        instance._resolve()
-        #pout.v(instance, names, kwargs)
-        return instance
+    def __eq__(self, other):
+        if isinstance(other, (Argument, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self[0]!r}, {self[1]!r})"
 
     def __set_name__(self, command_class, name):
         """This is called right after __init__
@@ -315,14 +356,15 @@ class Argument(tuple):
         # set name, use dest if we have it, use name if it's a positional
         if dest := self[1].get("dest"):
             self[1].setdefault("metavar", NamingConvention(dest).cli_metavar())
-            self.name = dest
+            self.name = dest = intern(dest)
+            self[1]["dest"] = dest
 
         else:
             # if this fails, `.name` will have to be set in __set_name__
             if self[0] and self.is_positional():
                 nc = NamingConvention(self[0][0])
                 self[1].setdefault("metavar", nc.cli_metavar())
-                self.name = nc.cli_positional()
+                self.name = intern(nc.cli_positional())
 
         # for our purposes, default and required are mutually exclusive
         if "default" in self[1]:
@@ -343,6 +385,8 @@ class Argument(tuple):
             if vs := self[1].pop(k, []):
                 self[0].extend(vs)
 
+        self[0][:] = intern(self[0])
+
     def is_positional(self):
         return self[0] and not self.is_keyword()
 
@@ -412,20 +456,121 @@ class Argument(tuple):
                 return ReflectType(bool)
 
 
+class NodeValue(MutableMapping):
+    """The value of every Pathfinder node
+
+    This is a dict with a slot for each of the keys the tree sets, a dict
+    for every node adds up when a tree has thousands of commands. Keys
+    without a slot are kept in a dict that is only created when one of those
+    keys is set. String values, and the strings in list and set values, are
+    interned
+    """
+    slot_keys = (
+        "command_class",
+        "parser",
+        "subparsers",
+        "aliases",
+        "description",
+        "version",
+        "method_name",
+        "method",
+        "class",
+        "class_name",
+        "module",
+        "module_name",
+        "modules",
+        "keys",
+        "module_keys",
+        "class_keys",
+        "method_keys",
+    )
+    """The keys that have a slot, a key's slot is the key prefixed with an
+    underscore so a key like "keys" doesn't hide a mapping method"""
+
+    __slots__ = tuple(map("_{}".format, slot_keys)) + ("_extra",)
+
+    slot_names = dict(zip(slot_keys, __slots__))
+
+    def __init__(self, *args, **kwargs):
+        self._extra = None
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        if slot := self.slot_names.get(key):
+            try:
+                return getattr(self, slot)
+
+            except AttributeError:
+                raise KeyError(key) from None
+
+        if self._extra is None:
+            raise KeyError(key)
+
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        value = intern(value)
+        if slot := self.slot_names.get(key):
+            setattr(self, slot, value)
+
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if slot := self.slot_names.get(key):
+            try:
+                delattr(self, slot)
+
+            except AttributeError:
+                raise KeyError(key) from None
+
+        else:
+            if self._extra is None:
+                raise KeyError(key)
+
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+
+    def __contains__(self, key):
+        if slot := self.slot_names.get(key):
+            return hasattr(self, slot)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key, slot in self.slot_names.items():
+            if hasattr(self, slot):
+                yield key
+
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def copy(self):
+        return type(self)(self)
+
+
 class Pathfinder(MethodpathFinder):
     """Internal class to Router. This handles setting the subcommand hierarchy,
     this is used to create all the parsers in the Router."""
     def _get_node_default_value(self, **kwargs):
         """The default value for any node that isn't a module or class"""
-        return {
-            "command_class": self.kwargs["command_class"],
-            "parser": None,
-            "subparsers": None,
-            "aliases": set(),
-            "description": "",
-            "version": "",
-            "method_name": "handle",
-        }
+        return NodeValue(
+            command_class=self.kwargs["command_class"],
+            parser=None,
+            subparsers=None,
+            aliases=set(),
+            description="",
+            version="",
+            method_name="handle",
+        )
 
     def _get_node_module_info(self, key, **kwargs):
         """All modules loaded from command prefixes go through this method.
@@ -1,3 +1,4 @@
+import os
 import textwrap
 import sys
 import shlex
@@ -12,6 +13,11 @@ from captain import Application, Command
 from captain.logging import QuietFilter
 
 
+# the help, completion, discovery, and plugin caches are written here instead
+# of the user's cache directory
+os.environ["XDG_CACHE_HOME"] = testdata.create_dir().path
+
+
 class FileScript(object):
     @property
     def parser(self):
@@ -25,7 +31,7 @@ class FileScript(object):
 
     @classmethod
     def reset_command_classes(cls):
-        Command.command_classes = {}
+        Command.command_classes.clear()
 
     def __init__(self, body="", **kwargs):
         # we reset the command classes everytime we create a new script
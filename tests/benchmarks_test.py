@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import sys
+
+from benchmarks.suite import CommandTree, Suite, compare
+from captain.interface import Application
+from captain.compat import *
+
+from . import testdata, TestCase
+
+
+class SuiteTest(TestCase):
+    def test_tree(self):
+        dirpath = testdata.create_dir()
+        sys.path.insert(0, dirpath.path)
+        suite = Suite()
+        try:
+            for shape in ["wide", "deep"]:
+                tree = CommandTree(dirpath.path, 20, shape)
+                with suite.commands():
+                    a = Application(command_prefixes=[tree.write()])
+                    parsed = a.parser.parse_args(tree.get_argv())
+                    self.assertEqual(
+                        tree.get_argv()[:-2],
+                        parsed._pathfinder_node.pathkeys,
+                    )
+                    self.assertEqual(1, parsed.foo)
+
+        finally:
+            sys.path.remove(dirpath.path)
+
+    def test_measure_memory(self):
+        suite = Suite()
+        self.assertLess(
+            suite.measure_memory(lambda: list(range(10))),
+            suite.measure_memory(lambda: list(range(10000))),
+        )
+
+    def test_compare(self):
+        baseline = {"results": {
+            "construct": {"value": 1.0, "unit": "s", "better": "lower"},
+            "call": {"value": 100.0, "unit": "ops/s", "better": "higher"},
+            "output": {"value": 100.0, "unit": "lines/s", "better": "higher"},
+        }}
+        current = {"results": {
+            "construct": {"value": 1.05, "unit": "s", "better": "lower"},
+            "call": {"value": 80.0, "unit": "ops/s", "better": "higher"},
+            "new": {"value": 1.0, "unit": "s", "better": "lower"},
+        }}
+
+        rows = {r["name"]: r for r in compare(baseline, current, 0.1)}
+        self.assertEqual(2, len(rows))
+        self.assertFalse(rows["construct"]["regression"])
+        self.assertTrue(rows["call"]["regression"])
+        self.assertAlmostEqual(0.2, rows["call"]["change"])
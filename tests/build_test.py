@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import sys
+import subprocess
+
+from captain.build import Builder, SnapshotIndex
+from captain.compat import *
+
+from . import testdata, TestCase
+
+
+class BuilderTest(TestCase):
+    def create_project(self):
+        modpath = self.get_module_name()
+        p = self.create_modules({
+            f"{modpath}.commands": {
+                "__init__": "",
+                "foo": [
+                    "from captain import Command",
+                    "",
+                    "class Default(Command):",
+                    "    '''the foo command'''",
+                    "    def handle(self, count: int = 1):",
+                    "        self.output.out(f'foo {count}')",
+                ],
+            },
+        })
+        return modpath, p
+
+    def test_build(self):
+        modpath, p = self.create_project()
+        output = testdata.get_file("tool.pyz")
+
+        builder = Builder(p, prefixes=[f"{modpath}.commands"])
+        builder.build(output.path)
+        self.assertTrue(output.exists())
+        self.assertEqual(
+            [f"{modpath}.commands", f"{modpath}.commands.foo"],
+            builder.snapshot["modules"][f"{modpath}.commands"],
+        )
+        self.assertTrue("foo --help" in builder.snapshot["help"])
+
+        r = subprocess.run(
+            [sys.executable, output.path, "foo", "--count=2"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual("foo 2", r.stdout.strip())
+
+        r = subprocess.run(
+            [sys.executable, output.path, "foo", "--help"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(builder.snapshot["help"]["foo --help"], r.stdout)
+
+        timings = builder.measure(["foo"], count=1)
+        self.assertTrue(timings["source"] > 0)
+        self.assertTrue(timings["zipapp"] > 0)
+
+    def test_snapshot_index(self):
+        modpath, p = self.create_project()
+        prefix = f"{modpath}.commands"
+
+        index = SnapshotIndex({prefix: [prefix]})
+        modules = index.find_modules([prefix], [], "")
+        self.assertEqual([prefix], list(modules[prefix]))
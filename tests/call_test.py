@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import subprocess
+import sys
+import json
 
-from captain.call import Command
+from captain.call import Command, CommandRegistry
 from captain.reflection import Argument
 
-from . import TestCase, FileScript
+from . import TestCase, FileScript, testdata
 
 
 class CommandTest(TestCase):
@@ -56,6 +58,46 @@ class CommandTest(TestCase):
         c_class = s.command_class("foo-one")
         self.assertEqual(["bar"], c_class.get_aliases())
 
+    async def test_imports(self):
+        foo_modpath = testdata.create_module(["VALUE = 'foo'"])
+        bar_modpath = testdata.create_module(["VALUE = 'bar'"])
+
+        s = FileScript(f"""
+            class Base(Command):
+                imports = {{"value": "{foo_modpath}:VALUE"}}
+
+            class Foo(Base):
+                imports = {{"foo": "{foo_modpath}"}}
+
+                def handle(self):
+                    self.output.out(self.foo.VALUE)
+                    self.output.out(self.value)
+
+            class Bar(Command):
+                imports = {{"bar": "{bar_modpath}"}}
+
+                def handle(self):
+                    self.output.out(self.bar.VALUE)
+        """)
+
+        self.assertEqual(
+            {"value": f"{foo_modpath}:VALUE", "foo": f"{foo_modpath}"},
+            s.command_class("foo").get_imports(),
+        )
+        self.assertFalse(str(foo_modpath) in sys.modules)
+
+        path = testdata.get_file()
+        r = await s.run("foo", CAPTAIN_STATS="1", CAPTAIN_STATS_PATH=path.path)
+        self.assertEqual("foo\nfoo", r)
+        self.assertFalse(str(bar_modpath) in sys.modules)
+
+        stats = json.loads(path.read_text())
+        self.assertEqual(1, stats["imports_skipped"])
+        self.assertEqual(str(bar_modpath), stats["imports_skipped_modules"])
+
+        r = await s.run("bar")
+        self.assertEqual("bar", r)
+
     async def test_unnamed_arg(self):
         """https://github.com/Jaymon/captain/issues/64"""
         s = FileScript([
@@ -172,3 +214,61 @@ class CommandTest(TestCase):
         with self.assertRaises(subprocess.CalledProcessError):
             await s.run("")
 
+
+class CommandRegistryTest(TestCase):
+    def test_modules(self):
+        class Foo(Command): pass
+        class Bar(Command): pass
+
+        r = CommandRegistry()
+        r.add(Foo)
+        r["che.boo:Bar"] = Bar
+        self.assertEqual(2, len(r))
+        self.assertEqual([Foo], list(r.get_module_classes([__name__])))
+        self.assertEqual([Bar], list(r.get_module_classes(["che.boo"])))
+
+        self.assertIs(Bar, r.pop("che.boo:Bar"))
+        self.assertEqual([], list(r.get_module_classes(["che.boo"])))
+
+        r.clear()
+        self.assertEqual({}, r.modules)
+
+    def test_modules_sync(self):
+        class Foo(Command): pass
+        class Bar(Command): pass
+
+        r = CommandRegistry()
+        self.assertIs(Foo, r.setdefault("foo:Foo", Foo))
+        self.assertIs(Foo, r.setdefault("foo:Foo", Bar))
+        self.assertEqual([Foo], list(r.get_module_classes(["foo"])))
+
+        r.update({"bar:Bar": Bar})
+        self.assertEqual([Bar], list(r.get_module_classes(["bar"])))
+
+        r2 = r.copy()
+        self.assertIsInstance(r2, CommandRegistry)
+        del r2["foo:Foo"]
+        self.assertEqual([], list(r2.get_module_classes(["foo"])))
+        self.assertEqual([Foo], list(r.get_module_classes(["foo"])))
+
+        self.assertEqual(("foo:Foo", Foo), r.popitem())
+        self.assertEqual({"bar"}, set(r.modules))
+
+    def test_namespace_classes(self):
+        class Foo(Command):
+            class Bar(Command): pass
+        class Che(Command): pass
+
+        r = Command.command_classes
+        self.assertEqual(
+            [Foo.Bar, Foo],
+            list(r.get_namespace_classes({"Foo": Foo, "Command": Command})),
+        )
+
+    def test_subclass(self):
+        class Foo(Command): pass
+        self.assertEqual(
+            [Foo],
+            list(Command.command_classes.get_module_classes([__name__])),
+        )
+
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import subprocess
+
+from captain.complete import Manifest, Completer
+from captain.interface import Application
+from captain import complete
+from captain.compat import *
+
+from . import testdata, TestCase, FileScript
+
+
+class CompleteTest(TestCase):
+    def get_script(self):
+        return FileScript("""
+            class Default(Command):
+                def handle(self, foo: int = 0):
+                    pass
+
+            class FooBar(Command):
+                @arg("--mode", choices=["fast", "slow"], default="fast")
+                def handle(self, verbose: bool = False, **kwargs):
+                    pass
+
+                class Che(Command):
+                    def handle(self, count: int = 1):
+                        pass
+        """)
+
+    def test_manifest(self):
+        s = self.get_script()
+        manifest = Manifest.create(s.application)
+
+        tree = manifest["tree"]
+        self.assertTrue("--foo" in tree["flags"])
+        self.assertTrue("--captain-complete" in tree["flags"])
+        self.assertEqual("foo-bar", tree["aliases"]["foo_bar"])
+
+        node = tree["commands"]["foo-bar"]
+        self.assertEqual(["fast", "slow"], node["flags"]["--mode"]["choices"])
+        self.assertFalse(node["flags"]["--verbose"].get("value", False))
+        self.assertTrue("che" in node["commands"])
+        self.assertTrue(node["commands"]["che"]["flags"]["--count"]["value"])
+
+        self.assertTrue(s.path.path in manifest["files"])
+        self.assertFalse(manifest.is_stale())
+
+        os.utime(s.path.path, (1, 1))
+        self.assertTrue(manifest.is_stale())
+
+    def test_complete(self):
+        s = self.get_script()
+        c = Completer(Manifest.create(s.application))
+
+        self.assertEqual(["foo-bar"], c.complete([""]))
+        self.assertEqual(["foo_bar"], c.complete(["foo_"]))
+        self.assertEqual(["che"], c.complete(["foo-bar", ""]))
+        self.assertEqual(["che"], c.complete(["foo_bar", "c"]))
+        self.assertEqual(["--mode"], c.complete(["foo-bar", "--mo"]))
+        self.assertEqual(["fast", "slow"], c.complete(["foo-bar", "--mode", ""]))
+        self.assertEqual(["--mode=slow"], c.complete(["foo-bar", "--mode=s"]))
+        self.assertEqual(["slow"], c.complete(["foo-bar", "--mode", "=", "s"]))
+        self.assertEqual(["che"], c.complete(["foo-bar", "--mode", "fast", ""]))
+        self.assertEqual(["--count"], c.complete(["foo-bar", "che", "--co"]))
+        self.assertEqual([], c.complete(["foo-bar", "che", "--count", ""]))
+
+    async def test_script(self):
+        s = self.get_script()
+        path = testdata.get_file("complete.manifest")
+
+        r = await s.run("--captain-complete", CAPTAIN_COMPLETE_PATH=path.path)
+        self.assertTrue("complete -o default -F" in r)
+        self.assertTrue(path.exists())
+
+        r = await s.run("--captain-complete zsh", CAPTAIN_COMPLETE_PATH=path.path)
+        self.assertTrue("compdef" in r)
+
+        a = s.application
+        with testdata.capture() as c, self.assertRaises(SystemExit) as cm:
+            await a.run(["--captain-complete=powershell"])
+        self.assertEqual(2, cm.exception.code)
+        self.assertTrue("invalid choice: 'powershell'" in c)
+
+        # the completions run in an isolated interpreter without site
+        # packages, so captain's dependencies couldn't be imported
+        r = subprocess.run(
+            [
+                sys.executable,
+                "-I",
+                "-S",
+                complete.__file__,
+                path.path,
+                "program",
+                "--",
+                "foo-bar",
+                "--mode",
+                "",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual("fast\nslow", r.stdout.strip())
+
+    async def test_script_argv(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self, *args):
+                    self.output.out(args)
+        """)
+
+        a = s.application
+        with testdata.capture() as c:
+            await a.run(["--", "--captain-complete", "--captain-completely"])
+        self.assertTrue("--captain-completely" in c)
+
+        a = Application(command_prefixes=[s.path], complete=False)
+        with testdata.capture(), self.assertRaises(SystemExit):
+            await a.run(["--captain-complete=bash"])
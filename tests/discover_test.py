@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+from captain.discover import DiscoveryIndex, PluginIndex
+from captain.reflection import Pathfinder
+from captain.interface import Application
+from captain.compat import *
+
+from . import testdata, TestCase, FileScript
+
+
+class DiscoveryIndexTest(TestCase):
+    def create_tree(self):
+        modpath = self.get_module_name()
+        return modpath, self.create_modules({
+            "far.commands": {
+                "__init__": "",
+                "foo": "",
+                "che": {
+                    "__init__": "",
+                    "boo": "",
+                },
+            },
+            "build.commands": "",
+            "a.b.c.commands": "",
+        }, modpath=modpath)
+
+    def test_find_modules(self):
+        modpath, p = self.create_tree()
+        path = testdata.get_file()
+
+        index = DiscoveryIndex(path.path)
+        modules = index.find_modules([], [p], "commands")
+        self.assertEqual(
+            set(Pathfinder.find_modules([], [p], "commands")),
+            set(modules),
+        )
+        prefix = f"{modpath}.far.commands"
+        self.assertEqual(
+            [
+                prefix,
+                f"{prefix}.che",
+                f"{prefix}.che.boo",
+                f"{prefix}.foo",
+            ],
+            sorted(modules[prefix]),
+        )
+        self.assertFalse(f"{modpath}.a.b.c.commands" in modules)
+        self.assertTrue(path.exists())
+
+        index = DiscoveryIndex(path.path, ignore=["build"])
+        modules = index.find_modules([], [p], "commands")
+        self.assertEqual([prefix], list(modules))
+
+    def test_revalidate(self):
+        modpath, p = self.create_tree()
+        prefix = f"{modpath}.far.commands"
+        path = testdata.get_file()
+
+        index = DiscoveryIndex(path.path)
+        index.find_modules([prefix], [], "")
+        self.assertFalse(index.changed)
+
+        index = DiscoveryIndex(path.path)
+        index.walk_package = None # a valid index never walks
+        modules = index.find_modules([prefix], [], "")
+        self.assertEqual(4, len(modules[prefix]))
+
+        p.add_file(f"{modpath}/far/commands/bar.py", "")
+        index = DiscoveryIndex(path.path)
+        modules = index.find_modules([prefix], [], "")
+        self.assertTrue(f"{prefix}.bar" in modules[prefix])
+
+    def test_application(self):
+        modpath, p = self.create_tree()
+        prefix = f"{modpath}.far.commands"
+        path = testdata.get_file()
+
+        a = Application(command_prefixes=[prefix], discovery_index_path=path.path)
+        self.assertEqual(4, len(a.command_modules[prefix]))
+        self.assertFalse(path.exists())
+
+        a = Application(
+            command_prefixes=[prefix],
+            discovery_index=True,
+            discovery_index_path=path.path,
+        )
+        self.assertEqual(4, len(a.command_modules[prefix]))
+        self.assertTrue(path.exists())
+
+
+class PluginIndexTest(TestCase):
+    def create_plugins(self):
+        """Create an installed distribution with foo and bar plugins
+
+        :returns: tuple[str, str, Dirpath], the entry point group, the
+            plugins' module path prefix, and the site directory
+        """
+        modpath = self.get_module_name()
+        command = [
+            "from captain import Command",
+            "",
+            "class Default(Command):",
+            "    def handle(self):",
+            "        self.output.out(__name__)",
+        ]
+        p = self.create_modules({
+            f"{modpath}_foo.commands": {
+                "__init__": command,
+                "foo": command,
+                "other": command,
+            },
+            f"{modpath}_bar.commands": {"__init__": "", "bar_che": command},
+        })
+
+        group = f"{modpath}.commands"
+        p.add_file(
+            f"{modpath}-1.0.dist-info/METADATA",
+            f"Metadata-Version: 2.1\nName: {modpath}\nVersion: 1.0\n",
+        )
+        p.add_file(
+            f"{modpath}-1.0.dist-info/entry_points.txt",
+            "\n".join([
+                f"[{group}]",
+                f"foo = {modpath}_foo.commands",
+                f"bar_che = {modpath}_bar.commands",
+            ]),
+        )
+        return group, modpath, p
+
+    def test_get_prefixes(self):
+        group, modpath, p = self.create_plugins()
+        path = testdata.get_file()
+
+        index = PluginIndex(path.path, group)
+        self.assertEqual(
+            {
+                f"{modpath}_bar.commands": ["bar-che"],
+                f"{modpath}_foo.commands": ["foo"],
+            },
+            index.get_prefixes(),
+        )
+        self.assertTrue(path.exists())
+
+        self.assertEqual(
+            {f"{modpath}_foo.commands": ["foo"]},
+            index.get_prefixes(["--quiet", "foo"]),
+        )
+        self.assertEqual(
+            [f"{modpath}_bar.commands"],
+            list(index.get_prefixes(["bar-che"])),
+        )
+
+        # only the subcommand selects a plugin
+        self.assertEqual({}, index.get_prefixes(["--help"]))
+        self.assertEqual({}, index.get_prefixes(["che", "foo"]))
+        self.assertEqual({}, index.get_prefixes(["--", "foo"]))
+
+        # a valid index is never rewritten
+        mtime = os.stat(path.path).st_mtime_ns
+        PluginIndex(path.path, group).get_prefixes()
+        self.assertEqual(mtime, os.stat(path.path).st_mtime_ns)
+
+        p.add_file(
+            f"{modpath}_che-1.0.dist-info/METADATA",
+            f"Metadata-Version: 2.1\nName: {modpath}_che\nVersion: 1.0\n",
+        )
+        p.add_file(
+            f"{modpath}_che-1.0.dist-info/entry_points.txt",
+            f"[{group}]\nche = {modpath}_che.commands",
+        )
+        prefixes = PluginIndex(path.path, group).get_prefixes()
+        self.assertTrue(f"{modpath}_che.commands" in prefixes)
+
+    async def test_application(self):
+        group, modpath, _ = self.create_plugins()
+        a = Application(command_prefixes=[], plugin_group=group)
+
+        with testdata.capture() as c:
+            await a.run(["foo"])
+        self.assertTrue(f"{modpath}_foo.commands.foo" in c)
+        self.assertFalse(f"{modpath}_bar.commands" in sys.modules)
+
+        with testdata.capture() as c:
+            await a.run(["bar-che"])
+        self.assertTrue(f"{modpath}_bar.commands.bar_che" in c)
+
+        a = Application(command_prefixes=[], plugin_group=group)
+        with testdata.capture() as c, self.assertRaises(SystemExit):
+            await a.run(["--help"])
+        self.assertTrue("bar-che" in c)
+
+        # a plugin only adds the subcommand it is named
+        self.assertEqual(["bar-che", "foo"], sorted(a.pathfinder.keys()))
+        self.assertFalse(
+            a.pathfinder.value["command_class"].__module__.startswith(modpath)
+        )
+
+    async def test_application_local(self):
+        group, modpath, _ = self.create_plugins()
+        s = FileScript("""
+            class Default(Command):
+                def handle(self, *args):
+                    self.output.out(args)
+        """)
+
+        # plugins are only used when the application has a group
+        a = Application(command_prefixes=[s.path])
+        a.command_modules
+        self.assertEqual({}, a.plugin_prefixes)
+
+        # the plugins aren't imported for a local command even if one of
+        # its values is a plugin's name
+        a = Application(command_prefixes=[s.path], plugin_group=group)
+        with testdata.capture() as c:
+            await a.run(["che", "foo"])
+        self.assertTrue("foo" in c)
+        self.assertFalse(f"{modpath}_foo.commands" in sys.modules)
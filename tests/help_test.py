@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import os
+
+from captain.help import HelpCache
+from captain.interface import Application
+from captain.compat import *
+
+from . import testdata, TestCase, FileScript
+
+
+class HelpCacheTest(TestCase):
+    def test_get_key(self):
+        self.assertTrue(HelpCache.get_key(["--help"]).endswith(" --help"))
+        self.assertTrue(HelpCache.get_key(["foo", "-h"]).endswith(" foo -h"))
+        self.assertTrue(HelpCache.get_key(["--version"]))
+        self.assertEqual("", HelpCache.get_key(["foo"]))
+        self.assertEqual("", HelpCache.get_key(["--bar=1", "--help"]))
+
+    def test_set_get(self):
+        path = testdata.get_file()
+        modpath = testdata.create_module(["foo = 1"])
+        files = {modpath.path: os.stat(modpath.path).st_mtime}
+
+        hc = HelpCache(path.path)
+        self.assertIsNone(hc.get("--help"))
+
+        hc.set("--help", "foo help", files)
+        hc.set("-h", "foo h", files)
+        self.assertEqual("foo help", hc.get("--help"))
+        self.assertEqual("foo h", hc.get("-h"))
+
+        os.utime(modpath.path, (1, 1))
+        self.assertIsNone(hc.get("--help"))
+
+    async def test_run(self):
+        s = FileScript(subcommands=True)
+        path = testdata.get_file("help.cache")
+
+        r1 = await s.run("--help", CAPTAIN_HELP_CACHE_PATH=path.path)
+        self.assertTrue("usage" in r1)
+        self.assertFalse(path.exists())
+
+        environ = {
+            "CAPTAIN_HELP_CACHE": "1",
+            "CAPTAIN_HELP_CACHE_PATH": path.path,
+        }
+        r1 = await s.run("--help", **environ)
+        self.assertTrue("usage" in r1)
+        self.assertTrue(path.exists())
+
+        r2 = await s.run("foo --help", **environ)
+        self.assertNotEqual(r1, r2)
+
+        with testdata.environment(**environ):
+            # a cache hit doesn't find commands or build parsers
+            a = Application(command_prefixes=[s.path], version="0.0.1")
+            self.assertEqual(r2, a.help(["foo", "--help"]).strip())
+            self.assertFalse("pathfinder" in vars(a))
+
+            os.utime(s.path.path, (1, 1))
+            a = Application(command_prefixes=[s.path], version="0.0.1")
+            self.assertEqual(r2, a.help(["foo", "--help"]).strip())
+            self.assertTrue("pathfinder" in vars(a))
+
+    async def test_environ(self):
+        s = FileScript("""
+            class Default(Command):
+                @arg("--foo", "$FOO", default=1, help="the foo")
+                def handle(self, foo):
+                    pass
+        """)
+        path = testdata.get_file("help.cache")
+
+        with testdata.environment(CAPTAIN_HELP_CACHE_PATH=path.path):
+            r = s.application.help(["--help"])
+            self.assertTrue("(default: 1)" in r)
+
+            with testdata.environment(FOO="2"):
+                r = s.application.help(["--help"])
+                self.assertTrue("(default: 2)" in r)
+
+                a = s.application
+                r = a.help(["--help"])
+                self.assertTrue("(default: 2)" in r)
+                self.assertFalse("pathfinder" in vars(a))
+
+            self.assertIsNone(HelpCache(path.path, "0.0.2").load())
+
+            with testdata.environment(CAPTAIN_QUIET_DEFAULT="D"):
+                a = s.application
+                a.help(["--help"])
+                self.assertTrue("pathfinder" in vars(a))
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 import subprocess
+import json
+import re
+import tracemalloc
 
-from . import TestCase, FileScript
+from . import TestCase, FileScript, testdata
 from captain.interface import Application
+from captain.profile import LoopMonitor
+from captain.io import Output
 
 
 class ApplicationTest(TestCase):
@@ -10,6 +15,259 @@ class ApplicationTest(TestCase):
         c = FileScript()
         self.assertTrue("0.0.1" in (await c.run("--version")))
 
+    async def test_output_format(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self):
+                    self.output.table([(1, "foo"), (2, "bar")])
+                    self.output.record({"che": 3})
+
+            class Foo(Command):
+                def handle(self, format="yaml"):
+                    self.output.out(format)
+        """)
+
+        r = await s.run()
+        self.assertTrue("| 1 | foo |" in r)
+
+        r = await s.run("--format=jsonl")
+        self.assertEqual("[1, \"foo\"]\n[2, \"bar\"]\n{\"che\": 3}", r)
+
+        r = await s.run("--format csv")
+        self.assertEqual("1,foo\n2,bar\nche\n3", r)
+
+        r = await s.run("foo --format=json")
+        self.assertEqual("json", r)
+
+    async def test_report_spans(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self):
+                    with self.span("foo"):
+                        self.output.out("bar")
+        """)
+
+        path = testdata.get_file()
+        r = await s.run(
+            CAPTAIN_SPANS_SUMMARY="1",
+            CAPTAIN_SPANS_TRACE=path.path,
+        )
+        self.assertTrue("| foo " in r)
+        self.assertEqual("foo", json.loads(path.read_text())["traceEvents"][0]["name"])
+
+        r = await s.run()
+        self.assertEqual("bar", r)
+
+    async def test_captain_profile(self):
+        s = FileScript("""
+            import asyncio
+
+            class Default(Command):
+                async def handle(self):
+                    await asyncio.sleep(0)
+                    self.output.out(sum(range(1000)))
+        """)
+
+        path = testdata.get_file("out.pstats")
+        r = await s.run(f"--captain-profile={path}")
+        self.assertTrue("499500" in r)
+        self.assertTrue("cumulative" in r)
+        self.assertTrue(path.exists())
+
+        collapsed = path.parent.get_file("out.collapsed").read_text()
+        self.assertTrue(";" in collapsed)
+
+        r = await s.run()
+        self.assertEqual("499500", r)
+
+    async def test_captain_memprofile(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self):
+                    self.items = [str(i) for i in range(10000)]
+                    self.output.out(len(self.items))
+        """)
+
+        r = await s.run("--captain-memprofile")
+        self.assertTrue("Memory parse: peak" in r)
+        self.assertTrue("Memory handle: peak" in r)
+        self.assertTrue(f"{s.path.path}:" in r)
+
+        r = await s.run("--captain-memprofile=command")
+        self.assertTrue(f"{s.path.path}:" in r)
+        self.assertFalse("argparse.py" in r)
+
+        r = await s.run()
+        self.assertEqual("10000", r)
+
+    async def test_captain_memprofile_tracing(self):
+        """tracing that was started before the run is left running"""
+        s = FileScript("""
+            class Default(Command):
+                def handle(self):
+                    self.output.out("foo")
+        """)
+
+        tracemalloc.start()
+        try:
+            r = await s.run("--captain-memprofile")
+            self.assertTrue("Memory handle: peak" in r)
+            self.assertTrue(tracemalloc.is_tracing())
+
+        finally:
+            tracemalloc.stop()
+
+    async def test_captain_memprofile_argv(self):
+        s = FileScript("""
+            import tracemalloc
+
+            class Default(Command):
+                def handle(self, *args):
+                    self.output.out(tracemalloc.is_tracing())
+        """)
+
+        a = Application(command_prefixes=[s.path], profile=False)
+        with testdata.capture() as r:
+            await a.run(["--", "--captain-memprofile"])
+        self.assertEqual("False", str(r).strip())
+
+        a = Application(command_prefixes=[s.path])
+        with testdata.capture() as r:
+            await a.run(["--", "--captain-memprofile-foo"])
+        self.assertEqual("False", str(r).strip())
+
+    async def test_stats(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self):
+                    self.output.out("foo")
+                    self.output.out("bar")
+        """)
+
+        path = testdata.get_file()
+        r = await s.run(CAPTAIN_STATS="1", CAPTAIN_STATS_PATH=path.path)
+        self.assertEqual("foo\nbar", r)
+
+        stats = json.loads(path.read_text())
+        self.assertEqual(8, stats["stdout_bytes"])
+        self.assertEqual(2, stats["stdout_lines"])
+        for k in ["startup", "parse", "handle", "total"]:
+            self.assertTrue(f"wall_{k}_ms" in stats)
+        self.assertTrue("gc_gen2" in stats)
+
+        r = await s.run(CAPTAIN_STATS="1")
+        self.assertTrue("| stdout_lines" in r)
+
+        r = await s.run(
+            CAPTAIN_STATS="1",
+            CAPTAIN_STATS_PATH=path.path,
+            CAPTAIN_OUTPUT_QUEUE="1",
+        )
+        self.assertEqual("foo\nbar", r)
+        stats = json.loads(path.read_text())
+        self.assertEqual(8, stats["stdout_bytes"])
+        self.assertEqual(2, stats["stdout_lines"])
+
+    async def test_stats_startup(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self):
+                    pass
+        """)
+
+        path = testdata.get_file()
+        a = Application(
+            command_prefixes=[s.path],
+            stats=True,
+            stats_path=path.path,
+        )
+        await a.run([])
+        self.assertTrue("wall_startup_ms" in json.loads(path.read_text()))
+
+        # the startup of every run after the first is measured from the
+        # start of the run, not from when the application was created
+        a.created -= 100
+        await a.run([])
+        stats = json.loads(path.read_text())
+        self.assertLess(stats["wall_startup_ms"], 100000)
+
+    async def test_loop_monitor(self):
+        s = FileScript("""
+            import asyncio
+            import time
+
+            class Default(Command):
+                async def handle(self):
+                    await asyncio.sleep(0.02)
+                    time.sleep(0.5)
+                    await asyncio.sleep(0.02)
+        """)
+
+        # the block is 10 times the threshold so it will always be caught
+        r = await s.run(
+            CAPTAIN_LOOP_MONITOR="1",
+            CAPTAIN_LOOP_MONITOR_THRESHOLD="50",
+        )
+        self.assertTrue("Event loop blocked for over" in r)
+        self.assertTrue("time.sleep(0.5)" in r)
+        m = re.search(r"Event loop lag, max ([\d.]+)ms", str(r))
+        self.assertGreater(float(m.group(1)), 400)
+
+        r = await s.run(
+            CAPTAIN_LOOP_MONITOR="1",
+            CAPTAIN_LOOP_MONITOR_THRESHOLD="0",
+        )
+        self.assertFalse("Event loop" in r)
+
+        with self.assertRaises(ValueError):
+            LoopMonitor(Output(), threshold=0)
+
+    async def test_bench(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self, foo: int = 0):
+                    self.output.out(f"foo={foo}")
+                    print("printed")
+        """)
+
+        a = s.application
+        with testdata.capture() as c:
+            benchmark = await a.bench(["--foo=1"], n=20, warmup=2)
+        self.assertFalse("foo=1" in c)
+        self.assertFalse("printed" in c)
+        self.assertEqual(20, len(benchmark.timings["total"]))
+
+        rows = benchmark.get_stats()
+        self.assertEqual(["parse", "handle", "total"], [r[0] for r in rows])
+        self.assertEqual(7, len(rows[0]))
+
+        r = await s.run("--captain-bench=5 --foo=1")
+        self.assertTrue("Benchmark, 5 runs" in r)
+        self.assertTrue("p99 ms" in r)
+        self.assertFalse("foo=1" in r)
+
+        for argv in [["--captain-bench=0"], ["--captain-bench=foo"]]:
+            with testdata.capture(), self.assertRaises(SystemExit) as cm:
+                await a.run(argv)
+            self.assertEqual(2, cm.exception.code)
+
+    async def test_captain_bench_argv(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self, *args):
+                    self.output.out(args)
+        """)
+
+        a = Application(command_prefixes=[s.path])
+        with testdata.capture() as c:
+            await a.run(["--", "--captain-bench", "--captain-bench-x"])
+        self.assertTrue("--captain-bench-x" in c)
+        self.assertFalse("Benchmark" in c)
+
+        a = Application(command_prefixes=[s.path], profile=False)
+        with testdata.capture(), self.assertRaises(SystemExit):
+            await a.run(["--captain-bench=5"])
+
     async def test_handle_1(self):
         s = FileScript(subcommands=True)
         await s.run("--bar=1 --che=2")
@@ -24,6 +282,11 @@ class ApplicationTest(TestCase):
         self.assertEqual(r1, r3)
         self.assertNotEqual(r1, r2)
 
+        # the internal diagnostic flags aren't shown
+        for r in [r1, r2]:
+            self.assertTrue("--format" in r)
+            self.assertFalse("--captain-" in r)
+
     async def test_handle_sub_default(self):
         s = FileScript(subcommands=True)
 
@@ -205,6 +468,72 @@ class ApplicationTest(TestCase):
         node_value = parsed._pathfinder_node.value
         self.assertEqual("CheBoo", node_value["command_class"].__name__)
 
+    def test_command_classes(self):
+        """An application only has the commands of its own modules"""
+        prefixes = []
+        for name in ["foo", "bar"]:
+            modpath = self.get_module_name()
+            self.create_modules({
+                f"{modpath}.commands": {
+                    "__init__": "",
+                    name: [
+                        "from captain import Command",
+                        "",
+                        "class Default(Command):",
+                        "    def handle(self): pass",
+                    ],
+                },
+            })
+            prefixes.append(f"{modpath}.commands")
+
+        from captain import Command
+        class Unrelated(Command):
+            def handle(self): pass
+
+        a1 = Application(command_prefixes=[prefixes[0]])
+        a2 = Application(command_prefixes=[prefixes[1]])
+        self.assertEqual(["foo"], list(a1.pathfinder.keys()))
+        self.assertEqual(["bar"], list(a2.pathfinder.keys()))
+        self.assertEqual(1, len(a1.get_command_classes()))
+
+        # no command modules, the loaded commands still aren't this app's
+        a3 = Application(command_prefixes=[], paths=[testdata.create_dir()])
+        self.assertEqual([], a3.get_command_classes())
+
+    async def test_command_classes_imported(self):
+        """A script can import its commands from another module"""
+        modpath = self.get_module_name()
+        self.create_modules({
+            modpath: [
+                "from captain import Command",
+                "",
+                "class Foo(Command):",
+                "    def handle(self):",
+                "        print('foo')",
+                "",
+                "    class Bar(Command):",
+                "        def handle(self):",
+                "            print('bar')",
+                "",
+                "class Che(Command):",
+                "    def handle(self): pass",
+            ],
+        })
+
+        s = FileScript(f"""
+            from {modpath} import Foo
+
+            class Default(Command):
+                def handle(self):
+                    print("default")
+        """)
+        self.assertEqual("default", await s.run(""))
+        self.assertEqual("foo", await s.run("foo"))
+        self.assertEqual("bar", await s.run("foo bar"))
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            await s.run("che")
+
     async def test_call(self):
         a = FileScript("""
             class FooBoo(Command):
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
+import array
+import asyncio
+import json
 
-from captain.io import Output, Input
+from captain.io import Output, Input, Spans, Encoder
+from captain.logging import QuietFilter
 from captain.compat import *
 
 from . import testdata, TestCase
@@ -117,6 +121,57 @@ class OutputTest(TestCase):
         p.stop_time += 10
         self.assertEqual("10.0s", p.elapsed())
 
+    async def test_span(self):
+        o = Output()
+
+        @o.span("save", trace=True)
+        async def save():
+            with o.span("write"):
+                pass
+
+        with o.span("load"):
+            for x in range(10):
+                with o.span("parse"):
+                    pass
+            await save()
+
+        await save()
+
+        rows = {r[0]: r for r in o.spans.get_stats()}
+        self.assertEqual(1, rows["load"][1])
+        self.assertEqual(10, rows["  parse"][1])
+        self.assertEqual(1, rows["  save"][1])
+        self.assertEqual(1, rows["save"][1])
+        self.assertEqual(2, rows["    write"][1] + rows["  write"][1])
+        self.assertEqual(["load", "  parse", "  save", "    write"], list(rows)[:4])
+
+        trace = o.spans.get_trace()
+        self.assertEqual(15, len(trace["traceEvents"]))
+        cats = [(e["cat"], e["name"]) for e in trace["traceEvents"]]
+        self.assertTrue(("load/save", "write") in cats)
+        self.assertTrue(("", "save") in cats)
+
+        with testdata.capture() as r:
+            o.span_summary()
+        self.assertTrue("p99 ms" in r)
+        self.assertRegex(str(r), r"\|   parse\s+\|\s+10 \|")
+
+    def test_span_configure(self):
+        o = Output()
+        with o.span("foo", trace=False):
+            pass
+        self.assertEqual(0, len(o.spans.get_trace()["traceEvents"]))
+
+        with o.span("bar", trace=True):
+            pass
+        self.assertEqual(1, len(o.spans.get_trace()["traceEvents"]))
+
+        class OtherSpans(Spans):
+            pass
+
+        with self.assertRaises(ValueError):
+            o.span("che", spans_class=OtherSpans)
+
     def test_no_format(self):
         o = Output()
         o.out("this should not {fail}")
@@ -208,6 +263,10 @@ class OutputTest(TestCase):
         o.br()
         o.ol(*lines)
 
+        o = Output(output_format="csv")
+        with testdata.capture() as r:
+            o.ul("foo", "bar")
+        self.assertEqual("1.  foo\n2.  bar\n", str(r))
     def test_table_1(self):
         o = Output()
         one = [1, 3, 5, 7, 9]
@@ -331,6 +390,181 @@ class OutputTest(TestCase):
 
         o.table(d)
 
+    def test_table_render(self):
+        o = Output()
+        rows = [(1, "foo", None), (22, "barbar", 3), ["", "che"]]
+
+        with testdata.capture() as r:
+            o.table(rows, headers=["id", "name", "value"])
+
+        self.assertEqual(
+            "\n".join([
+                "| id | name   | value |",
+                "-----------------------",
+                "|  1 | foo    |  None |",
+                "| 22 | barbar |     3 |",
+                "|    | che    |       |",
+                "",
+            ]),
+            str(r),
+        )
+
+        with testdata.capture() as r:
+            o.table([(1, 2)], widths=[5])
+        self.assertEqual("|     1 | 2 |\n", str(r))
+
+    def test_table_buffers(self):
+        o = Output()
+        ids = [1, 22, 333]
+        scores = [0.5, 0.0, 1.25]
+        deltas = [-1, 0, 10]
+        headers = ["id", "score", "delta"]
+
+        with testdata.capture() as r1:
+            o.table(ids, scores, deltas, headers=headers)
+
+        with testdata.capture() as r2:
+            o.table(
+                array.array("q", ids),
+                array.array("d", scores),
+                memoryview(array.array("i", deltas)),
+                headers=headers,
+            )
+        self.assertEqual(str(r1), str(r2))
+        self.assertTrue("| 333 |" in r2)
+
+        with testdata.capture() as r3:
+            o.table({
+                "id": array.array("q", ids),
+                "score": array.array("d", scores),
+                "delta": array.array("i", deltas),
+            })
+        self.assertEqual(str(r1), str(r3))
+
+    def test_table_numpy(self):
+        try:
+            import numpy
+
+        except ImportError:
+            self.skipTest("numpy is not installed")
+
+        o = Output()
+        ids = [1, 22, 333]
+        scores = [0.5, 0.0, 1.25]
+        names = ["foo", "", "12"]
+
+        with testdata.capture() as r1:
+            o.table(ids, scores, names, widths=[5])
+
+        with testdata.capture() as r2:
+            o.table(
+                numpy.array(ids),
+                numpy.array(scores),
+                numpy.array(names),
+                widths=[5],
+            )
+        self.assertEqual(str(r1), str(r2))
+
+    def test_table_output_format(self):
+        rows = [(1, "foo"), (2, "bar, che")]
+
+        o = Output(output_format="csv")
+        with testdata.capture() as r:
+            o.table(rows, headers=["id", "name"])
+            o.row([3, "baz"])
+        self.assertEqual(
+            "id,name\n1,foo\n2,\"bar, che\"\n3,baz\n",
+            str(r),
+        )
+
+        o = Output(output_format="tsv")
+        with testdata.capture() as r:
+            o.table(array.array("q", [1, 2]), array.array("q", [3, 4]))
+        self.assertEqual("1\t3\n2\t4\n", str(r))
+
+        o = Output(output_format="jsonl")
+        with testdata.capture() as r:
+            o.table(rows, headers=["id", "name"])
+            o.row([3, None])
+        self.assertEqual(
+            "\n".join([
+                "{\"id\": 1, \"name\": \"foo\"}",
+                "{\"id\": 2, \"name\": \"bar, che\"}",
+                "[3, null]",
+                "",
+            ]),
+            str(r),
+        )
+
+        o = Output(output_format="nope")
+        with self.assertRaises(ValueError):
+            o.row([1, 2])
+
+    def test_record(self):
+        o = Output(output_format="csv")
+        with testdata.capture() as r:
+            o.record({"foo": 1, "bar": "one"})
+            o.record({"bar": "two", "foo": 2})
+        self.assertEqual("foo,bar\n1,one\n2,two\n", str(r))
+
+        with self.assertRaises(ValueError):
+            o.record({"che": 3})
+
+        o = Output(output_format="jsonl")
+        with testdata.capture() as r:
+            o.record({"foo": 1, "bar": "one"})
+        self.assertEqual("{\"foo\": 1, \"bar\": \"one\"}\n", str(r))
+
+        o = Output()
+        with testdata.capture() as r:
+            o.record({"foo": 1, "bar": "one"})
+        self.assertTrue("| foo |" in r)
+
+    def test_encoder(self):
+        with self.assertRaises(TypeError):
+            Encoder(Output())
+
+        class PipeEncoder(Encoder):
+            def encode_row(self, row, headers=None):
+                return "|".join(map(String, row))
+
+        e = PipeEncoder(Output())
+        self.assertEqual("1|one", e.encode_record({"foo": 1, "bar": "one"}))
+
+    def test_json(self):
+        o = Output()
+
+        with testdata.capture() as r:
+            o.json({"foo": "{bar}", "che": [1, 2]})
+        self.assertEqual("{\"foo\": \"{bar}\", \"che\": [1, 2]}\n", str(r))
+
+        with testdata.capture() as r:
+            o.json(v for v in range(3))
+        self.assertEqual("[0, 1, 2]\n", str(r))
+
+        with testdata.capture() as r:
+            o.json(iter([]), stream=False)
+        self.assertEqual("[]\n", str(r))
+
+        d = [{"foo": 1, "bar": {2, 3}}, {"foo": 4, "bar": []}]
+        with testdata.capture() as r:
+            o.json(iter(d), indent=2)
+        self.assertEqual(
+            json.dumps(d, indent=2, default=list) + "\n",
+            str(r),
+        )
+
+    def test_json_quiet(self):
+        o = Output()
+        try:
+            QuietFilter("I")
+            with testdata.capture() as r:
+                o.json([1, 2])
+            self.assertEqual("", str(r))
+
+        finally:
+            QuietFilter.reset()
+
     def test_progress_n(self):
         o = Output()
         count = 100
@@ -350,6 +584,94 @@ class OutputTest(TestCase):
             for x in range(count):
                 pbar.update(x)
 
+    def test_progress_iterable(self):
+        o = Output()
+        with testdata.capture() as r:
+            items = list(o.progress(range(10), tty=False, summary_interval=0))
+        self.assertEqual(list(range(10)), items)
+        self.assertTrue("10/10" in r)
+        self.assertFalse(chr(8) in r)
+
+        # unknown length
+        with testdata.capture() as r:
+            items = list(o.progress_bar(iter(range(10)), tty=False))
+        self.assertEqual(list(range(10)), items)
+        self.assertTrue("ETA" in r)
+
+    async def test_progress_async_iterable(self):
+        async def aiter():
+            for x in range(5):
+                yield x
+
+        o = Output()
+        items = [x async for x in o.progress(aiter(), tty=True)]
+        self.assertEqual(list(range(5)), items)
+
+    def test_progress_rate(self):
+        o = Output()
+
+        with testdata.capture() as r:
+            with o.progress(1000, tty=False, summary_interval=60) as p:
+                for x in range(1000):
+                    p.update(x)
+
+        # the first update and the finish are the only lines
+        self.assertEqual(2, len(str(r).splitlines()))
+
+        with testdata.capture() as r:
+            with o.progress(1000, tty=True, rate=1) as p:
+                for x in range(1000):
+                    p.update(x)
+        self.assertEqual(2, str(r).count("/1000"))
+        self.assertTrue(chr(8) in r)
+
+    def test_progress_rate_zero(self):
+        o = Output()
+        with testdata.capture() as r:
+            with o.progress(10, tty=True, rate=0) as p:
+                for x in range(10):
+                    p.update(x)
+
+        # every update is drawn, plus the first and final draws
+        self.assertEqual(12, str(r).count("/10"))
+
+        with testdata.environment(CAPTAIN_PROGRESS_RATE="0"):
+            with testdata.capture():
+                with o.progress_group(tty=True) as group:
+                    group.progress(10).update(5)
+            self.assertEqual(0.0, group.interval)
+
+    async def test_progress_group(self):
+        o = Output()
+
+        async def task(group, i):
+            p = group.progress(100, label=f"task {i}")
+            for x in range(100):
+                p.increment()
+                await asyncio.sleep(0)
+
+        with testdata.capture() as r:
+            with o.progress_group(tty=True, rate=1000) as group:
+                s = group.spinner("spinner")
+                await asyncio.gather(*(task(group, i) for i in range(5)))
+                s.finish()
+
+        # the final frame has every line
+        frame = str(r).split("\x1b[6F")[-1]
+        for i in range(5):
+            self.assertRegex(frame, rf"task {i}\s+100/100")
+        self.assertTrue("* spinner" in frame)
+
+        with testdata.capture() as r:
+            with o.progress_group(tty=False, summary_interval=60) as group:
+                with group.progress_bar(10, label="foo") as p:
+                    for x in range(10):
+                        p.update(x)
+
+        # the group only draws the final summary
+        self.assertEqual(1, str(r).count("foo ["))
+        self.assertFalse("\x1b" in r)
+
     def test_pluralize(self):
         """https://github.com/Jaymon/captain/issues/71"""
         o = Output()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import threading
+import logging as stdlogging
+
+from captain.io import Output
+from captain.logging import (
+    QueueListener,
+    QueueHandler,
+    stdout,
+    stderr,
+)
+from captain.compat import *
+
+from . import testdata, TestCase
+
+
+class QueueListenerTest(TestCase):
+    def test_start_stop(self):
+        o = Output()
+        handlers = list(stdout.handlers)
+
+        with testdata.capture() as r:
+            ql = QueueListener([stdout, stderr], maxsize=2)
+            ql.start()
+            self.assertEqual([ql.queue_handler], stdout.handlers)
+
+            for i in range(100):
+                o.out("out {}", i)
+            o.err("err 1")
+
+            ql.stop()
+
+        self.assertTrue("out 99" in r.stdout)
+        self.assertTrue("err 1" in r.stderr)
+        self.assertFalse("err 1" in r.stdout)
+        self.assertEqual(handlers, stdout.handlers)
+
+    def test_drop_debug(self):
+        event = threading.Event()
+        lines = []
+
+        class BlockingHandler(stdlogging.Handler):
+            def emit(self, record):
+                event.wait()
+                lines.append(record.getMessage())
+
+        logger = stdlogging.getLogger(testdata.get_ascii(8))
+        logger.propagate = False
+        logger.setLevel(stdlogging.DEBUG)
+        logger.addHandler(BlockingHandler())
+
+        ql = QueueListener([logger], maxsize=1, policy="drop-debug")
+        ql.start()
+        for i in range(10):
+            logger.debug(f"debug {i}")
+
+        # the handler is blocked so the queue is full
+        self.assertLess(0, ql.queue_handler.dropped)
+
+        event.set()
+        logger.info("info")
+        ql.stop()
+
+        self.assertEqual("info", lines[-1])
+
+    def test_policy(self):
+        with self.assertRaises(ValueError):
+            QueueHandler(None, policy="nope")
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import json
+import subprocess
+
+from captain.metrics import MetricsSink, JSONLSink, PrometheusSink
+from captain.compat import *
+
+from . import testdata, TestCase, FileScript
+
+
+class MetricsSinkTest(TestCase):
+    def test_create(self):
+        path = testdata.get_file("foo.prom")
+        self.assertIsInstance(MetricsSink.create(path.path), PrometheusSink)
+
+        path = testdata.get_file("foo.jsonl")
+        self.assertIsInstance(MetricsSink.create(path.path), JSONLSink)
+
+        with self.assertRaises(TypeError):
+            MetricsSink(path.path)
+
+    async def test_jsonl(self):
+        path = testdata.get_file()
+        sink = JSONLSink(path.path)
+
+        async def run(ret_code):
+            return ret_code
+
+        self.assertEqual(0, await sink.run(["foo"], run(0)))
+        self.assertEqual(3, await sink.run(["foo", "bar"], run(3)))
+
+        metrics = [json.loads(l) for l in path.read_text().splitlines()]
+        self.assertEqual(["foo"], metrics[0]["command"])
+        self.assertEqual(0, metrics[0]["exit_code"])
+        self.assertEqual(["foo", "bar"], metrics[1]["command"])
+        self.assertEqual(3, metrics[1]["exit_code"])
+        self.assertTrue("duration_s" in metrics[1])
+
+    async def test_prometheus(self):
+        path = testdata.get_file("metrics.prom")
+        sink = PrometheusSink(path.path)
+
+        async def run(ret_code):
+            if ret_code:
+                raise SystemExit(ret_code)
+
+        await sink.run(["foo"], run(0))
+        await sink.run(["foo"], run(0))
+        with self.assertRaises(SystemExit):
+            await sink.run(["foo"], run(2))
+
+        text = path.read_text()
+        self.assertTrue(
+            "captain_command_duration_seconds_count{command=\"foo\"} 3" in text
+        )
+        self.assertTrue(
+            "captain_command_duration_seconds_bucket"
+            "{command=\"foo\",le=\"+Inf\"} 3" in text
+        )
+        self.assertTrue(
+            "captain_command_exits_total{command=\"foo\",code=\"0\"} 2" in text
+        )
+        self.assertTrue(
+            "captain_command_exits_total{command=\"foo\",code=\"2\"} 1" in text
+        )
+
+        # a new sink picks up the totals
+        sink = PrometheusSink(path.path)
+        await sink.run(["foo"], run(0))
+        self.assertTrue(
+            "captain_command_duration_seconds_count{command=\"foo\"} 4"
+            in path.read_text()
+        )
+
+    async def test_application(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self):
+                    pass
+
+            class Foo(Command):
+                def handle(self):
+                    raise ValueError()
+        """)
+
+        path = testdata.get_file()
+        await s.run(CAPTAIN_METRICS_PATH=path.path)
+        with self.assertRaises(subprocess.CalledProcessError):
+            await s.run("foo", CAPTAIN_METRICS_PATH=path.path)
+
+        metrics = [json.loads(l) for l in path.read_text().splitlines()]
+        self.assertEqual([], metrics[0]["command"])
+        self.assertEqual(0, metrics[0]["exit_code"])
+        self.assertEqual(["foo"], metrics[1]["command"])
+        self.assertEqual(1, metrics[1]["exit_code"])
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from captain.middleware import Middleware, MiddlewareChain
+from captain.interface import Application
+from captain.compat import *
+
+from . import testdata, TestCase, FileScript
+
+
+class MiddlewareChainTest(TestCase):
+    def test_compile(self):
+        async def handler(command, args, kwargs):
+            return 0
+
+        chain = MiddlewareChain([], handler)
+        self.assertEqual((), chain.before_parse_hooks)
+        self.assertEqual((), chain.after_parse_hooks)
+        self.assertEqual((), chain.after_exit_hooks)
+        self.assertIs(handler, chain.handle)
+
+        class Foo(Middleware):
+            def before_parse(self, application, argv):
+                return argv
+
+        chain = MiddlewareChain([Foo(), Middleware()], handler)
+        self.assertEqual(1, len(chain.before_parse_hooks))
+        self.assertEqual((), chain.after_parse_hooks)
+        self.assertIs(handler, chain.handle)
+
+    async def test_order(self):
+        calls = []
+
+        class Trace(Middleware):
+            def __init__(self, name):
+                self.name = name
+
+            async def handle(self, command, args, kwargs, call_next):
+                calls.append(f"{self.name} start")
+                ret_code = await call_next(command, args, kwargs)
+                calls.append(f"{self.name} stop")
+                return ret_code
+
+            def after_exit(self, application, command, ret_code, error=None):
+                calls.append(f"{self.name} exit")
+
+        async def handler(command, args, kwargs):
+            calls.append("handler")
+            return 5
+
+        chain = MiddlewareChain([Trace("1"), Trace("2")], handler)
+        self.assertEqual(5, await chain.handle(None, [], {}))
+        await chain.after_exit(None, None, 5)
+        self.assertEqual(
+            ["1 start", "2 start", "handler", "2 stop", "1 stop", "2 exit", "1 exit"],
+            calls,
+        )
+
+    async def test_sync(self):
+        class Sync(Middleware):
+            def before_parse(self, application, argv):
+                return argv + ["sync"]
+
+            def handle(self, command, args, kwargs, call_next):
+                if args:
+                    return int(args[0])
+                return call_next(command, args, kwargs)
+
+        async def handler(command, args, kwargs):
+            return 5
+
+        chain = MiddlewareChain([Sync()], handler)
+        self.assertEqual(["sync"], await chain.before_parse(None, []))
+        self.assertEqual(3, await chain.handle(None, ["3"], {}))
+        self.assertEqual(5, await chain.handle(None, [], {}))
+
+
+class MiddlewareTest(TestCase):
+    async def test_application(self):
+        s = FileScript("""
+            class Default(Command):
+                def handle(self, foo=0):
+                    self.output.out(f"foo={foo}")
+                    self.output.out(f"attempt={self.attempts}")
+                    return 0 if self.attempts == 2 else 1
+
+            class Bar(Command):
+                def handle(self, **kwargs):
+                    raise ValueError("bar")
+        """)
+
+        seen = {}
+
+        class DefaultFoo(Middleware):
+            def before_parse(self, application, argv):
+                return argv or ["--foo=1"]
+
+            def after_parse(self, application, parsed, command):
+                seen["foo"] = parsed.foo
+                command.attempts = 0
+
+        class Retry(Middleware):
+            async def handle(self, command, args, kwargs, call_next):
+                for _ in range(3):
+                    command.attempts += 1
+                    ret_code = await call_next(command, args, kwargs)
+                    if ret_code == 0:
+                        break
+                return ret_code
+
+        class Exit(Middleware):
+            async def after_exit(self, application, command, ret_code, error=None):
+                seen["ret_code"] = ret_code
+                seen["error"] = error
+
+        a = s.application
+        a.add_middleware(Exit())
+        a.add_middleware(DefaultFoo())
+        a.add_middleware(Retry())
+
+        with testdata.capture() as c:
+            self.assertEqual(0, await a.run([]))
+        self.assertTrue("foo=1" in c)
+        self.assertTrue("attempt=1" in c)
+        self.assertTrue("attempt=2" in c)
+        self.assertFalse("attempt=3" in c)
+        self.assertEqual(1, seen["foo"])
+        self.assertEqual(0, seen["ret_code"])
+
+        a = Application(middlewares=[Exit()], command_prefixes=[s.path])
+        with self.assertRaises(ValueError):
+            await a.run(["bar"])
+        self.assertIsNone(seen["ret_code"])
+        self.assertIsInstance(seen["error"], ValueError)
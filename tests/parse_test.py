@@ -654,3 +654,41 @@ class ArgumentParserTest(TestCase):
         with self.assertRaises(argparse.ArgumentError):
             p.parse_args([])
 
+
+    async def test_common_arguments(self):
+        """The common flags are only added to the parsers that are used and
+        every parser shares the same common actions"""
+        s = FileScript("""
+            __version__ = "1.0"
+
+            class Foo(Command):
+                def handle(self): self.out("foo")
+
+            class Bar(Command):
+                version = "2.0"
+                def handle(self): self.out("bar")
+        """)
+
+        a = s.application
+        parsers = {}
+        for keys, n in a.pathfinder.nodes():
+            parsers[tuple(keys)] = n.value["parser"]
+
+        a.parser.parse_args(["foo", "-Q"])
+        self.assertTrue("--quiet" in parsers[("foo",)]._option_string_actions)
+        self.assertFalse("--quiet" in parsers[("bar",)]._option_string_actions)
+
+        a.parser.parse_args(["bar", "-Q"])
+        self.assertIs(
+            parsers[("foo",)]._option_string_actions["--quiet"],
+            parsers[("bar",)]._option_string_actions["--quiet"],
+        )
+
+        r = await s.run("foo --version")
+        self.assertTrue("1.0" in r)
+
+        r = await s.run("bar --version")
+        self.assertTrue("2.0" in r)
+
+        r = await s.run("bar --help")
+        self.assertTrue("--quiet" in r)
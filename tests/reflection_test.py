@@ -5,6 +5,7 @@ from captain.reflection import (
     ReflectCommand,
     Argument,
     Pathfinder,
+    NodeValue,
 )
 from captain import Command, Application
 
@@ -181,6 +182,44 @@ class ArgumentTest(TestCase):
         keywords = a.get_keywords()
         self.assertEqual(0, len(keywords))
 
+    def test_tuple(self):
+        a = Argument("--foo", "-f", type=int)
+        args, kwargs = a
+        self.assertEqual(["--foo", "-f"], args)
+        self.assertIs(a[1], kwargs)
+        self.assertEqual(2, len(a))
+        self.assertEqual((["--foo", "-f"], kwargs), a)
+        self.assertFalse(hasattr(a, "__dict__"))
+
+
+class NodeValueTest(TestCase):
+    def test_mapping(self):
+        v = NodeValue(description="foo", version="")
+        self.assertEqual("foo", v["description"])
+        self.assertFalse("class" in v)
+        self.assertIsNone(v.get("class"))
+        with self.assertRaises(KeyError):
+            v["class"]
+
+        v["class"] = NodeValue
+        v["bar"] = 1
+        self.assertTrue("class" in v)
+        self.assertEqual(
+            {"description": "foo", "version": "", "class": NodeValue, "bar": 1},
+            dict(v),
+        )
+
+        self.assertEqual(1, v.pop("bar"))
+        self.assertEqual(3, len(v))
+        del v["class"]
+        self.assertFalse("class" in v)
+        self.assertFalse(hasattr(v, "__dict__"))
+
+    def test_intern(self):
+        v1 = NodeValue(keys=["".join(["foo", "-bar"])])
+        v2 = NodeValue(keys=["".join(["foo-", "bar"])])
+        self.assertIs(v1["keys"][0], v2["keys"][0])
+
 
 class PathfinderTest(TestCase):
     def test_add_class(self):